@@ -0,0 +1 @@
+"""Benchmarks against a local SFTP server stand-in."""
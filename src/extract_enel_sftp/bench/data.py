@@ -0,0 +1,159 @@
+"""Generate synthetic ENEL files (BaseMes and ordens filhas) for benchmarks.
+
+Uso:
+    python -m extract_enel_sftp.bench.data --rows 100000 --files 3 --output bench_data
+"""
+import argparse
+import os
+import zipfile
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..config import EXPECTED_COLUMNS
+from ..processing.ordens_filhas import ORDENS_FILHAS_SCHEMA
+
+# Cardinalidades aproximadas de um mes de leitura da Coelce: poucos codigos
+# de irregularidade, alguns milhares de bairros e cliente/medidor unicos.
+_IRREGULARIDADES = [
+    ("", ""),
+    ("01", "LEITURA NORMAL"),
+    ("12", "CASA FECHADA"),
+    ("14", "MEDIDOR NAO LOCALIZADO"),
+    ("21", "CAO BRAVO"),
+    ("33", "ACESSO IMPEDIDO"),
+    ("45", "MEDIDOR DANIFICADO"),
+    ("52", "LEITURA CONFIRMADA"),
+    ("67", "VIZINHO INFORMOU"),
+    ("78", "IMOVEL DESOCUPADO"),
+]
+_IRREG_WEIGHTS = [0.82, 0.08, 0.03, 0.02, 0.01, 0.01, 0.01, 0.01, 0.005, 0.005]
+_ESTADOS = ["01", "02", "03", "04", "05", "06", "07", "08", "09"]
+_MUNICIPIOS = 184
+_BAIRROS = 3000
+
+
+def _codes(rng: np.random.Generator, count: int, rows: int, width: int) -> np.ndarray:
+    return np.char.zfill(rng.integers(1, count + 1, rows).astype(str), width)
+
+
+def _coordinates(rng: np.random.Generator, rows: int, low: float, high: float):
+    return np.char.mod("%.6f", rng.uniform(low, high, rows))
+
+
+def efetividade_frame(
+    rows: int, seed: int = 0, reference: str = "202601"
+) -> pd.DataFrame:
+    """Rows in the ``EXPECTED_COLUMNS`` layout with realistic cardinalities."""
+    rng = np.random.default_rng(seed)
+    municipio = rng.integers(0, _MUNICIPIOS, rows)
+    irreg_lida = rng.choice(len(_IRREGULARIDADES), rows, p=_IRREG_WEIGHTS)
+    irreg_operador = rng.choice(len(_IRREGULARIDADES), rows, p=_IRREG_WEIGHTS)
+    codes = np.array([code for code, _ in _IRREGULARIDADES], dtype=object)
+    descriptions = np.array([desc for _, desc in _IRREGULARIDADES], dtype=object)
+    bairros = np.array(
+        [f"BAIRRO {index:04d}" for index in range(_BAIRROS)] + ["SÃO JOÃO"],
+        dtype=object,
+    )
+    data = {
+        "CO": rng.choice(["CE", "CN"], rows, p=[0.97, 0.03]),
+        "REFERENCIA": np.full(rows, reference),
+        "NUMERO_CLIENTE": np.char.zfill(
+            rng.permutation(rows * 3)[:rows].astype(str), 9
+        ),
+        "MATRICULA_LEITURISTA": _codes(rng, 600, rows, 6),
+        "SECTOR": _codes(rng, 120, rows, 3),
+        "LOCALIDADE": _codes(rng, 250, rows, 4),
+        "ZONA": _codes(rng, 60, rows, 2),
+        "MUNICIPIO": np.char.add("MUNICIPIO ", municipio.astype(str)),
+        "BAIRRO": bairros[rng.integers(0, len(bairros), rows)],
+        "IRREG_LIDA": codes[irreg_lida],
+        "IRREG_OPERADOR": codes[irreg_operador],
+        "NUMERO_MEDIDOR": np.char.add(
+            "M", np.char.zfill(rng.permutation(rows * 3)[:rows].astype(str), 10)
+        ),
+        "DESC_IRREG_LIDA": descriptions[irreg_lida],
+        "DESC_IRREG_OPERADOR": descriptions[irreg_operador],
+        "DX": rng.choice(["0", "1", "2"], rows, p=[0.9, 0.08, 0.02]),
+        "TELEMEDIDO": rng.choice(["N", "S"], rows, p=[0.95, 0.05]),
+        "UNIDADE_LEITURA": _codes(rng, 1200, rows, 5),
+        "CODIGO_MUNICIPIO": np.char.zfill(municipio.astype(str), 3),
+        "FAT_BIMESTRAL": rng.choice(["0", "1"], rows, p=[0.85, 0.15]),
+        "LATITUDE": _coordinates(rng, rows, -7.8, -2.8),
+        "LONGITUDE": _coordinates(rng, rows, -41.4, -37.2),
+    }
+    return pd.DataFrame({column: data[column] for column in EXPECTED_COLUMNS})
+
+
+def write_basemes(path: str, rows: int, seed: int = 0) -> str:
+    efetividade_frame(rows, seed).to_csv(path, sep="|", index=False, encoding="utf-8")
+    return path
+
+
+def write_ordens_filhas(path: str, rows: int, seed: int = 0) -> str:
+    # Sem cabecalho, em cp1252 e com virgula decimal, como o arquivo real.
+    rng = np.random.default_rng(seed + 1)
+    df = efetividade_frame(rows, seed)
+    df["LATITUDE"] = df["LATITUDE"].str.replace(".", ",", regex=False)
+    df["LONGITUDE"] = df["LONGITUDE"].str.replace(".", ",", regex=False)
+    ingresso = pd.Timestamp("2025-01-01") + pd.to_timedelta(
+        rng.integers(0, 365, rows), unit="D"
+    )
+    estado = ingresso + pd.to_timedelta(rng.integers(0, 30, rows), unit="D")
+    df["estado"] = rng.choice(_ESTADOS, rows)
+    df["data_ingresso"] = ingresso.strftime("%d/%m/%Y")
+    df["data_estado"] = estado.strftime("%d/%m/%Y")
+    df = df[list(ORDENS_FILHAS_SCHEMA.names)]
+    df.to_csv(
+        path,
+        sep=ORDENS_FILHAS_SCHEMA.sep,
+        index=False,
+        header=False,
+        encoding=ORDENS_FILHAS_SCHEMA.encoding,
+    )
+    return path
+
+
+def write_zip(zip_path: str, members: List[str]) -> str:
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for member in members:
+            archive.write(member, os.path.basename(member))
+    return zip_path
+
+
+def generate(output: str, rows: int, files: int = 1, seed: int = 0) -> List[str]:
+    """Writes ``files`` BaseMes txt files plus a zipped ordens filhas file."""
+    os.makedirs(output, exist_ok=True)
+    paths = [
+        write_basemes(
+            os.path.join(output, f"BaseMes_202601_{index:02d}.txt"),
+            rows,
+            seed + index,
+        )
+        for index in range(files)
+    ]
+    ordens = write_ordens_filhas(
+        os.path.join(output, "COELCE_elaazisysd00_ordemfilhas.txt"), rows, seed
+    )
+    zip_path = write_zip(
+        os.path.join(output, "COELCE_elaazisysd00_ordemfilhas.zip"), [ordens]
+    )
+    return paths + [ordens, zip_path]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_data")
+    args = parser.parse_args(argv)
+
+    for path in generate(args.output, args.rows, args.files, args.seed):
+        print(f"{path}: {os.path.getsize(path) / 1024**2:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
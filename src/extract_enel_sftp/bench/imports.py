@@ -0,0 +1,132 @@
+"""Measure the import cost of the CLI and of each subcommand.
+
+Uso:
+    python -m extract_enel_sftp.bench.imports --repeat 5 --check
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..cli import COMMANDS
+
+HEAVY_MODULES = ("pandas", "numpy", "sqlalchemy", "pyodbc", "pyarrow", "paramiko")
+
+# Modulos que cada cenario nao pode importar (--check falha se importar).
+FORBIDDEN: Dict[str, Tuple[str, ...]] = {
+    "--help": HEAVY_MODULES,
+    "extract": ("pandas", "numpy", "sqlalchemy", "pyodbc", "pyarrow"),
+    "test-sftp": ("pandas", "numpy", "sqlalchemy", "pyodbc", "pyarrow"),
+    "test-sftp-regex": ("pandas", "numpy", "sqlalchemy", "pyodbc", "pyarrow"),
+}
+
+_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from extract_enel_sftp.cli import COMMANDS, build_parser
+build_parser().format_help()
+name = {name!r}
+if name != "--help":
+    next(command for command in COMMANDS if command.name == name).load()
+elapsed = time.perf_counter() - started
+heavy = [module for module in {heavy!r} if module in sys.modules]
+print(json.dumps({{"import_seconds": elapsed, "heavy_modules": heavy}}))
+"""
+
+
+def _run(name: str) -> Dict[str, object]:
+    # Processo novo a cada medicao: nada fica em cache em sys.modules.
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(name=name, heavy=HEAVY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - started
+    return result
+
+
+def _baseline() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+
+def measure(repeat: int = 3) -> Dict[str, Dict[str, object]]:
+    """Best of ``repeat`` runs for ``--help`` and for loading each command."""
+    results: Dict[str, Dict[str, object]] = {}
+    for name in ["--help"] + [command.name for command in COMMANDS]:
+        runs = [_run(name) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["import_seconds"])
+        results[name] = {
+            "import_ms": round(best["import_seconds"] * 1000, 1),
+            "process_ms": round(
+                min(run["process_seconds"] for run in runs) * 1000, 1
+            ),
+            "heavy_modules": best["heavy_modules"],
+        }
+    return results
+
+
+def violations(results: Dict[str, Dict[str, object]]) -> List[str]:
+    problems = []
+    for name, forbidden in FORBIDDEN.items():
+        imported = [
+            module for module in results[name]["heavy_modules"] if module in forbidden
+        ]
+        if imported:
+            problems.append(f"{name} importa {', '.join(imported)}")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Grava os resultados em JSON")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Sai com erro se um comando leve importar pandas/SQLAlchemy",
+    )
+    parser.add_argument(
+        "--max-help-ms",
+        type=float,
+        help="Com --check, tempo maximo de importacao do --help",
+    )
+    args = parser.parse_args(argv)
+
+    baseline_ms = _baseline() * 1000
+    results = measure(args.repeat)
+    print(f"Interpretador sem imports: {baseline_ms:.0f} ms")
+    print(f"{'comando':<18}{'import ms':>11}{'processo ms':>13}  modulos pesados")
+    for name, result in results.items():
+        print(
+            f"{name:<18}{result['import_ms']:>11.1f}{result['process_ms']:>13.1f}  "
+            f"{', '.join(result['heavy_modules']) or '-'}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"baseline_ms": round(baseline_ms, 1), "commands": results},
+                handle,
+                indent=2,
+            )
+
+    if not args.check:
+        return 0
+    problems = violations(results)
+    help_ms = results["--help"]["import_ms"]
+    if args.max_help_ms is not None and help_ms > args.max_help_ms:
+        problems.append(f"--help levou {help_ms} ms (maximo {args.max_help_ms})")
+    for problem in problems:
+        print(f"REGRESSAO: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+"""Compare ``DataFrame.to_sql`` with the batched loaders on SQLite.
+
+Uso:
+    python -m extract_enel_sftp.bench.loader --rows 200000 --batch-size 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from ..config import EXPECTED_COLUMNS
+from ..etl.loader import METHOD_EXECUTEMANY, METHOD_MULTIROW, SqliteBulkLoader
+
+
+def _sample_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = {
+        column: rng.integers(0, 5000, rows).astype(str) for column in EXPECTED_COLUMNS
+    }
+    data["source_file"] = np.full(rows, "BaseMes_202601.txt")
+    return pd.DataFrame(data)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    df = _sample_frame(args.rows)
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'to_sql.db')}")
+        started = time.monotonic()
+        df.to_sql("EfetividadeLeitura", con=engine, if_exists="append", index=False)
+        baseline = time.monotonic() - started
+        engine.dispose()
+        print(f"to_sql      : {args.rows / baseline:12,.0f} linhas/s")
+
+        for method in (METHOD_EXECUTEMANY, METHOD_MULTIROW):
+            loader = SqliteBulkLoader.from_path(
+                os.path.join(workdir, f"{method}.db"),
+                "EfetividadeLeitura",
+                args.batch_size,
+                method,
+            )
+            stats = loader.load(df)
+            loader.close()
+            print(
+                f"{method:<12}: {stats.rows_per_second:12,.0f} linhas/s "
+                f"({stats.rows_per_second * baseline / args.rows:.2f}x)"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,206 @@
+"""In-process SFTP server used as a stand-in for the ENEL hosts."""
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from typing import List, Optional
+
+import paramiko
+from paramiko import SFTPAttributes, SFTPHandle, SFTPServer, SFTPServerInterface
+
+logger = logging.getLogger(__name__)
+
+_HOST_KEY: Optional[paramiko.RSAKey] = None
+_HOST_KEY_LOCK = threading.Lock()
+
+
+def _host_key() -> paramiko.RSAKey:
+    global _HOST_KEY
+    with _HOST_KEY_LOCK:
+        if _HOST_KEY is None:
+            _HOST_KEY = paramiko.RSAKey.generate(2048)
+        return _HOST_KEY
+
+
+class _AllowAllServer(paramiko.ServerInterface):
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+
+class _LocalHandle(SFTPHandle):
+    def stat(self):
+        try:
+            return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as exc:
+            return SFTPServer.convert_errno(exc.errno)
+
+
+class _LocalSftpInterface(SFTPServerInterface):
+    root = "."
+
+    def _local_path(self, path: str) -> str:
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def list_folder(self, path):
+        local_dir = self._local_path(path)
+        try:
+            entries = []
+            for name in os.listdir(local_dir):
+                attr = SFTPAttributes.from_stat(os.stat(os.path.join(local_dir, name)))
+                attr.filename = name
+                entries.append(attr)
+            return entries
+        except OSError as exc:
+            return SFTPServer.convert_errno(exc.errno)
+
+    def stat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.stat(self._local_path(path)))
+        except OSError as exc:
+            return SFTPServer.convert_errno(exc.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        try:
+            handle_file = open(self._local_path(path), "rb")
+        except OSError as exc:
+            return SFTPServer.convert_errno(exc.errno)
+        handle = _LocalHandle(flags)
+        handle.readfile = handle_file
+        handle.filename = self._local_path(path)
+        return handle
+
+
+class _LatencyProxy:
+    """TCP relay that delays every segment by a fixed one-way latency.
+
+    Data keeps flowing while earlier segments are "in flight", so pipelined
+    requests behave as they would on a long VPN link.
+    """
+
+    def __init__(self, target_port: int, latency: float) -> None:
+        self.target_port = target_port
+        self.latency = latency
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(("127.0.0.1", self.target_port))
+            for src, dst in ((client, upstream), (upstream, client)):
+                self._pump(src, dst)
+
+    def _pump(self, src: socket.socket, dst: socket.socket) -> None:
+        pending: "queue.Queue" = queue.Queue()
+
+        def reader() -> None:
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b""
+                pending.put((time.monotonic() + self.latency, data))
+                if not data:
+                    return
+
+        def writer() -> None:
+            while True:
+                due, data = pending.get()
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    if not data:
+                        dst.shutdown(socket.SHUT_WR)
+                        return
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=reader, daemon=True).start()
+        threading.Thread(target=writer, daemon=True).start()
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+class LocalSftpServer:
+    """Serves ``root`` over SFTP on 127.0.0.1, accepting any credentials.
+
+    ``latency`` (seconds, one way) routes clients through a delaying relay to
+    emulate the VPN round trip.
+    """
+
+    def __init__(self, root: str, latency: float = 0.0) -> None:
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.port = 0
+        self._sock: Optional[socket.socket] = None
+        self._proxy: Optional[_LatencyProxy] = None
+        self._transports: List[paramiko.Transport] = []
+
+    def start(self) -> "LocalSftpServer":
+        interface = type(
+            "_RootedSftpInterface", (_LocalSftpInterface,), {"root": self.root}
+        )
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        server_port = self._sock.getsockname()[1]
+
+        def accept_loop() -> None:
+            while True:
+                try:
+                    conn, _ = self._sock.accept()
+                except OSError:
+                    return
+                transport = paramiko.Transport(conn)
+                transport.add_server_key(_host_key())
+                transport.set_subsystem_handler("sftp", SFTPServer, interface)
+                transport.start_server(server=_AllowAllServer())
+                self._transports.append(transport)
+
+        threading.Thread(target=accept_loop, daemon=True).start()
+
+        self.port = server_port
+        if self.latency > 0:
+            self._proxy = _LatencyProxy(server_port, self.latency)
+            self.port = self._proxy.port
+        logger.info("Servidor SFTP local em 127.0.0.1:%s (%s)", self.port, self.root)
+        return self
+
+    def stop(self) -> None:
+        if self._proxy:
+            self._proxy.close()
+        if self._sock:
+            self._sock.close()
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    def __enter__(self) -> "LocalSftpServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
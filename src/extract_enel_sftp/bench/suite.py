@@ -0,0 +1,197 @@
+"""Time the extract, unzip, parse and load steps at several data sizes.
+
+Uso:
+    python -m extract_enel_sftp.bench.suite --rows 10000 100000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from importlib import metadata
+from typing import Callable, Dict, List, Optional
+
+from ..config import EXPECTED_COLUMNS, TransferConfig
+from ..etl.efetividade import create_dataframe_from_txt
+from ..etl.loader import SqliteBulkLoader
+from ..processing.ordens_filhas import processar_ordens_filhas
+from ..sftp_client import download_files, extract_zip
+from ..transfer import open_sftp, open_transport
+from . import data
+from .sftp_server import LocalSftpServer
+
+SUITE_VERSION = 1
+
+
+def _timed(repeat: int, setup: Callable[[], None], run: Callable[[], object]):
+    # Melhor de ``repeat`` execucoes; setup prepara o estado fora do tempo.
+    best = None
+    result = None
+    for _ in range(repeat):
+        setup()
+        started = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _noop() -> None:
+    return None
+
+
+def _result(step: str, rows: int, size: int, seconds: float) -> Dict[str, object]:
+    return {
+        "step": step,
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "mb_per_second": round(size / 1024**2 / seconds, 3) if seconds else None,
+    }
+
+
+def _run_size(
+    workdir: str, rows: int, files: int, repeat: int, latency: float
+) -> List[Dict[str, object]]:
+    remote_dir = os.path.join(workdir, "remote")
+    local_dir = os.path.join(workdir, "local")
+    generated = data.generate(remote_dir, rows, files)
+    basemes = [path for path in generated if "BaseMes" in os.path.basename(path)]
+    ordens_txt, ordens_zip = generated[-2], generated[-1]
+    basemes_bytes = sum(os.path.getsize(path) for path in basemes)
+    results = []
+
+    names = [os.path.basename(path) for path in basemes]
+    transfer = TransferConfig()
+    with LocalSftpServer(workdir, latency=latency) as server:
+        transport = open_transport("127.0.0.1", server.port, transfer)
+        try:
+            transport.connect(username="bench", password="bench")
+            sftp = open_sftp(transport, transfer)
+
+            def download() -> None:
+                download_files(
+                    sftp, "/remote", names, local_dir, transport, transfer=transfer
+                )
+
+            seconds, _ = _timed(
+                repeat, lambda: shutil.rmtree(local_dir, ignore_errors=True), download
+            )
+        finally:
+            transport.close()
+    results.append(_result("download_files", rows * files, basemes_bytes, seconds))
+
+    zip_copy = os.path.join(local_dir, os.path.basename(ordens_zip))
+    unzip_dir = os.path.join(workdir, "unzip")
+    seconds, _ = _timed(
+        repeat,
+        lambda: shutil.copyfile(ordens_zip, zip_copy),
+        lambda: extract_zip(zip_copy, unzip_dir),
+    )
+    results.append(_result("extract_zip", rows, os.path.getsize(ordens_zip), seconds))
+
+    seconds, df = _timed(
+        repeat, _noop, lambda: create_dataframe_from_txt(local_dir, EXPECTED_COLUMNS)
+    )
+    results.append(
+        _result("create_dataframe_from_txt", len(df), basemes_bytes, seconds)
+    )
+
+    seconds, ordens = _timed(repeat, _noop, lambda: processar_ordens_filhas(ordens_txt))
+    results.append(
+        _result(
+            "processar_ordens_filhas", len(ordens), os.path.getsize(ordens_txt), seconds
+        )
+    )
+
+    db_path = os.path.join(workdir, "bench.db")
+
+    def load() -> None:
+        loader = SqliteBulkLoader.from_path(db_path, "EfetividadeLeitura")
+        try:
+            loader.load(df)
+        finally:
+            loader.close()
+
+    def reset_db() -> None:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    seconds, _ = _timed(repeat, reset_db, load)
+    results.append(_result("sqlite_load", len(df), basemes_bytes, seconds))
+    return results
+
+
+def _versions() -> Dict[str, Optional[str]]:
+    versions: Dict[str, Optional[str]] = {"python": platform.python_version()}
+    for package in ("extract-enel-sftp", "pandas", "numpy", "paramiko", "pyarrow"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def run_suite(
+    sizes: List[int], files: int = 2, repeat: int = 1, latency: float = 0.0
+) -> Dict[str, object]:
+    results = []
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            for result in _run_size(workdir, rows, files, repeat, latency):
+                result["size"] = rows
+                results.append(result)
+                print(
+                    f"{rows:>10,} linhas  {result['step']:<28}"
+                    f"{result['seconds']:9.3f}s",
+                    file=sys.stderr,
+                )
+    return {
+        "suite_version": SUITE_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "versions": _versions(),
+        "parameters": {"files": files, "repeat": repeat, "latency": latency},
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 500_000],
+        help="Linhas por arquivo em cada rodada",
+    )
+    parser.add_argument("--files", type=int, default=2, help="Arquivos BaseMes")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--output",
+        help="Arquivo JSON de saida (padrao: stdout; o progresso vai para o stderr)",
+    )
+    args = parser.parse_args(argv)
+
+    # Sem --output o stdout leva so o JSON: o progresso e os print das etapas
+    # medidas vao para o stderr.
+    with redirect_stdout(sys.stderr):
+        report = run_suite(args.rows, args.files, args.repeat, args.latency_ms / 1000)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Resultados gravados em {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
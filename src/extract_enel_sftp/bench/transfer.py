@@ -0,0 +1,107 @@
+"""Compare plain ``sftp.get`` with the pipelined transfer engine.
+
+Uso:
+    python -m extract_enel_sftp.bench.transfer --size-mb 64 --latency-ms 20
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import paramiko
+
+from ..config import TransferConfig
+from ..transfer import fetch_file, open_sftp, open_transport
+from .sftp_server import LocalSftpServer
+
+
+def _write_payload(path: str, size: int) -> None:
+    chunk = os.urandom(1024 * 1024)
+    with open(path, "wb") as handle:
+        remaining = size
+        while remaining > 0:
+            handle.write(chunk[: min(len(chunk), remaining)])
+            remaining -= len(chunk)
+
+
+def _timed_plain_get(port: int, remote_file: str, local_file: str) -> float:
+    transport = paramiko.Transport(("127.0.0.1", port))
+    try:
+        transport.connect(username="bench", password="bench")
+        sftp = paramiko.SFTPClient.from_transport(transport)
+        started = time.monotonic()
+        sftp.get(remote_file, local_file)
+        return time.monotonic() - started
+    finally:
+        transport.close()
+
+
+def _timed_engine(
+    port: int, remote_file: str, local_file: str, transfer: TransferConfig
+) -> float:
+    transport = open_transport("127.0.0.1", port, transfer)
+    try:
+        transport.connect(username="bench", password="bench")
+        sftp = open_sftp(transport, transfer)
+        return fetch_file(sftp, remote_file, local_file, transfer).seconds
+    finally:
+        transport.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = TransferConfig()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--block-size", type=int, default=defaults.block_size)
+    parser.add_argument("--max-requests", type=int, default=defaults.max_requests)
+    parser.add_argument("--window-size", type=int, default=defaults.window_size)
+    parser.add_argument(
+        "--max-packet-size", type=int, default=defaults.max_packet_size
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    transfer = TransferConfig(
+        block_size=args.block_size,
+        max_requests=args.max_requests,
+        window_size=args.window_size,
+        max_packet_size=args.max_packet_size,
+    )
+    size = args.size_mb * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as workdir:
+        remote_dir = os.path.join(workdir, "remote")
+        os.makedirs(remote_dir)
+        _write_payload(os.path.join(remote_dir, "payload.bin"), size)
+        local_file = os.path.join(workdir, "payload.bin")
+
+        with LocalSftpServer(workdir, latency=args.latency_ms / 1000) as server:
+            plain: List[float] = []
+            engine: List[float] = []
+            for _ in range(args.repeat):
+                plain.append(
+                    _timed_plain_get(server.port, "/remote/payload.bin", local_file)
+                )
+                engine.append(
+                    _timed_engine(
+                        server.port, "/remote/payload.bin", local_file, transfer
+                    )
+                )
+
+    plain_rate = size / min(plain) / 1024 / 1024
+    engine_rate = size / min(engine) / 1024 / 1024
+    print(f"Arquivo: {args.size_mb} MB | latencia: {args.latency_ms:.0f} ms")
+    print(f"Parametros: {transfer}")
+    print(f"sftp.get   : {min(plain):7.2f}s  {plain_rate:8.2f} MB/s")
+    print(f"fetch_file : {min(engine):7.2f}s  {engine_rate:8.2f} MB/s")
+    print(f"Ganho      : {engine_rate / plain_rate:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
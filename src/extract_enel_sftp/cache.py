@@ -0,0 +1,145 @@
+"""Local Parquet cache of parsed, column-projected frames."""
+import hashlib
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from .config import ParseCacheConfig
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+    pq = None
+
+
+class ParseCache:
+    """Parquet files keyed by source path, size, mtime and schema version.
+
+    ``namespace`` separates parsers (efetividade, ordens filhas) and
+    ``schema_version`` must be bumped whenever a parser changes its output,
+    so stale entries are simply never hit again and age out via eviction.
+    """
+
+    def __init__(
+        self, config: ParseCacheConfig, namespace: str, schema_version: int
+    ) -> None:
+        self.cache_dir = os.path.join(config.cache_dir, namespace)
+        self.max_bytes = config.max_bytes
+        self.namespace = namespace
+        self.schema_version = schema_version
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, source_path: str, extra: str = "") -> str:
+        stat = os.stat(source_path)
+        fingerprint = "|".join(
+            [
+                os.path.abspath(source_path),
+                str(stat.st_size),
+                str(stat.st_mtime_ns),
+                self.namespace,
+                str(self.schema_version),
+                extra,
+            ]
+        )
+        digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.parquet")
+
+    def _hit(self, source_path: str, extra: str) -> Optional[str]:
+        entry = self._entry_path(source_path, extra)
+        if not os.path.exists(entry):
+            return None
+        os.utime(entry)
+        logger.info("Cache de parsing: %s", os.path.basename(source_path))
+        return entry
+
+    def get(self, source_path: str, extra: str = "") -> Optional[pd.DataFrame]:
+        entry = self._hit(source_path, extra)
+        if entry is None:
+            return None
+        try:
+            return pd.read_parquet(entry)
+        except Exception as exc:
+            logger.warning("Entrada de cache invalida %s: %s", entry, exc)
+            os.remove(entry)
+            return None
+
+    def iter_chunks(
+        self, source_path: str, chunk_size: int, extra: str = ""
+    ) -> Optional[Iterator[pd.DataFrame]]:
+        entry = self._hit(source_path, extra)
+        if entry is None:
+            return None
+        parquet = pq.ParquetFile(entry)
+        return (
+            batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunk_size)
+        )
+
+    def put(self, source_path: str, df: pd.DataFrame, extra: str = "") -> None:
+        entry = self._entry_path(source_path, extra)
+        tmp_path = f"{entry}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, entry)
+        except Exception as exc:
+            logger.warning("Falha ao gravar cache de %s: %s", source_path, exc)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    @contextmanager
+    def writer(self, source_path: str, columns: List[str], extra: str = ""):
+        """Writes a text-only frame chunk by chunk; kept only on success."""
+        entry = self._entry_path(source_path, extra)
+        tmp_path = f"{entry}.{uuid.uuid4().hex}.tmp"
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        parquet_writer = pq.ParquetWriter(tmp_path, schema)
+
+        def write(df: pd.DataFrame) -> None:
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            parquet_writer.write_table(table)
+
+        try:
+            yield write
+        except BaseException:
+            parquet_writer.close()
+            os.remove(tmp_path)
+            raise
+        parquet_writer.close()
+        os.replace(tmp_path, entry)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".parquet"):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            logger.info("Cache de parsing: removido %s", os.path.basename(path))
+
+
+def open_parse_cache(
+    config: Optional[ParseCacheConfig], namespace: str, schema_version: int
+) -> Optional[ParseCache]:
+    if config is None or not config.cache_dir:
+        return None
+    if pq is None:
+        logger.warning("Cache de parsing desativado: pyarrow nao esta instalado.")
+        return None
+    return ParseCache(config, namespace, schema_version)
@@ -1,32 +1,117 @@
 import argparse
-from dataclasses import replace
-from typing import List, Optional
-
-from .config import (
-    default_efetividade_config,
-    default_extractor_config,
-    default_password_sftp_config,
-    default_password_sftp_regex_config,
-)
-from .etl.efetividade import run_efetividade_etl
-from .extractor import run_extraction
+from contextlib import nullcontext
+from dataclasses import dataclass
+from importlib import import_module
+from typing import Callable, List, Optional
+
+from .config import default_metrics_config
 from .logging_config import setup_logging
-from .processing.ordens_filhas import processar_ordens_filhas
-from .tools.sftp_password import run_password_test
-from .tools.sftp_password_regex import run_password_regex_test
+from .metrics import start_run, write_run_report
+
+# Os comandos ficam em commands/ e so sao importados quando executados:
+# --help, extract e os testes SFTP nao carregam pandas nem SQLAlchemy.
+
+
+def _no_arguments(parser: argparse.ArgumentParser) -> None:
+    return None
+
+
+def _etl_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Le os BaseMes direto do SFTP, sem gravar em disco",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="No modo --stream, grava tambem uma copia local dos arquivos",
+    )
+    parser.add_argument("--file-month", dest="file_month")
 
 
-def _apply_test_overrides(config, args):
-    updated = config
-    if args.file_month:
-        updated = replace(updated, file_month=args.file_month)
-    if args.file_prefix:
-        updated = replace(updated, file_prefix=args.file_prefix)
-    if args.download_dir:
-        updated = replace(updated, download_base_dir=args.download_dir)
-    if args.remote_path:
-        updated = replace(updated, remote_path=args.remote_path)
-    return updated
+def _pipeline_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--file-month", dest="file_month")
+
+
+def _ordens_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--arquivo", help="Caminho do arquivo de ordens filhas")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Le o zip de ordens filhas direto do SFTP, sem gravar em disco",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="No modo --stream, grava tambem uma copia local do arquivo",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Usa tipos compactos (categorias, float32) e mostra a memoria por coluna",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processos que leem faixas do arquivo local em paralelo (padrao 1)",
+    )
+
+
+def _test_sftp_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--file-month", dest="file_month")
+    parser.add_argument("--file-prefix", dest="file_prefix")
+    parser.add_argument("--download-dir", dest="download_dir")
+    parser.add_argument("--remote-path", dest="remote_path")
+
+
+@dataclass(frozen=True)
+class Command:
+    name: str
+    help: str
+    target: str
+    arguments: Callable[[argparse.ArgumentParser], None] = _no_arguments
+
+    def load(self) -> Callable[[argparse.Namespace], int]:
+        """Imports ``commands.<module>`` and returns the handler function."""
+        module, function = self.target.split(":")
+        return getattr(import_module(f".commands.{module}", __package__), function)
+
+
+COMMANDS = [
+    Command("extract", "Executa a extracao via SFTP", "extract:run"),
+    Command(
+        "etl",
+        "Executa a carga de Efetividade no SQL Server",
+        "etl:run",
+        _etl_arguments,
+    ),
+    Command(
+        "pipeline",
+        "Baixa, descompacta, le e carrega a Efetividade em estagios paralelos",
+        "pipeline:run",
+        _pipeline_arguments,
+    ),
+    Command(
+        "ordens-filhas",
+        "Processa o arquivo de ordens filhas",
+        "ordens_filhas:run",
+        _ordens_arguments,
+    ),
+    Command(
+        "test-sftp",
+        "Teste SFTP com filtro por prefixo/mes",
+        "sftp_tests:run_password",
+        _test_sftp_arguments,
+    ),
+    Command(
+        "test-sftp-regex",
+        "Teste SFTP com filtro regex",
+        "sftp_tests:run_regex",
+        _test_sftp_arguments,
+    ),
+]
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -34,70 +119,66 @@ def build_parser() -> argparse.ArgumentParser:
         prog="enel-sftp",
         description="Extracao SFTP e processamento de dados ENEL",
     )
-    subparsers = parser.add_subparsers(dest="command", required=True)
-
-    subparsers.add_parser("extract", help="Executa a extracao via SFTP")
-    subparsers.add_parser("etl", help="Executa a carga de Efetividade no SQL Server")
-
-    ordens_parser = subparsers.add_parser(
-        "ordens-filhas", help="Processa o arquivo de ordens filhas"
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Grava perfil de CPU (pstats e pilhas por etapa) em --profile-dir",
     )
-    ordens_parser.add_argument(
-        "--arquivo", help="Caminho do arquivo de ordens filhas"
+    parser.add_argument(
+        "--profile-dir",
+        default="./archives/profile",
+        metavar="DIR",
+        help="Diretorio dos perfis (padrao ./archives/profile)",
     )
-
-    test_parser = subparsers.add_parser(
-        "test-sftp", help="Teste SFTP com filtro por prefixo/mes"
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Com --profile, rastreia tambem as alocacoes (tracemalloc)",
     )
-    test_parser.add_argument("--file-month", dest="file_month")
-    test_parser.add_argument("--file-prefix", dest="file_prefix")
-    test_parser.add_argument("--download-dir", dest="download_dir")
-    test_parser.add_argument("--remote-path", dest="remote_path")
-
-    regex_parser = subparsers.add_parser(
-        "test-sftp-regex", help="Teste SFTP com filtro regex"
+    parser.add_argument(
+        "--profile-memory-frames",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Niveis de pilha por alocacao (padrao 1; mais niveis deixam a "
+        "execucao bem mais lenta)",
     )
-    regex_parser.add_argument("--file-month", dest="file_month")
-    regex_parser.add_argument("--file-prefix", dest="file_prefix")
-    regex_parser.add_argument("--download-dir", dest="download_dir")
-    regex_parser.add_argument("--remote-path", dest="remote_path")
-
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in COMMANDS:
+        command.arguments(subparsers.add_parser(command.name, help=command.help))
     return parser
 
 
 def main(argv: Optional[List[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
+    commands = {command.name: command for command in COMMANDS}
+    if args.command not in commands:
+        parser.print_help()
+        return 1
+
+    # Cada execucao grava um relatorio (JSON e, opcionalmente, Prometheus),
+    # inclusive quando o comando falha.
+    metrics = start_run(args.command)
+    profiler = nullcontext()
+    if args.profile:
+        from .profiling import Profiler
 
-    if args.command == "extract":
         setup_logging()
-        config = default_extractor_config()
-        run_extraction(config)
-        return 0
-
-    if args.command == "etl":
-        config = default_efetividade_config()
-        run_efetividade_etl(config)
-        return 0
-
-    if args.command == "ordens-filhas":
-        df = processar_ordens_filhas(args.arquivo)
-        print(df.head())
-        print(f"Linhas processadas: {len(df)}")
-        return 0
-
-    if args.command == "test-sftp":
-        config = _apply_test_overrides(default_password_sftp_config(), args)
-        run_password_test(config)
-        return 0
-
-    if args.command == "test-sftp-regex":
-        config = _apply_test_overrides(default_password_sftp_regex_config(), args)
-        run_password_regex_test(config)
-        return 0
-
-    parser.print_help()
-    return 1
+        memory_frames = args.profile_memory_frames if args.profile_memory else 0
+        profiler = Profiler(args.profile_dir, args.command, memory_frames)
+    success = False
+    try:
+        with profiler:
+            code = commands[args.command].load()(args)
+        success = code == 0
+        return code
+    finally:
+        metrics.finish(success)
+        try:
+            write_run_report(metrics, default_metrics_config())
+        except OSError as exc:
+            print(f"Falha ao gravar o relatorio da execucao: {exc}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+import argparse
+from dataclasses import replace
+
+from ..config import default_efetividade_config, default_password_sftp_regex_config
+from ..etl.efetividade import run_efetividade_etl
+from ..streaming import stream_efetividade
+
+
+def run(args: argparse.Namespace) -> int:
+    config = default_efetividade_config()
+    if args.stream:
+        sftp_config = default_password_sftp_regex_config()
+        if args.file_month:
+            sftp_config = replace(sftp_config, file_month=args.file_month)
+        stream_efetividade(sftp_config, config, archive=args.archive)
+    else:
+        run_efetividade_etl(config)
+    return 0
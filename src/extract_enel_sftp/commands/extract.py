@@ -0,0 +1,11 @@
+import argparse
+
+from ..config import default_extractor_config
+from ..extractor import run_extraction
+from ..logging_config import setup_logging
+
+
+def run(args: argparse.Namespace) -> int:
+    setup_logging()
+    run_extraction(default_extractor_config())
+    return 0
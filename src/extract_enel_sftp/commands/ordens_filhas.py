@@ -0,0 +1,24 @@
+import argparse
+
+from ..config import default_extractor_config, default_parse_cache_config
+from ..logging_config import setup_logging
+from ..processing.ordens_filhas import processar_ordens_filhas
+from ..streaming import stream_ordens_filhas
+
+
+def run(args: argparse.Namespace) -> int:
+    if args.stream:
+        setup_logging()
+        df = stream_ordens_filhas(
+            default_extractor_config(), archive=args.archive, compact=args.compact
+        )
+    else:
+        df = processar_ordens_filhas(
+            args.arquivo,
+            default_parse_cache_config(),
+            compact=args.compact,
+            workers=args.workers,
+        )
+    print(df.head())
+    print(f"Linhas processadas: {len(df)}")
+    return 0
@@ -0,0 +1,15 @@
+import argparse
+from dataclasses import replace
+
+from ..config import default_efetividade_config, default_password_sftp_regex_config
+from ..logging_config import setup_logging
+from ..pipeline import run_pipeline
+
+
+def run(args: argparse.Namespace) -> int:
+    setup_logging()
+    sftp_config = default_password_sftp_regex_config()
+    if args.file_month:
+        sftp_config = replace(sftp_config, file_month=args.file_month)
+    run_pipeline(sftp_config, default_efetividade_config())
+    return 0
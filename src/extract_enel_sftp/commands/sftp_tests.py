@@ -0,0 +1,30 @@
+import argparse
+from dataclasses import replace
+
+from ..config import default_password_sftp_config, default_password_sftp_regex_config
+from ..tools.sftp_password import run_password_test
+from ..tools.sftp_password_regex import run_password_regex_test
+
+
+def _apply_test_overrides(config, args):
+    updated = config
+    if args.file_month:
+        updated = replace(updated, file_month=args.file_month)
+    if args.file_prefix:
+        updated = replace(updated, file_prefix=args.file_prefix)
+    if args.download_dir:
+        updated = replace(updated, download_base_dir=args.download_dir)
+    if args.remote_path:
+        updated = replace(updated, remote_path=args.remote_path)
+    return updated
+
+
+def run_password(args: argparse.Namespace) -> int:
+    run_password_test(_apply_test_overrides(default_password_sftp_config(), args))
+    return 0
+
+
+def run_regex(args: argparse.Namespace) -> int:
+    config = _apply_test_overrides(default_password_sftp_regex_config(), args)
+    run_password_regex_test(config)
+    return 0
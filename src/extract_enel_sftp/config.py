@@ -1,14 +1,21 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import List, Tuple
 
 
 def _env(name: str, default: str) -> str:
     return os.getenv(name, default)
 
 
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "sim", "s")
+
+
 @dataclass(frozen=True)
 class SshKeyHostConfig:
     host: str
@@ -17,6 +24,26 @@ class SshKeyHostConfig:
     key_path: str
 
 
+@dataclass(frozen=True)
+class TransferConfig:
+    block_size: int = 32768
+    max_requests: int = 128
+    window_size: int = 16 * 1024 * 1024
+    max_packet_size: int = 32768
+    resume: bool = True
+    hash_algorithm: str = ""
+    keepalive: int = 30
+
+
+@dataclass(frozen=True)
+class ReadinessConfig:
+    probes: List[str] = field(default_factory=lambda: ["tcp"])
+    timeout: float = 180.0
+    connect_timeout: float = 2.0
+    initial_delay: float = 0.25
+    max_delay: float = 2.0
+
+
 @dataclass(frozen=True)
 class ExtractorConfig:
     vpn_portal: str
@@ -26,6 +53,12 @@ class ExtractorConfig:
     remote_path: str
     files: List[str]
     download_base_dir: str
+    max_parallel_hosts: int = 4
+    host_timeout: float = 1800.0
+    max_parallel_downloads: int = 3
+    transfer: TransferConfig = field(default_factory=TransferConfig)
+    manifest_path: str = ""
+    readiness: ReadinessConfig = field(default_factory=ReadinessConfig)
 
 
 @dataclass(frozen=True)
@@ -38,11 +71,37 @@ class SqlServerConfig:
     table: str
 
 
+@dataclass(frozen=True)
+class ParseCacheConfig:
+    cache_dir: str = ""
+    max_bytes: int = 2048 * 1024 * 1024
+
+
+# Chave de negocio de uma leitura: linhas com a mesma chave sao duplicadas.
+DEDUP_KEY_COLUMNS = ("CO", "REFERENCIA", "NUMERO_CLIENTE", "NUMERO_MEDIDOR")
+
+
 @dataclass(frozen=True)
 class EfetividadeConfig:
     download_base_dir: str
     expected_columns: List[str]
     sql_server: SqlServerConfig
+    chunk_size: int = 100_000
+    load_batch_size: int = 10_000
+    load_workers: int = 1
+    load_method: str = "executemany"
+    sqlite_path: str = ""
+    parse_workers: int = 1
+    parse_cache: ParseCacheConfig = field(default_factory=ParseCacheConfig)
+    ledger_table: str = ""
+    compact_frames: bool = False
+    pipeline_queue_size: int = 2
+    validation: bool = True
+    reject_path: str = ""
+    dedup_dir: str = ""
+    dedup_key: Tuple[str, ...] = DEDUP_KEY_COLUMNS
+    split_workers: int = 1
+    increment_dir: str = ""
 
 
 @dataclass(frozen=True)
@@ -55,6 +114,19 @@ class PasswordSftpConfig:
     file_prefix: str
     file_month: str
     download_base_dir: str
+    transfer: TransferConfig = field(default_factory=TransferConfig)
+    manifest_path: str = ""
+    index_path: str = ""
+    index_ttl: float = 300.0
+    tail_sync: bool = False
+    increment_dir: str = ""
+    tail_header: bool = True
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    report_path: str = ""
+    prometheus_path: str = ""
 
 
 EXPECTED_COLUMNS = [
@@ -81,6 +153,56 @@ EXPECTED_COLUMNS = [
     "LONGITUDE",
 ]
 
+# Representacao compacta em memoria de EXPECTED_COLUMNS (processing/compact.py).
+# Identificadores continuam texto para preservar zeros a esquerda.
+EXPECTED_COLUMN_TYPES = {
+    "CO": "category",
+    "REFERENCIA": "category",
+    "NUMERO_CLIENTE": "text",
+    "MATRICULA_LEITURISTA": "category",
+    "SECTOR": "category",
+    "LOCALIDADE": "category",
+    "ZONA": "category",
+    "MUNICIPIO": "category",
+    "BAIRRO": "category",
+    "IRREG_LIDA": "category",
+    "IRREG_OPERADOR": "category",
+    "NUMERO_MEDIDOR": "text",
+    "DESC_IRREG_LIDA": "category",
+    "DESC_IRREG_OPERADOR": "category",
+    "DX": "category",
+    "TELEMEDIDO": "category",
+    "UNIDADE_LEITURA": "category",
+    "CODIGO_MUNICIPIO": "category",
+    "FAT_BIMESTRAL": "integer",
+    "LATITUDE": "float32",
+    "LONGITUDE": "float32",
+    "source_file": "category",
+}
+
+
+def default_transfer_config() -> TransferConfig:
+    return TransferConfig(
+        block_size=int(_env("ENEL_SFTP_BLOCK_SIZE", "32768")),
+        max_requests=int(_env("ENEL_SFTP_MAX_REQUESTS", "128")),
+        window_size=int(_env("ENEL_SFTP_WINDOW_SIZE", str(16 * 1024 * 1024))),
+        max_packet_size=int(_env("ENEL_SFTP_MAX_PACKET_SIZE", "32768")),
+        resume=_env_bool("ENEL_SFTP_RESUME", True),
+        hash_algorithm=_env("ENEL_SFTP_HASH", ""),
+        keepalive=int(_env("ENEL_SFTP_KEEPALIVE", "30")),
+    )
+
+
+def default_readiness_config() -> ReadinessConfig:
+    probes = _env("ENEL_READINESS_PROBES", "tcp")
+    return ReadinessConfig(
+        probes=[name.strip() for name in probes.split(",") if name.strip()],
+        timeout=float(_env("ENEL_READINESS_TIMEOUT", "180")),
+        connect_timeout=float(_env("ENEL_READINESS_CONNECT_TIMEOUT", "2")),
+        initial_delay=float(_env("ENEL_READINESS_INITIAL_DELAY", "0.25")),
+        max_delay=float(_env("ENEL_READINESS_MAX_DELAY", "2")),
+    )
+
 
 def default_extractor_config() -> ExtractorConfig:
     vpn_portal = _env("ENEL_VPN_PORTAL", "vpn.enel.com")
@@ -107,6 +229,9 @@ def default_extractor_config() -> ExtractorConfig:
         "COELCE_elaazisysd00_ordemfilhas.txt.zip",
     ]
     download_base_dir = _env("ENEL_DOWNLOAD_BASE_DIR", "./archives")
+    max_parallel_hosts = int(_env("ENEL_MAX_PARALLEL_HOSTS", "4"))
+    host_timeout = float(_env("ENEL_HOST_TIMEOUT", "1800"))
+    max_parallel_downloads = int(_env("ENEL_MAX_PARALLEL_DOWNLOADS", "3"))
 
     return ExtractorConfig(
         vpn_portal=vpn_portal,
@@ -116,6 +241,29 @@ def default_extractor_config() -> ExtractorConfig:
         remote_path=remote_path,
         files=files,
         download_base_dir=download_base_dir,
+        max_parallel_hosts=max_parallel_hosts,
+        host_timeout=host_timeout,
+        max_parallel_downloads=max_parallel_downloads,
+        transfer=default_transfer_config(),
+        manifest_path=_env(
+            "ENEL_SYNC_MANIFEST",
+            os.path.join(download_base_dir, ".sync_manifest.json"),
+        ),
+        readiness=default_readiness_config(),
+    )
+
+
+def default_parse_cache_config() -> ParseCacheConfig:
+    return ParseCacheConfig(
+        cache_dir=_env("ENEL_PARSE_CACHE_DIR", ""),
+        max_bytes=int(_env("ENEL_PARSE_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+    )
+
+
+def default_metrics_config() -> MetricsConfig:
+    return MetricsConfig(
+        report_path=_env("ENEL_METRICS_REPORT", "./archives/run_report.json"),
+        prometheus_path=_env("ENEL_METRICS_PROMETHEUS_FILE", ""),
     )
 
 
@@ -135,6 +283,28 @@ def default_efetividade_config() -> EfetividadeConfig:
         ),
         expected_columns=EXPECTED_COLUMNS,
         sql_server=sql_server,
+        chunk_size=int(_env("ENEL_EFETIVIDADE_CHUNK_SIZE", "100000")),
+        load_batch_size=int(_env("ENEL_LOAD_BATCH_SIZE", "10000")),
+        load_workers=int(_env("ENEL_LOAD_WORKERS", "1")),
+        load_method=_env("ENEL_LOAD_METHOD", "executemany"),
+        sqlite_path=_env("ENEL_EFETIVIDADE_SQLITE_PATH", ""),
+        parse_workers=int(_env("ENEL_PARSE_WORKERS", "1")),
+        parse_cache=default_parse_cache_config(),
+        ledger_table=_env("ENEL_LOAD_LEDGER_TABLE", "EfetividadeCargaArquivos"),
+        compact_frames=_env_bool("ENEL_COMPACT_FRAMES", False),
+        pipeline_queue_size=int(_env("ENEL_PIPELINE_QUEUE_SIZE", "2")),
+        validation=_env_bool("ENEL_VALIDATION", True),
+        reject_path=_env(
+            "ENEL_REJECT_FILE", "./archives/efetividade_rejeitados.txt"
+        ),
+        dedup_dir=_env("ENEL_DEDUP_DIR", ""),
+        dedup_key=tuple(
+            column.strip()
+            for column in _env("ENEL_DEDUP_KEY", ",".join(DEDUP_KEY_COLUMNS)).split(",")
+            if column.strip()
+        ),
+        split_workers=int(_env("ENEL_PARSE_SPLIT_WORKERS", "1")),
+        increment_dir=_env("ENEL_TAIL_INCREMENT_DIR", "./archives/.incrementos"),
     )
 
 
@@ -150,6 +320,15 @@ def default_password_sftp_config() -> PasswordSftpConfig:
         file_prefix=_env("ENEL_TEST_FILE_PREFIX", "BaseMes"),
         file_month=_env("ENEL_TEST_FILE_MONTH", "202602"),
         download_base_dir=_env("ENEL_TEST_DOWNLOAD_BASE_DIR", "./archives"),
+        transfer=default_transfer_config(),
+        manifest_path=_env(
+            "ENEL_TEST_SYNC_MANIFEST", "./archives/.sync_manifest_efetividade.json"
+        ),
+        index_path=_env("ENEL_TEST_REMOTE_INDEX", "./archives/.remote_index.json"),
+        index_ttl=float(_env("ENEL_REMOTE_INDEX_TTL", "300")),
+        tail_sync=_env_bool("ENEL_TAIL_SYNC", False),
+        increment_dir=_env("ENEL_TAIL_INCREMENT_DIR", "./archives/.incrementos"),
+        tail_header=_env_bool("ENEL_TAIL_HEADER", True),
     )
 
 
@@ -167,4 +346,13 @@ def default_password_sftp_regex_config() -> PasswordSftpConfig:
         download_base_dir=_env(
             "ENEL_TEST_DOWNLOAD_BASE_DIR", "./archives/EfetividadeLeitura"
         ),
+        transfer=default_transfer_config(),
+        manifest_path=_env(
+            "ENEL_TEST_SYNC_MANIFEST", "./archives/.sync_manifest_efetividade.json"
+        ),
+        index_path=_env("ENEL_TEST_REMOTE_INDEX", "./archives/.remote_index.json"),
+        index_ttl=float(_env("ENEL_REMOTE_INDEX_TTL", "300")),
+        tail_sync=_env_bool("ENEL_TAIL_SYNC", False),
+        increment_dir=_env("ENEL_TAIL_INCREMENT_DIR", "./archives/.incrementos"),
+        tail_header=_env_bool("ENEL_TAIL_HEADER", True),
     )
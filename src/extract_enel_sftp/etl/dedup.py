@@ -0,0 +1,318 @@
+"""Persistent index of business-key hashes that keeps duplicate rows out."""
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config import EfetividadeConfig
+from ..metrics import get_metrics
+
+SOURCE_COLUMN = "source_file"
+MANIFEST_NAME = "index.json"
+
+HASH_DTYPE = np.dtype("<u8")
+OWNER_DTYPE = np.dtype("<u4")
+
+# Um segmento novo e fundido com o anterior enquanto o anterior nao for mais
+# que MERGE_RATIO vezes maior: o numero de segmentos cresce com o log do
+# historico e cada chave e regravada poucas vezes.
+MERGE_RATIO = 2
+MAX_SEGMENTS = 16
+MERGE_BLOCK = 1 << 20
+
+
+def row_hashes(df: pd.DataFrame, key_columns: Tuple[str, ...]) -> np.ndarray:
+    """64-bit hash of the key columns of each row.
+
+    ``hash_pandas_object`` gives the same value for object, Arrow string and
+    categorical columns, so compacted frames hash like freshly parsed ones.
+    """
+    hashes = pd.util.hash_pandas_object(df[list(key_columns)], index=False)
+    return hashes.to_numpy(dtype=HASH_DTYPE)
+
+
+@dataclass
+class _Segment:
+    name: str
+    hashes: np.ndarray
+    owners: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+
+def _member(
+    sorted_hashes: np.ndarray, hashes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Posicao de cada hash em um array ordenado e se ele esta presente.
+    if len(sorted_hashes) == 0:
+        empty = np.zeros(len(hashes), dtype=np.intp)
+        return empty, np.zeros(len(hashes), dtype=bool)
+    positions = np.searchsorted(sorted_hashes, hashes)
+    positions = np.minimum(positions, len(sorted_hashes) - 1)
+    return positions, sorted_hashes[positions] == hashes
+
+
+class DedupIndex:
+    """Sorted, memory-mapped segments of row hashes, each tagged with the id
+    of the source file that loaded it.
+
+    Lookups binary-search the segments through ``np.memmap``, so only the
+    touched pages are read and memory stays bounded as the history grows.
+    New keys stay pending until ``commit`` (call it once the rows are in the
+    database) and are written as a new segment; small segments are merged
+    in blocks of ``MERGE_BLOCK`` keys. A file whose rows are being replaced
+    (``replace``) gets a new id and its old keys stop counting. With 64-bit
+    hashes, 100 million keys give roughly a 1 in 3000 chance of a single
+    false duplicate.
+    """
+
+    def __init__(self, directory: str, key_columns: Tuple[str, ...]) -> None:
+        self.directory = directory
+        self.key_columns = tuple(key_columns)
+        self.rows = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+        self._files: Dict[str, int] = {}
+        self._next_id = 1
+        self._next_segment = 1
+        self._segments: List[_Segment] = []
+        self._new_ids: Dict[str, int] = {}
+        self._replaced: Set[int] = set()
+        self._pending = np.empty(0, dtype=HASH_DTYPE)
+        self._pending_hashes: List[np.ndarray] = []
+        self._pending_owners: List[np.ndarray] = []
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        manifest = self._path(MANIFEST_NAME)
+        if not os.path.exists(manifest):
+            return
+        with open(manifest, "r", encoding="utf-8") as handle:
+            raw = json.load(handle)
+        if tuple(raw["key_columns"]) != self.key_columns:
+            raise ValueError(
+                f"O indice de duplicidade em {self.directory} usa a chave "
+                f"{','.join(raw['key_columns'])}; apague o diretorio para recria-lo "
+                f"com {','.join(self.key_columns)}"
+            )
+        self._files = raw["files"]
+        self._next_id = raw["next_id"]
+        self._next_segment = raw["next_segment"]
+        self._segments = [self._open_segment(name) for name in raw["segments"]]
+        self._remove_orphans()
+
+    def _open_segment(self, name: str) -> _Segment:
+        return _Segment(
+            name,
+            np.memmap(self._path(f"{name}.hash"), dtype=HASH_DTYPE, mode="r"),
+            np.memmap(self._path(f"{name}.owner"), dtype=OWNER_DTYPE, mode="r"),
+        )
+
+    def _remove_orphans(self) -> None:
+        # Segmentos de uma fusao interrompida ou que o Windows nao deixou
+        # apagar enquanto estavam mapeados.
+        used = {segment.name for segment in self._segments}
+        for entry in os.listdir(self.directory):
+            name, extension = os.path.splitext(entry)
+            if extension in (".hash", ".owner") and name not in used:
+                self._remove(entry)
+
+    def _remove(self, entry: str) -> None:
+        try:
+            os.remove(self._path(entry))
+        except OSError:
+            pass
+
+    def _live_ids(self) -> np.ndarray:
+        ids = set(self._files.values()) - self._replaced
+        ids.update(self._new_ids.values())
+        return np.fromiter(ids, dtype=OWNER_DTYPE, count=len(ids))
+
+    def _owner_id(self, file_name: str) -> int:
+        if file_name in self._new_ids:
+            return self._new_ids[file_name]
+        if file_name in self._files:
+            return self._files[file_name]
+        self._new_ids[file_name] = self._next_id
+        self._next_id += 1
+        return self._new_ids[file_name]
+
+    def replace(self, file_name: str) -> None:
+        """The rows of ``file_name`` are about to be deleted and reloaded."""
+        if file_name in self._files and file_name not in self._new_ids:
+            self._replaced.add(self._files[file_name])
+            self._new_ids[file_name] = self._next_id
+            self._next_id += 1
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """True where the hash is stored for a file that is still loaded."""
+        found = np.zeros(len(hashes), dtype=bool)
+        if not self._segments or len(hashes) == 0:
+            return found
+        # Consultas em ordem percorrem cada segmento em uma so direcao.
+        order = np.argsort(hashes)
+        sorted_hashes = hashes[order]
+        live = self._live_ids()
+        for segment in self._segments:
+            positions, hit = _member(segment.hashes, sorted_hashes)
+            owners = segment.owners[positions[hit]]
+            matches = np.flatnonzero(hit)[np.isin(owners, live)]
+            found[order[matches]] = True
+        return found
+
+    def filter(self, df: pd.DataFrame, file_name: str = "") -> pd.DataFrame:
+        """Drops rows already loaded, pending or repeated within ``df``.
+
+        Keys are owned by the file in the ``source_file`` column of each row.
+        """
+        started = time.monotonic()
+        hashes = row_hashes(df, self.key_columns)
+        duplicated = pd.Series(hashes).duplicated().to_numpy()
+        duplicated |= _member(self._pending, hashes)[1]
+        duplicated |= self.contains(hashes)
+
+        kept = hashes[~duplicated]
+        if len(kept):
+            codes, names = pd.factorize(df[SOURCE_COLUMN].to_numpy()[~duplicated])
+            ids = np.array([self._owner_id(str(name)) for name in names])
+            self._pending_hashes.append(kept)
+            self._pending_owners.append(ids[codes].astype(OWNER_DTYPE))
+            self._pending = np.sort(np.concatenate([self._pending, kept]))
+
+        self.rows += len(df)
+        self.duplicates += int(duplicated.sum())
+        if duplicated.any():
+            df = df[~duplicated]
+        seconds = time.monotonic() - started
+        self.seconds += seconds
+        get_metrics().record("dedup", file_name, seconds, rows=len(df))
+        return df
+
+    def discard(self) -> None:
+        """Forgets pending keys and replacements (the load was rolled back)."""
+        self._new_ids = {}
+        self._replaced = set()
+        self._pending = np.empty(0, dtype=HASH_DTYPE)
+        self._pending_hashes = []
+        self._pending_owners = []
+
+    def commit(self) -> None:
+        """Stores the pending keys; call after the rows were committed."""
+        if self._pending_hashes:
+            hashes = np.concatenate(self._pending_hashes)
+            owners = np.concatenate(self._pending_owners)
+            order = np.argsort(hashes)
+            name = self._write_segment(hashes[order], owners[order])
+            self._segments.append(self._open_segment(name))
+        elif not self._new_ids:
+            return
+        self._files.update(self._new_ids)
+        self.discard()
+        self._merge_segments()
+        self._save()
+        self._remove_orphans()
+
+    def _new_segment_name(self) -> str:
+        name = f"{self._next_segment:08d}"
+        self._next_segment += 1
+        return name
+
+    def _write_segment(self, hashes: np.ndarray, owners: np.ndarray) -> str:
+        name = self._new_segment_name()
+        hashes.astype(HASH_DTYPE, copy=False).tofile(self._path(f"{name}.hash"))
+        owners.astype(OWNER_DTYPE, copy=False).tofile(self._path(f"{name}.owner"))
+        return name
+
+    def _merge_segments(self) -> None:
+        while len(self._segments) >= 2 and (
+            len(self._segments[-2]) <= MERGE_RATIO * len(self._segments[-1])
+            or len(self._segments) > MAX_SEGMENTS
+        ):
+            newer = self._segments.pop()
+            older = self._segments.pop()
+            merged = self._merge(older, newer)
+            if merged is not None:
+                self._segments.append(merged)
+
+    def _merge(self, older: _Segment, newer: _Segment) -> Optional[_Segment]:
+        # Funde em blocos, sem carregar os dois segmentos inteiros: cada bloco
+        # do maior segue com as chaves do menor que vem antes do proximo bloco.
+        # Chaves de arquivos substituidos sao descartadas aqui.
+        big, small = (older, newer) if len(older) >= len(newer) else (newer, older)
+        live = self._live_ids()
+        name = self._new_segment_name()
+        written = 0
+        small_start = 0
+        with open(self._path(f"{name}.hash"), "wb") as hash_file, open(
+            self._path(f"{name}.owner"), "wb"
+        ) as owner_file:
+            for start in range(0, len(big), MERGE_BLOCK):
+                stop = start + MERGE_BLOCK
+                small_stop = len(small)
+                if stop < len(big):
+                    small_stop = int(np.searchsorted(small.hashes, big.hashes[stop]))
+                hashes = np.concatenate(
+                    [big.hashes[start:stop], small.hashes[small_start:small_stop]]
+                )
+                owners = np.concatenate(
+                    [big.owners[start:stop], small.owners[small_start:small_stop]]
+                )
+                small_start = small_stop
+
+                order = np.argsort(hashes, kind="stable")
+                hashes, owners = hashes[order], owners[order]
+                keep = np.isin(owners, live)
+                hashes, owners = hashes[keep], owners[keep]
+                unique = np.ones(len(hashes), dtype=bool)
+                unique[1:] = hashes[1:] != hashes[:-1]
+                hashes[unique].tofile(hash_file)
+                owners[unique].tofile(owner_file)
+                written += int(unique.sum())
+        if not written:
+            return None
+        return self._open_segment(name)
+
+    def _save(self) -> None:
+        manifest = self._path(MANIFEST_NAME)
+        tmp_path = f"{manifest}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "key_columns": list(self.key_columns),
+                    "files": self._files,
+                    "next_id": self._next_id,
+                    "next_segment": self._next_segment,
+                    "segments": [segment.name for segment in self._segments],
+                },
+                handle,
+                indent=2,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, manifest)
+
+    def size(self) -> int:
+        return sum(len(segment) for segment in self._segments)
+
+    def summary(self) -> List[str]:
+        megabytes = self.size() * (HASH_DTYPE.itemsize + OWNER_DTYPE.itemsize)
+        return [
+            f"Duplicidade: {self.duplicates} de {self.rows} linhas ja carregadas "
+            f"ou repetidas",
+            f"Indice de duplicidade: {self.size()} chaves em "
+            f"{len(self._segments)} segmentos ({megabytes / 1024**2:.1f} MB)",
+        ]
+
+
+def open_dedup_index(config: EfetividadeConfig) -> Optional[DedupIndex]:
+    if not config.dedup_dir:
+        return None
+    return DedupIndex(config.dedup_dir, config.dedup_key)
@@ -1,91 +1,721 @@
 import os
-from typing import List, Optional
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
-from sqlalchemy import create_engine, inspect
-from urllib.parse import quote_plus
 
-from ..config import EfetividadeConfig, SqlServerConfig
+from ..cache import ParseCache, open_parse_cache
+from ..config import (
+    EXPECTED_COLUMN_TYPES,
+    EfetividadeConfig,
+    ParseCacheConfig,
+    SqlServerConfig,
+)
+from ..metrics import StageMetric, get_metrics, timed
+from ..processing.compact import (
+    FrameCompactor,
+    concat_compact,
+    memory_report,
+    memory_usage,
+)
+from ..processing.ranges import read_file_ranges
+from ..tail_sync import Increment, discard_increment, pending_increments
+from .dedup import DedupIndex, open_dedup_index
+from .ledger import LedgerEntry, LoadLedger
+from .loader import BulkLoader, LoadStats, SqlServerBulkLoader, create_loader
+from .validation import Validator, open_validator
+
+# Incrementar sempre que a saida do parser mudar (invalida o cache de parsing).
+EFETIVIDADE_SCHEMA_VERSION = 1
+
+
+def _project_columns(df: pd.DataFrame, expected_columns: List[str]) -> pd.DataFrame:
+    for col in expected_columns:
+        if col not in df.columns:
+            df[col] = None
+    return df[expected_columns]
+
+
+def read_efetividade_file(
+    source: Union[str, IO[bytes]], file_name: str, expected_columns: List[str]
+) -> pd.DataFrame:
+    df = pd.read_csv(source, sep="|", encoding="utf-8", dtype=str)
+    df["source_file"] = file_name
+    return _project_columns(df, expected_columns + ["source_file"])
+
+
+def _open_cache(cache_config: Optional[ParseCacheConfig]) -> Optional[ParseCache]:
+    return open_parse_cache(cache_config, "efetividade", EFETIVIDADE_SCHEMA_VERSION)
+
+
+def _read_projected(source: IO[bytes], expected_columns: List[str]) -> pd.DataFrame:
+    df = pd.read_csv(source, sep="|", encoding="utf-8", dtype=str)
+    return _project_columns(df, expected_columns)
+
+
+def _parse_file_task(
+    file_path: str,
+    expected_columns: List[str],
+    cache_config: Optional[ParseCacheConfig] = None,
+    split_workers: int = 1,
+) -> Tuple[str, Optional[pd.DataFrame], Optional[str]]:
+    # Executa no processo filho: devolve so as colunas esperadas, sem a coluna
+    # source_file (constante por arquivo), para reduzir o custo de pickling.
+    file_name = os.path.basename(file_path)
+    try:
+        cache = _open_cache(cache_config)
+        cache_key = ",".join(expected_columns)
+        if cache is not None:
+            cached = cache.get(file_path, cache_key)
+            if cached is not None:
+                return file_name, cached, None
+
+        df = read_file_ranges(
+            file_path,
+            _read_projected,
+            split_workers,
+            header=True,
+            args=(expected_columns,),
+        )
+        if cache is not None:
+            cache.put(file_path, df, cache_key)
+        return file_name, df, None
+    except Exception as exc:
+        return file_name, None, str(exc)
+
+
+def iter_parsed_files(
+    file_paths: List[str],
+    expected_columns: List[str],
+    workers: int = 1,
+    cache_config: Optional[ParseCacheConfig] = None,
+    split_workers: int = 1,
+) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[str]]]:
+    """Yields ``(file_name, df, error)`` in input order.
+
+    With ``workers > 1`` files are parsed in a process pool, keeping at most
+    ``workers`` files in flight so memory stays bounded. With
+    ``split_workers > 1`` files are read one at a time, each split into byte
+    ranges parsed by that many processes (for a few very large files);
+    ``workers`` is then ignored.
+    """
+    if split_workers > 1 or workers <= 1 or len(file_paths) <= 1:
+        results = (
+            _parse_file_task(path, expected_columns, cache_config, split_workers)
+            for path in file_paths
+        )
+    else:
+        results = _iter_parsed_files_parallel(
+            file_paths, expected_columns, workers, cache_config
+        )
+
+    metrics = get_metrics()
+    for path, (seconds, (file_name, df, error)) in zip(file_paths, timed(results)):
+        # Em paralelo o tempo medido e a espera pelo resultado de cada arquivo.
+        metrics.record(
+            "parse",
+            file_name,
+            seconds,
+            _file_size(path),
+            0 if df is None else len(df),
+            error=df is None,
+        )
+        if df is not None:
+            df = df.assign(source_file=file_name)
+        yield file_name, df, error
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _iter_parsed_files_parallel(
+    file_paths: List[str],
+    expected_columns: List[str],
+    workers: int,
+    cache_config: Optional[ParseCacheConfig] = None,
+) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[str]]]:
+    paths = iter(file_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(
+            executor.submit(_parse_file_task, path, expected_columns, cache_config)
+            for path in islice(paths, workers)
+        )
+        while pending:
+            future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append(
+                    executor.submit(
+                        _parse_file_task, next_path, expected_columns, cache_config
+                    )
+                )
+            yield future.result()
+
+
+def _compact_file_frame(
+    df: pd.DataFrame, compactor: FrameCompactor, before_usage: List[pd.Series]
+) -> pd.DataFrame:
+    # Compacta arquivo a arquivo: o pico de memoria fica em um arquivo em
+    # texto puro, nao no conjunto inteiro.
+    before_usage.append(memory_usage(df))
+    return compactor.compact(df)
+
+
+def _combine_dataframes(
+    dataframes: List[pd.DataFrame], before_usage: Optional[List[pd.Series]] = None
+) -> Optional[pd.DataFrame]:
+    if not dataframes:
+        print("Nenhum DataFrame criado.")
+        return None
+
+    if before_usage:
+        combined_df = concat_compact(dataframes)
+        before = pd.concat(before_usage, axis=1).sum(axis=1)
+        print("Memoria por coluna (texto -> compacto):")
+        print(memory_report(before, memory_usage(combined_df)))
+    else:
+        combined_df = pd.concat(dataframes, ignore_index=True)
+    print(f"DataFrame combinado criado com {len(combined_df)} linhas.")
+    return combined_df
 
 
 def create_dataframe_from_txt(
-    base_dir: str, expected_columns: List[str]
+    base_dir: str,
+    expected_columns: List[str],
+    workers: int = 1,
+    cache_config: Optional[ParseCacheConfig] = None,
+    compact: bool = False,
+    split_workers: int = 1,
+    validator: Optional[Validator] = None,
 ) -> Optional[pd.DataFrame]:
-    all_files = []
-    for root, _, files in os.walk(base_dir):
-        for file_name in files:
-            if file_name.lower().endswith(".txt"):
-                all_files.append(os.path.join(root, file_name))
+    """Reads every ``.txt`` under ``base_dir`` into one frame.
 
+    With ``validator``, each file is validated while still in text and only
+    the accepted rows are kept (and compacted): compaction turns an
+    unparsable coordinate into NaN, which the rules would no longer see.
+    Pass the same validator to ``load_efetividade_frame``.
+    """
+    all_files = _list_txt_files(base_dir)
     if not all_files:
         print("Nenhum arquivo encontrado.")
         return None
 
     dataframes = []
-    for file_path in all_files:
-        file_name = os.path.basename(file_path)
-        try:
-            df = pd.read_csv(file_path, sep="|", encoding="utf-8", dtype=str)
-            df["source_file"] = file_name
+    before_usage: List[pd.Series] = []
+    compactor = FrameCompactor(EXPECTED_COLUMN_TYPES)
+    for file_name, df, error in iter_parsed_files(
+        all_files, expected_columns, workers, cache_config, split_workers
+    ):
+        if df is None:
+            print(f"Falha ao ler {file_name}: {error}")
+            continue
+        if validator is not None:
+            df = validator.apply(df, file_name)
+        if compact:
+            df = _compact_file_frame(df, compactor, before_usage)
+        dataframes.append(df)
+        print(f"Arquivo carregado: {file_name}")
 
-            for col in expected_columns:
-                if col not in df.columns:
-                    df[col] = None
-            df = df[expected_columns + ["source_file"]]
+    return _combine_dataframes(dataframes, before_usage)
 
+
+def create_dataframe_from_streams(
+    streams: Iterable[Tuple[str, IO[bytes]]],
+    expected_columns: List[str],
+    compact: bool = False,
+    validator: Optional[Validator] = None,
+) -> Optional[pd.DataFrame]:
+    dataframes = []
+    before_usage: List[pd.Series] = []
+    compactor = FrameCompactor(EXPECTED_COLUMN_TYPES)
+    for file_name, stream in streams:
+        try:
+            with get_metrics().stage("parse", file_name) as metric:
+                df = read_efetividade_file(stream, file_name, expected_columns)
+                metric.rows = len(df)
+            if validator is not None:
+                df = validator.apply(df, file_name)
+            if compact:
+                df = _compact_file_frame(df, compactor, before_usage)
             dataframes.append(df)
-            print(f"Arquivo carregado: {file_name}")
+            print(f"Arquivo carregado (streaming): {file_name}")
         except Exception as exc:
             print(f"Falha ao ler {file_name}: {exc}")
 
-    if not dataframes:
-        print("Nenhum DataFrame criado.")
-        return None
+    return _combine_dataframes(dataframes, before_usage)
 
-    combined_df = pd.concat(dataframes, ignore_index=True)
-    print(f"DataFrame combinado criado com {len(combined_df)} linhas.")
-    return combined_df
 
+def insert_dataframe_to_sqlserver(
+    df: pd.DataFrame,
+    sql_config: SqlServerConfig,
+    loader: Optional[BulkLoader] = None,
+) -> bool:
+    owns_loader = loader is None
+    try:
+        if loader is None:
+            loader = SqlServerBulkLoader.from_config(sql_config)
+
+        stats = loader.load(df)
+        print(f"{stats.rows} linhas inseridas na tabela {loader.table}.")
+        print(f"Carga: {stats.describe()}")
+        return True
 
-def _build_connection_string(sql_config: SqlServerConfig) -> str:
-    usuario = quote_plus(sql_config.user)
-    senha = quote_plus(sql_config.password)
+    except Exception as exc:
+        print(f"Falha ao inserir no SQL Server: {exc}")
+        return False
+    finally:
+        if owns_loader and loader is not None:
+            loader.close()
 
-    return (
-        f"mssql+pyodbc://{usuario}:{senha}@{sql_config.host},{sql_config.port}/"
-        f"{sql_config.database}?driver=ODBC+Driver+18+for+SQL+Server"
-        "&TrustServerCertificate=yes"
+
+def iter_efetividade_chunks(
+    source: Union[str, IO[bytes]],
+    file_name: str,
+    expected_columns: List[str],
+    chunk_size: int,
+) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(
+        source, sep="|", encoding="utf-8", dtype=str, chunksize=chunk_size
     )
+    with reader:
+        for chunk in reader:
+            chunk["source_file"] = file_name
+            for col in expected_columns:
+                if col not in chunk.columns:
+                    chunk[col] = None
+            yield chunk[expected_columns + ["source_file"]]
 
 
-def insert_dataframe_to_sqlserver(
-    df: pd.DataFrame, sql_config: SqlServerConfig
-) -> None:
+def _iter_source_chunks(
+    source: Union[str, IO[bytes], pd.DataFrame],
+    file_name: str,
+    config: EfetividadeConfig,
+    cache: Optional[ParseCache] = None,
+) -> Iterator[pd.DataFrame]:
+    if isinstance(source, pd.DataFrame):
+        if config.chunk_size <= 0:
+            yield source
+            return
+        for start in range(0, len(source), config.chunk_size):
+            yield source.iloc[start : start + config.chunk_size]
+        return
+
+    chunks = iter_efetividade_chunks(
+        source, file_name, config.expected_columns, config.chunk_size
+    )
+    if cache is None or not isinstance(source, str):
+        yield from chunks
+        return
+
+    cache_key = ",".join(config.expected_columns)
+    cached = cache.iter_chunks(source, config.chunk_size, cache_key)
+    if cached is not None:
+        for chunk in cached:
+            yield chunk.assign(source_file=file_name)
+        return
+
+    with cache.writer(source, config.expected_columns, cache_key) as write:
+        for chunk in chunks:
+            write(chunk[config.expected_columns])
+            yield chunk
+
+
+def _timed_chunks(
+    chunks: Iterator[pd.DataFrame], metric: StageMetric
+) -> Iterator[pd.DataFrame]:
+    # Leitura e carga se alternam bloco a bloco; separa o tempo de leitura.
     try:
-        conn_str = _build_connection_string(sql_config)
+        for seconds, chunk in timed(chunks):
+            metric.seconds += seconds
+            metric.rows += len(chunk)
+            yield chunk
+    except Exception:
+        metric.errors += 1
+        raise
 
-        print("Conectando com:", conn_str)
-        engine = create_engine(conn_str)
 
-        inspector = inspect(engine)
-        if sql_config.table not in inspector.get_table_names():
-            print(f"Tabela {sql_config.table} nao existe. Criando...")
-            df.head(0).to_sql(
-                sql_config.table, con=engine, if_exists="replace", index=False
-            )
-            print(f"Tabela {sql_config.table} criada com sucesso.")
+def _filtered_chunks(
+    chunks: Iterator[pd.DataFrame],
+    validator: Optional[Validator],
+    dedup: Optional[DedupIndex],
+    file_name: str,
+    compactor: Optional[FrameCompactor] = None,
+) -> Iterator[pd.DataFrame]:
+    # Compacta so depois de validar: a validacao precisa do texto original.
+    for chunk in chunks:
+        if validator is not None:
+            chunk = validator.apply(chunk, file_name)
+        if dedup is not None:
+            chunk = dedup.filter(chunk, file_name)
+        if compactor is not None:
+            chunk = compactor.compact(chunk)
+        yield chunk
 
-        df.to_sql(sql_config.table, con=engine, if_exists="append", index=False)
-        print(f"{len(df)} linhas inseridas na tabela {sql_config.table}.")
 
+def _filter_seconds(
+    validator: Optional[Validator], dedup: Optional[DedupIndex]
+) -> float:
+    return (validator.seconds if validator is not None else 0.0) + (
+        dedup.seconds if dedup is not None else 0.0
+    )
+
+
+def _print_filters(
+    validator: Optional[Validator], dedup: Optional[DedupIndex]
+) -> None:
+    for summary in (validator, dedup):
+        if summary is not None:
+            print("\n".join(summary.summary()))
+
+
+def _insert_chunk(
+    df: pd.DataFrame,
+    config: EfetividadeConfig,
+    loader: BulkLoader,
+    dedup: Optional[DedupIndex],
+) -> bool:
+    if dedup is None:
+        return insert_dataframe_to_sqlserver(df, config.sql_server, loader)
+    # Sem o ledger, cada bloco entra em uma transacao propria e suas chaves
+    # vao para o indice logo em seguida: uma falha adiante nao tira do indice
+    # linhas que ja estao no banco.
+    try:
+        loader.ensure_table(df)
+        with loader.engine.begin() as conn:
+            stats = loader.load(df, connection=conn)
     except Exception as exc:
+        dedup.discard()
         print(f"Falha ao inserir no SQL Server: {exc}")
+        return False
+    dedup.commit()
+    print(f"{stats.rows} linhas inseridas na tabela {loader.table}.")
+    print(f"Carga: {stats.describe()}")
+    return True
+
+
+def load_efetividade_frame(
+    df: pd.DataFrame,
+    config: EfetividadeConfig,
+    loader: BulkLoader,
+    validator: Optional[Validator] = None,
+) -> bool:
+    """Validates, deduplicates and inserts a combined (non-chunked) frame.
+
+    A ``validator`` already applied file by file (see
+    ``create_dataframe_from_txt``) is not applied again; its summary is
+    still printed.
+    """
+    validated = validator is not None
+    if not validated:
+        validator = open_validator(config)
+    dedup = open_dedup_index(config)
+    df = next(
+        _filtered_chunks(iter([df]), None if validated else validator, dedup, "")
+    )
+    with get_metrics().stage("load") as metric:
+        loaded = _insert_chunk(df, config, loader, dedup)
+        metric.rows = len(df) if loaded else 0
+        metric.errors = int(not loaded)
+    _print_filters(validator, dedup)
+    return loaded
+
+
+def _parsed_sources(
+    file_paths: List[str], config: EfetividadeConfig
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    for file_name, df, error in iter_parsed_files(
+        file_paths,
+        config.expected_columns,
+        config.parse_workers,
+        config.parse_cache,
+        config.split_workers,
+    ):
+        if df is None:
+            print(f"Falha ao ler {file_name}: {error}")
+            continue
+        yield file_name, df
+
+
+def _replace_source_rows(
+    chunks: Iterator[pd.DataFrame],
+    file_name: str,
+    loader: BulkLoader,
+    ledger: LoadLedger,
+) -> int:
+    # Linhas antigas do arquivo, linhas novas e registro no ledger entram na
+    # mesma transacao: uma falha no meio deixa a tabela como estava.
+    first = next(chunks, None)
+    if first is not None:
+        loader.ensure_table(first)
+        chunks = chain([first], chunks)
+
+    rows = 0
+    with loader.engine.begin() as conn:
+        removed = loader.delete_source_rows(conn, file_name)
+        for chunk in chunks:
+            rows += loader.load(chunk, connection=conn).rows
+        ledger.record(conn, file_name, rows)
+    if removed > 0:
+        print(f"{removed} linhas antigas de {file_name} substituidas.")
+    return rows
+
+
+def load_efetividade_chunks(
+    sources: Iterable[Tuple[str, Union[str, IO[bytes], pd.DataFrame]]],
+    config: EfetividadeConfig,
+    loader: Optional[BulkLoader] = None,
+    ledger: Optional[LoadLedger] = None,
+) -> int:
+    # Carrega cada bloco antes de ler o proximo: a memoria fica limitada a
+    # chunk_size linhas, independente de quantos BaseMes existirem.
+    owns_loader = loader is None
+    if loader is None:
+        loader = create_loader(config)
+    cache = _open_cache(config.parse_cache)
+    validator = open_validator(config)
+    dedup = open_dedup_index(config)
+    compactor = None
+    if config.compact_frames:
+        compactor = FrameCompactor(EXPECTED_COLUMN_TYPES)
+    total_rows = 0
+    started = time.monotonic()
+    metrics = get_metrics()
+    for file_name, source in sources:
+        parse = StageMetric("parse", file_name)
+        chunks = _filtered_chunks(
+            _timed_chunks(_iter_source_chunks(source, file_name, config, cache), parse),
+            validator,
+            dedup,
+            file_name,
+            compactor,
+        )
+        file_rows = 0
+        file_started = time.monotonic()
+        filtered_before = _filter_seconds(validator, dedup)
+        failed = False
+        try:
+            if ledger is not None:
+                if dedup is not None:
+                    dedup.replace(file_name)
+                file_rows = _replace_source_rows(chunks, file_name, loader, ledger)
+            else:
+                for chunk in chunks:
+                    if not _insert_chunk(chunk, config, loader, dedup):
+                        raise RuntimeError("carga interrompida")
+                    file_rows += len(chunk)
+            print(f"Arquivo carregado: {file_name} ({file_rows} linhas)")
+        except Exception as exc:
+            print(f"Falha ao processar {file_name} apos {file_rows} linhas: {exc}")
+            failed = True
+        # O indice so registra as chaves de linhas que chegaram ao banco (sem
+        # o ledger, ja registradas bloco a bloco em _insert_chunk).
+        if dedup is not None:
+            if failed:
+                dedup.discard()
+            else:
+                dedup.commit()
+        total_rows += file_rows
+
+        # DataFrames ja lidos tiveram a leitura registrada em iter_parsed_files.
+        if not isinstance(source, pd.DataFrame):
+            size = _file_size(source) if isinstance(source, str) else 0
+            metrics.record(
+                "parse", file_name, parse.seconds, size, parse.rows, parse.errors > 0
+            )
+        load_seconds = time.monotonic() - file_started - parse.seconds
+        load_seconds -= _filter_seconds(validator, dedup) - filtered_before
+        metrics.record(
+            "load",
+            file_name,
+            load_seconds,
+            rows=file_rows,
+            error=failed and not parse.errors,
+        )
+
+    if owns_loader:
+        loader.close()
+    stats = LoadStats(total_rows, time.monotonic() - started)
+    print(f"Carga total: {stats.describe()}")
+    _print_filters(validator, dedup)
+    return total_rows
+
+
+def _list_txt_files(base_dir: str) -> List[str]:
+    all_files = []
+    for root, _, files in os.walk(base_dir):
+        for file_name in files:
+            if file_name.lower().endswith(".txt"):
+                all_files.append(os.path.join(root, file_name))
+    return all_files
+
+
+def _file_sources(
+    file_paths: List[str], config: EfetividadeConfig
+) -> Iterator[Tuple[str, Union[str, pd.DataFrame]]]:
+    if config.parse_workers > 1 or config.split_workers > 1 or config.chunk_size <= 0:
+        return _parsed_sources(file_paths, config)
+    return ((os.path.basename(path), path) for path in file_paths)
+
+
+def _local_mtime(increment: Increment) -> int:
+    # Com outro incremento ja acrescentado a copia local, o mtime nao vale para
+    # esta versao; 0 faz o ledger conferir pelo fingerprint.
+    stat = os.stat(increment.local_file)
+    return stat.st_mtime_ns if stat.st_size == increment.size else 0
+
+
+def _load_increment(
+    increment: Increment,
+    entry: LedgerEntry,
+    chunks: Iterator[pd.DataFrame],
+    loader: BulkLoader,
+    ledger: LoadLedger,
+) -> LedgerEntry:
+    first = next(chunks, None)
+    if first is not None:
+        loader.ensure_table(first)
+        chunks = chain([first], chunks)
+    rows = 0
+    with loader.engine.begin() as conn:
+        for chunk in chunks:
+            rows += loader.load(chunk, connection=conn).rows
+        version = LedgerEntry(
+            increment.fingerprint,
+            increment.size,
+            _local_mtime(increment),
+            entry.row_count + rows,
+        )
+        ledger.record_version(conn, increment.source_file, version)
+    return version
+
+
+def _apply_increments(
+    file_paths: List[str],
+    config: EfetividadeConfig,
+    loader: BulkLoader,
+    ledger: LoadLedger,
+) -> int:
+    """Appends the lines fetched by tail sync to files already in the table.
+
+    An increment is only used when the ledger holds exactly the version it
+    was appended to; otherwise it is dropped and the changed file is
+    reloaded in full by the regular incremental load.
+    """
+    local_files = {os.path.abspath(path) for path in file_paths}
+    increments = [
+        increment
+        for increment in pending_increments(config.increment_dir)
+        if os.path.abspath(increment.local_file) in local_files
+    ]
+    if not increments:
+        return 0
+
+    entries = ledger.entries()
+    validator = open_validator(config)
+    dedup = open_dedup_index(config)
+    failed = set()
+    total_rows = 0
+    for increment in increments:
+        name = increment.source_file
+        if name in failed:
+            continue
+        entry = entries.get(name)
+        if entry is None or (entry.fingerprint, entry.file_size) != (
+            increment.base_fingerprint,
+            increment.base_size,
+        ):
+            print(f"Incremento de {name} descartado: o arquivo sera recarregado.")
+            discard_increment(increment)
+            continue
+
+        source: Union[str, pd.DataFrame] = increment.data_path
+        if config.chunk_size <= 0:
+            source = read_efetividade_file(
+                increment.data_path, name, config.expected_columns
+            )
+        chunks = _filtered_chunks(
+            _iter_source_chunks(source, name, config), validator, dedup, name
+        )
+        try:
+            with get_metrics().stage("load", name) as metric:
+                version = _load_increment(increment, entry, chunks, loader, ledger)
+                metric.rows = version.row_count - entry.row_count
+        except Exception as exc:
+            print(f"Falha ao carregar o incremento de {name}: {exc}")
+            failed.add(name)
+            if dedup is not None:
+                dedup.discard()
+            continue
+        if dedup is not None:
+            dedup.commit()
+        entries[name] = version
+        discard_increment(increment)
+        total_rows += metric.rows
+        print(
+            f"Incremento carregado: {name} (+{metric.rows} linhas, "
+            f"{increment.size - increment.base_size} bytes)"
+        )
+    _print_filters(validator, dedup)
+    return total_rows
+
+
+def _run_incremental_etl(file_paths: List[str], config: EfetividadeConfig) -> None:
+    loader = create_loader(config)
+    try:
+        ledger = LoadLedger(loader.engine, config.ledger_table)
+        ledger.ensure_table()
+        increment_rows = _apply_increments(file_paths, config, loader, ledger)
+        pending = ledger.plan(file_paths)
+        print(
+            f"{len(pending)} de {len(file_paths)} arquivos novos ou alterados "
+            f"desde a ultima carga."
+        )
+        total_rows = increment_rows
+        if pending:
+            total_rows += load_efetividade_chunks(
+                _file_sources(pending, config), config, loader, ledger
+            )
+        elif not increment_rows:
+            return
+    finally:
+        loader.close()
+    print(f"Processo concluido! {total_rows} linhas salvas no SQL Server.")
 
 
 def run_efetividade_etl(config: EfetividadeConfig) -> None:
+    if config.ledger_table or config.chunk_size > 0:
+        all_files = _list_txt_files(config.download_base_dir)
+        if not all_files:
+            print("Nenhum arquivo encontrado.")
+            return
+        if config.ledger_table:
+            _run_incremental_etl(all_files, config)
+            return
+        total_rows = load_efetividade_chunks(_file_sources(all_files, config), config)
+        print(f"Processo concluido! {total_rows} linhas salvas no SQL Server.")
+        return
+
+    validator = open_validator(config)
     df_final = create_dataframe_from_txt(
-        config.download_base_dir, config.expected_columns
+        config.download_base_dir,
+        config.expected_columns,
+        config.parse_workers,
+        config.parse_cache,
+        config.compact_frames,
+        config.split_workers,
+        validator,
     )
     if df_final is not None:
-        insert_dataframe_to_sqlserver(df_final, config.sql_server)
+        loader = create_loader(config)
+        try:
+            load_efetividade_frame(df_final, config, loader, validator)
+        finally:
+            loader.close()
         print("Processo concluido! Dados salvos no SQL Server.")
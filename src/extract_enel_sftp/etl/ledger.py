@@ -0,0 +1,168 @@
+"""Per-file load ledger that makes Efetividade loads incremental."""
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    delete,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+
+
+def file_fingerprint(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class LedgerEntry:
+    fingerprint: str
+    file_size: int
+    file_mtime: int
+    row_count: int
+
+
+@dataclass
+class PendingFile:
+    path: str
+    fingerprint: str
+    file_size: int
+    file_mtime: int
+
+
+class LoadLedger:
+    """Records which version of each source file is in the target table.
+
+    Unchanged files are recognized by size and mtime without reading them;
+    when those differ the content hash decides, so a re-download of the same
+    data does not trigger a reload. Files are keyed by name (the
+    ``source_file`` of their rows), so two paths with the same name are
+    refused instead of replacing each other's rows.
+    """
+
+    def __init__(self, engine: Engine, table: str) -> None:
+        self.engine = engine
+        self.table = Table(
+            table,
+            MetaData(),
+            Column("source_file", String(255), primary_key=True),
+            Column("fingerprint", String(64), nullable=False),
+            Column("file_size", BigInteger, nullable=False),
+            Column("file_mtime", BigInteger, nullable=False),
+            Column("row_count", BigInteger, nullable=False),
+            Column("loaded_at", DateTime, nullable=False),
+        )
+        self._pending: Dict[str, PendingFile] = {}
+        self._paths: Dict[str, str] = {}
+
+    def ensure_table(self) -> None:
+        self.table.create(self.engine, checkfirst=True)
+
+    def entries(self) -> Dict[str, LedgerEntry]:
+        columns = self.table.c
+        query = select(
+            columns.source_file,
+            columns.fingerprint,
+            columns.file_size,
+            columns.file_mtime,
+            columns.row_count,
+        )
+        with self.engine.connect() as conn:
+            return {
+                row.source_file: LedgerEntry(
+                    row.fingerprint, row.file_size, row.file_mtime, row.row_count
+                )
+                for row in conn.execute(query)
+            }
+
+    def _check_names(self, file_paths: List[str]) -> None:
+        duplicates = set()
+        for path in map(os.path.abspath, file_paths):
+            seen = self._paths.setdefault(os.path.basename(path), path)
+            if seen != path:
+                duplicates.add(f"{seen} e {path}")
+        if duplicates:
+            raise ValueError(
+                "Arquivos com o mesmo nome em diretorios diferentes; a tabela de "
+                "controle e a substituicao de linhas usam o nome como chave: "
+                + "; ".join(sorted(duplicates))
+            )
+
+    def plan(self, file_paths: List[str]) -> List[str]:
+        """Returns the paths that are new or changed since their last load.
+
+        Raises ``ValueError`` when two paths share a file name.
+        """
+        self._check_names(file_paths)
+        entries = self.entries()
+        pending = []
+        for path in file_paths:
+            source_file = os.path.basename(path)
+            stat = os.stat(path)
+            entry = entries.get(source_file)
+            if (
+                entry is not None
+                and entry.file_size == stat.st_size
+                and entry.file_mtime == stat.st_mtime_ns
+            ):
+                continue
+
+            fingerprint = file_fingerprint(path)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self._refresh_stat(source_file, stat.st_size, stat.st_mtime_ns)
+                continue
+
+            self._pending[source_file] = PendingFile(
+                path, fingerprint, stat.st_size, stat.st_mtime_ns
+            )
+            pending.append(path)
+        return pending
+
+    def _refresh_stat(self, source_file: str, size: int, mtime: int) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(self.table)
+                .where(self.table.c.source_file == source_file)
+                .values(file_size=size, file_mtime=mtime)
+            )
+
+    def record(self, conn: Connection, source_file: str, row_count: int) -> None:
+        """Stores the planned version of ``source_file`` inside ``conn``'s
+        transaction, so the ledger only changes if the rows were loaded."""
+        pending = self._pending.pop(source_file)
+        self.record_version(
+            conn,
+            source_file,
+            LedgerEntry(
+                pending.fingerprint, pending.file_size, pending.file_mtime, row_count
+            ),
+        )
+
+    def record_version(
+        self, conn: Connection, source_file: str, entry: LedgerEntry
+    ) -> None:
+        conn.execute(delete(self.table).where(self.table.c.source_file == source_file))
+        conn.execute(
+            insert(self.table).values(
+                source_file=source_file,
+                fingerprint=entry.fingerprint,
+                file_size=entry.file_size,
+                file_mtime=entry.file_mtime,
+                row_count=entry.row_count,
+                loaded_at=datetime.now(),
+            )
+        )
@@ -0,0 +1,261 @@
+"""Batched bulk loading of DataFrames into SQL tables."""
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+from urllib.parse import quote_plus
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, create_engine, inspect
+from sqlalchemy.engine import Connection, Engine
+
+from ..config import EfetividadeConfig, SqlServerConfig
+from ..processing.compact import to_load_frame
+
+METHOD_EXECUTEMANY = "executemany"
+METHOD_MULTIROW = "multirow"
+
+SOURCE_COLUMN = "source_file"
+
+
+@dataclass
+class LoadStats:
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.rows / self.seconds
+
+    def describe(self) -> str:
+        return (
+            f"{self.rows} linhas em {self.seconds:.1f}s "
+            f"({self.rows_per_second:,.0f} linhas/s)"
+        )
+
+
+def build_connection_string(sql_config: SqlServerConfig) -> str:
+    usuario = quote_plus(sql_config.user)
+    senha = quote_plus(sql_config.password)
+
+    return (
+        f"mssql+pyodbc://{usuario}:{senha}@{sql_config.host},{sql_config.port}/"
+        f"{sql_config.database}?driver=ODBC+Driver+18+for+SQL+Server"
+        "&TrustServerCertificate=yes"
+    )
+
+
+def _records(df: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    df = to_load_frame(df)
+    values = df.astype(object).where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+class BulkLoader:
+    """Writes DataFrames in batches of ``batch_size`` rows.
+
+    ``executemany`` sends one parameterized INSERT per batch through the
+    DBAPI cursor; ``multirow`` packs as many rows as the dialect allows into
+    a single ``INSERT ... VALUES (...), (...)``. With ``workers > 1`` the
+    frame is split into contiguous partitions, each written by its own
+    connection and transaction.
+    """
+
+    max_params = 999
+    max_rows_per_statement = 1000
+
+    def __init__(
+        self,
+        engine: Engine,
+        table: str,
+        batch_size: int = 10_000,
+        workers: int = 1,
+        method: str = METHOD_EXECUTEMANY,
+    ) -> None:
+        if method not in (METHOD_EXECUTEMANY, METHOD_MULTIROW):
+            raise ValueError(f"Metodo de carga desconhecido: {method}")
+        self.engine = engine
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.method = method
+        self._table_checked = False
+
+    def _source_index_statement(self) -> str:
+        quote = self.engine.dialect.identifier_preparer.quote
+        return (
+            f"CREATE INDEX {quote(f'IX_{self.table}_{SOURCE_COLUMN}')} "
+            f"ON {quote(self.table)} ({quote(SOURCE_COLUMN)})"
+        )
+
+    def ensure_table(self, df: pd.DataFrame) -> None:
+        # Substituir as linhas de um arquivo (ledger) filtra por source_file;
+        # sem indice, cada substituicao varre a tabela inteira.
+        if self._table_checked:
+            return
+        inspector = inspect(self.engine)
+        if self.table not in inspector.get_table_names():
+            print(f"Tabela {self.table} nao existe. Criando...")
+            has_source = SOURCE_COLUMN in df.columns
+            to_load_frame(df.head(0)).to_sql(
+                self.table,
+                con=self.engine,
+                if_exists="fail",
+                index=False,
+                dtype={SOURCE_COLUMN: String(255)} if has_source else None,
+            )
+            if has_source:
+                with self.engine.begin() as conn:
+                    conn.exec_driver_sql(self._source_index_statement())
+            print(f"Tabela {self.table} criada com sucesso.")
+        elif SOURCE_COLUMN in df.columns and not any(
+            SOURCE_COLUMN in (index["column_names"] or [])[:1]
+            for index in inspector.get_indexes(self.table)
+        ):
+            print(
+                f"Aviso: a tabela {self.table} nao tem indice em {SOURCE_COLUMN}; "
+                f"a substituicao de arquivos varre a tabela inteira. Para criar: "
+                f"{self._source_index_statement()}"
+            )
+        self._table_checked = True
+
+    def delete_source_rows(self, conn: Connection, source_file: str) -> int:
+        if not inspect(conn).has_table(self.table):
+            return 0
+        quote = self.engine.dialect.identifier_preparer.quote
+        result = conn.exec_driver_sql(
+            f"DELETE FROM {quote(self.table)} WHERE {quote(SOURCE_COLUMN)} = ?",
+            (source_file,),
+        )
+        return result.rowcount
+
+    def _insert_prefix(self, columns: Sequence[str]) -> str:
+        quote = self.engine.dialect.identifier_preparer.quote
+        column_list = ", ".join(quote(str(column)) for column in columns)
+        return f"INSERT INTO {quote(self.table)} ({column_list}) VALUES "
+
+    def _write_batch(
+        self, conn: Connection, columns: Sequence[str], rows: List[Tuple[Any, ...]]
+    ) -> None:
+        placeholders = "(" + ", ".join("?" for _ in columns) + ")"
+        prefix = self._insert_prefix(columns)
+
+        if self.method == METHOD_EXECUTEMANY:
+            conn.exec_driver_sql(prefix + placeholders, rows)
+            return
+
+        per_statement = max(
+            1, min(self.max_rows_per_statement, self.max_params // len(columns))
+        )
+        for start in range(0, len(rows), per_statement):
+            group = rows[start : start + per_statement]
+            sql = prefix + ", ".join([placeholders] * len(group))
+            params = tuple(value for row in group for value in row)
+            conn.exec_driver_sql(sql, params)
+
+    def _write(self, conn: Connection, df: pd.DataFrame) -> int:
+        columns = list(df.columns)
+        for start in range(0, len(df), self.batch_size):
+            batch = df.iloc[start : start + self.batch_size]
+            self._write_batch(conn, columns, _records(batch))
+        return len(df)
+
+    def _write_partition(self, df: pd.DataFrame) -> int:
+        with self.engine.begin() as conn:
+            return self._write(conn, df)
+
+    def load(
+        self, df: pd.DataFrame, connection: Optional[Connection] = None
+    ) -> LoadStats:
+        started = time.monotonic()
+        if df.empty:
+            return LoadStats(0, 0.0)
+        self.ensure_table(df)
+
+        if connection is not None:
+            rows = self._write(connection, df)
+        elif self.workers > 1 and len(df) > self.batch_size:
+            bounds = np.linspace(0, len(df), self.workers + 1, dtype=int)
+            partitions = [
+                df.iloc[start:end]
+                for start, end in zip(bounds[:-1], bounds[1:])
+                if end > start
+            ]
+            with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+                rows = sum(executor.map(self._write_partition, partitions))
+        else:
+            rows = self._write_partition(df)
+
+        return LoadStats(rows, time.monotonic() - started)
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+class SqlServerBulkLoader(BulkLoader):
+    # Limites do SQL Server: 2100 parametros e 1000 linhas por VALUES.
+    max_params = 2099
+    max_rows_per_statement = 1000
+
+    @classmethod
+    def from_config(
+        cls,
+        sql_config: SqlServerConfig,
+        batch_size: int = 10_000,
+        workers: int = 1,
+        method: str = METHOD_EXECUTEMANY,
+    ) -> "SqlServerBulkLoader":
+        conn_str = build_connection_string(sql_config)
+        print("Conectando com:", conn_str)
+        engine = create_engine(
+            conn_str,
+            fast_executemany=True,
+            pool_size=max(5, workers),
+        )
+        return cls(engine, sql_config.table, batch_size, workers, method)
+
+
+class SqliteBulkLoader(BulkLoader):
+    max_params = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    max_rows_per_statement = 100_000
+
+    def __init__(
+        self,
+        engine: Engine,
+        table: str,
+        batch_size: int = 10_000,
+        workers: int = 1,
+        method: str = METHOD_EXECUTEMANY,
+    ) -> None:
+        # SQLite serializa escritas; conexoes paralelas so gerariam bloqueio.
+        super().__init__(engine, table, batch_size, 1, method)
+
+    @classmethod
+    def from_path(
+        cls,
+        path: str,
+        table: str,
+        batch_size: int = 10_000,
+        method: str = METHOD_EXECUTEMANY,
+    ) -> "SqliteBulkLoader":
+        return cls(create_engine(f"sqlite:///{path}"), table, batch_size, 1, method)
+
+
+def create_loader(config: EfetividadeConfig) -> BulkLoader:
+    if config.sqlite_path:
+        return SqliteBulkLoader.from_path(
+            config.sqlite_path,
+            config.sql_server.table,
+            config.load_batch_size,
+            config.load_method,
+        )
+    return SqlServerBulkLoader.from_config(
+        config.sql_server,
+        config.load_batch_size,
+        config.load_workers,
+        config.load_method,
+    )
@@ -0,0 +1,214 @@
+"""Declarative, vectorized data-quality rules applied before loading."""
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config import EfetividadeConfig
+from ..metrics import get_metrics
+from ..processing.compact import TEXT_DTYPE
+
+CHECK_REQUIRED = "required"
+CHECK_PATTERN = "pattern"
+CHECK_RANGE = "range"
+CHECK_NUMBER = "number"
+
+REASON_COLUMN = "motivo_rejeicao"
+
+_DECIMAL = r"[+-]?(\d+\.?\d*|\.\d+)"
+
+
+@dataclass(frozen=True)
+class Rule:
+    """``check`` is ``required``, ``pattern`` (full match of ``pattern``),
+    ``number`` (a decimal, comma or dot) or ``range`` (a decimal between
+    ``minimum`` and ``maximum``; text that is not a decimal is left to
+    ``number``). Empty values pass every check except ``required``."""
+
+    name: str
+    column: str
+    check: str
+    pattern: str = ""
+    minimum: float = -np.inf
+    maximum: float = np.inf
+
+
+# Coordenadas dentro do Ceara com folga; fora disso sao trocadas (lat/lon),
+# zeradas ou com a virgula no lugar errado.
+EFETIVIDADE_RULES: Tuple[Rule, ...] = (
+    Rule("referencia_obrigatoria", "REFERENCIA", CHECK_REQUIRED),
+    Rule("referencia_periodo", "REFERENCIA", CHECK_PATTERN, r"20\d{2}(0[1-9]|1[0-2])"),
+    Rule("cliente_obrigatorio", "NUMERO_CLIENTE", CHECK_REQUIRED),
+    Rule("cliente_numerico", "NUMERO_CLIENTE", CHECK_PATTERN, r"\d{1,15}"),
+    Rule("latitude_numerica", "LATITUDE", CHECK_NUMBER),
+    Rule("latitude_faixa", "LATITUDE", CHECK_RANGE, minimum=-8.5, maximum=-2.0),
+    Rule("longitude_numerica", "LONGITUDE", CHECK_NUMBER),
+    Rule("longitude_faixa", "LONGITUDE", CHECK_RANGE, minimum=-42.0, maximum=-36.5),
+)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    # As operacoes de texto do Arrow sao vetorizadas em C++; com object o
+    # pandas faria um loop Python por linha.
+    if TEXT_DTYPE is not None and values.dtype != TEXT_DTYPE:
+        return values.astype(TEXT_DTYPE)
+    return values.astype(str).where(values.notna())
+
+
+def _blank(text: pd.Series) -> np.ndarray:
+    return (text.isna() | (text.str.strip() == "")).to_numpy(dtype=bool)
+
+
+def _to_float(text: pd.Series) -> np.ndarray:
+    # O cast do Arrow e ~10x mais rapido que pd.to_numeric, mas falha com
+    # texto invalido; o regex separa antes o que e numero.
+    normalized = text.str.strip().str.replace(",", ".", regex=False)
+    candidates = normalized.where(normalized.str.fullmatch(_DECIMAL).fillna(False))
+    if TEXT_DTYPE is not None:
+        numbers = candidates.astype("double[pyarrow]")
+    else:
+        numbers = pd.to_numeric(candidates, errors="coerce")
+    return numbers.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _failures(
+    text: pd.Series, blank: np.ndarray, numbers: Dict[str, np.ndarray], rule: Rule
+) -> np.ndarray:
+    if rule.check == CHECK_REQUIRED:
+        return blank
+    if rule.check == CHECK_PATTERN:
+        matched = text.str.strip().str.fullmatch(rule.pattern)
+        return ~matched.fillna(False).to_numpy(dtype=bool) & ~blank
+    if rule.check in (CHECK_NUMBER, CHECK_RANGE):
+        # As regras numericas de uma coluna convertem o texto uma vez so.
+        if rule.column not in numbers:
+            numbers[rule.column] = _to_float(text)
+        values = numbers[rule.column]
+        if rule.check == CHECK_NUMBER:
+            return np.isnan(values) & ~blank
+        outside = (values < rule.minimum) | (values > rule.maximum)
+        return outside & ~blank
+    raise ValueError(f"Regra de validacao desconhecida: {rule.check}")
+
+
+def evaluate(df: pd.DataFrame, rules: Tuple[Rule, ...]) -> np.ndarray:
+    """Boolean matrix ``rows x rules``; True where the row fails the rule."""
+    failures = np.zeros((len(df), len(rules)), dtype=bool)
+    prepared: Dict[str, Tuple[pd.Series, np.ndarray]] = {}
+    numbers: Dict[str, np.ndarray] = {}
+    for index, rule in enumerate(rules):
+        if rule.column not in df.columns:
+            continue
+        if rule.column not in prepared:
+            text = _as_text(df[rule.column])
+            prepared[rule.column] = (text, _blank(text))
+        text, blank = prepared[rule.column]
+        failures[:, index] = _failures(text, blank, numbers, rule)
+    return failures
+
+
+def _reasons(failures: np.ndarray, rules: Tuple[Rule, ...]) -> np.ndarray:
+    reasons = np.full(len(failures), "", dtype=object)
+    for index, rule in enumerate(rules):
+        column = failures[:, index]
+        separator = np.where(reasons[column] == "", "", ";")
+        reasons[column] = reasons[column] + separator + rule.name
+    return reasons
+
+
+class Validator:
+    """Splits frames into valid rows and rejects, counting failures per rule.
+
+    Rejected rows are appended to ``reject_path`` (``|`` separated, with the
+    failed rule names in ``motivo_rejeicao``) and left out of the load. An
+    existing file whose header has other columns is renamed with its
+    modification time (``rejeitados.20260101120000.txt``) and a new one is
+    started, so every row matches the header above it.
+    """
+
+    def __init__(self, rules: Tuple[Rule, ...], reject_path: str = "") -> None:
+        self.rules = rules
+        self.reject_path = reject_path
+        self.counts: Dict[str, int] = {rule.name: 0 for rule in rules}
+        self.rows = 0
+        self.rejected = 0
+        self.seconds = 0.0
+        self.rotated_path = ""
+        self._header: Optional[List[str]] = None
+
+    def apply(self, df: pd.DataFrame, file_name: str = "") -> pd.DataFrame:
+        started = time.monotonic()
+        failures = evaluate(df, self.rules)
+        per_rule = failures.sum(axis=0)
+        for rule, count in zip(self.rules, per_rule):
+            self.counts[rule.name] += int(count)
+        rejected = failures.any(axis=1)
+        self.rows += len(df)
+        self.rejected += int(rejected.sum())
+
+        if rejected.any():
+            self._write_rejects(df[rejected], _reasons(failures[rejected], self.rules))
+            df = df[~rejected]
+        seconds = time.monotonic() - started
+        self.seconds += seconds
+        get_metrics().record("validate", file_name, seconds, rows=len(df))
+        return df
+
+    def _existing_header(self) -> Optional[List[str]]:
+        try:
+            with open(self.reject_path, encoding="utf-8") as handle:
+                line = handle.readline().rstrip("\r\n")
+        except FileNotFoundError:
+            return None
+        return line.split("|") if line else None
+
+    def _rotate(self) -> None:
+        modified = time.localtime(os.path.getmtime(self.reject_path))
+        root, ext = os.path.splitext(self.reject_path)
+        self.rotated_path = f"{root}.{time.strftime('%Y%m%d%H%M%S', modified)}{ext}"
+        os.replace(self.reject_path, self.rotated_path)
+
+    def _write_rejects(self, rejects: pd.DataFrame, reasons: np.ndarray) -> None:
+        if not self.reject_path:
+            return
+        directory = os.path.dirname(self.reject_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        rejects = rejects.assign(**{REASON_COLUMN: reasons})
+        columns = [str(column) for column in rejects.columns]
+        if self._header is None:
+            self._header = self._existing_header()
+        if self._header is not None and self._header != columns:
+            self._rotate()
+            self._header = None
+        rejects.to_csv(
+            self.reject_path,
+            sep="|",
+            index=False,
+            mode="a",
+            header=self._header is None,
+            encoding="utf-8",
+        )
+        self._header = columns
+
+    def summary(self) -> List[str]:
+        lines = [f"Validacao: {self.rejected} de {self.rows} linhas rejeitadas"]
+        for name, count in self.counts.items():
+            lines.append(f"  {name:<24}{count:>10}")
+        if self.rotated_path:
+            lines.append(
+                f"Arquivo de rejeitados com outras colunas movido para "
+                f"{self.rotated_path}"
+            )
+        if self.rejected and self.reject_path:
+            lines.append(f"Linhas rejeitadas gravadas em {self.reject_path}")
+        return lines
+
+
+def open_validator(config: EfetividadeConfig) -> Optional[Validator]:
+    if not config.validation:
+        return None
+    return Validator(EFETIVIDADE_RULES, config.reject_path)
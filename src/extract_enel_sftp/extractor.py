@@ -1,28 +1,53 @@
 import logging
 import os
-from dataclasses import dataclass
-from typing import Dict, List
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .config import ExtractorConfig, SshKeyHostConfig
+from .manifest import SyncManifest, open_manifest
+from .metrics import get_metrics
 from .sftp_client import (
     close_sftp_connection,
     create_sftp_connection,
     download_files,
     load_private_key,
 )
+from .readiness import build_probes
 from .vpn import connect_vpn, disconnect_vpn
 
 logger = logging.getLogger(__name__)
 
+# Depois do timeout a conexao do host e fechada e a thread deve terminar logo;
+# ela continua ocupando a vaga por no maximo este tempo.
+ABANDON_GRACE = 30.0
+
 
 @dataclass
 class HostResult:
     success: bool
     downloaded: List[str]
     failed: List[str]
+    elapsed: float = 0.0
+    skipped: List[str] = field(default_factory=list)
+
+
+def host_local_dir(config: ExtractorConfig, host_config: SshKeyHostConfig) -> str:
+    if host_config.name.startswith("HOST_"):
+        return os.path.join(
+            config.download_base_dir, host_config.name.replace("HOST_", "")
+        )
+    return config.download_base_dir
 
 
-def process_host(config: ExtractorConfig, host_config: SshKeyHostConfig) -> HostResult:
+def process_host(
+    config: ExtractorConfig,
+    host_config: SshKeyHostConfig,
+    manifest: Optional[SyncManifest] = None,
+    on_connect: Optional[Callable[[Any], None]] = None,
+) -> HostResult:
     logger.info("%s", "=" * 50)
     logger.info("Processando %s (%s)", host_config.name, host_config.host)
     logger.info("%s", "=" * 50)
@@ -34,48 +59,179 @@ def process_host(config: ExtractorConfig, host_config: SshKeyHostConfig) -> Host
         )
         return HostResult(False, [], config.files)
 
-    local_dir = config.download_base_dir
-    if host_config.name.startswith("HOST_"):
-        local_dir = os.path.join(
-            config.download_base_dir, host_config.name.replace("HOST_", "")
-        )
+    local_dir = host_local_dir(config, host_config)
 
-    sftp, transport = create_sftp_connection(
-        host_config.host, host_config.user, private_key
-    )
+    with get_metrics().stage("connect", host_config.name) as metric:
+        sftp, transport = create_sftp_connection(
+            host_config.host, host_config.user, private_key, config.transfer
+        )
+        metric.errors = int(not sftp)
     if not sftp:
         logger.error("Nao foi possivel conectar ao %s. Pulando.", host_config.name)
         return HostResult(False, [], config.files)
+    if on_connect is not None:
+        on_connect(transport)
 
     try:
         downloaded, failed = download_files(
-            sftp, config.remote_path, config.files, local_dir
+            sftp,
+            config.remote_path,
+            config.files,
+            local_dir,
+            transport=transport,
+            max_workers=config.max_parallel_downloads,
+            transfer=config.transfer,
+            manifest=manifest,
+            host=host_config.host,
         )
+        skipped = [
+            name for name in config.files if name not in downloaded + failed
+        ]
         logger.info(
-            "%s: %s arquivos baixados, %s falhas",
+            "%s: %s arquivos baixados, %s sem alteracao, %s falhas",
             host_config.name,
             len(downloaded),
+            len(skipped),
             len(failed),
         )
-        return HostResult(True, downloaded, failed)
+        return HostResult(True, downloaded, failed, skipped=skipped)
     finally:
         close_sftp_connection(sftp, transport)
 
 
+@dataclass
+class _HostRun:
+    """A host worker thread and the transport it downloads through."""
+
+    started: float
+    transport: Any = None
+    abandoned_at: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def attach(self, transport) -> None:
+        with self._lock:
+            self.transport = transport
+            abandoned = self.abandoned_at > 0
+        if abandoned:
+            _close_transport(transport)
+
+    def abandon(self) -> None:
+        # Fechar o transport interrompe os downloads em andamento: a thread
+        # termina com erro em vez de seguir baixando fora do limite de hosts.
+        with self._lock:
+            self.abandoned_at = time.monotonic()
+            transport = self.transport
+        if transport is not None:
+            _close_transport(transport)
+
+
+def _close_transport(transport) -> None:
+    try:
+        transport.close()
+    except Exception as exc:
+        logger.debug("Erro ao fechar transport: %s", exc)
+
+
+def _run_host_worker(
+    config: ExtractorConfig,
+    host_config: SshKeyHostConfig,
+    results: "queue.Queue[Tuple[str, HostResult]]",
+    manifest: Optional[SyncManifest] = None,
+    run: Optional[_HostRun] = None,
+) -> None:
+    started = time.monotonic()
+    on_connect = run.attach if run is not None else None
+    try:
+        result = process_host(config, host_config, manifest, on_connect)
+    except Exception as exc:
+        logger.error("Erro inesperado ao processar %s: %s", host_config.name, exc)
+        result = HostResult(False, [], list(config.files))
+    result.elapsed = time.monotonic() - started
+    results.put((host_config.name, result))
+
+
+def run_hosts_parallel(
+    config: ExtractorConfig, manifest: Optional[SyncManifest] = None
+) -> Dict[str, HostResult]:
+    # Cada host roda em uma thread daemon propria. Um host que ultrapassa
+    # host_timeout conta como falha e tem a conexao fechada; a vaga so e
+    # liberada quando a thread termina (ou apos ABANDON_GRACE), e a funcao
+    # so retorna depois disso, antes de a VPN ser desconectada.
+    max_parallel = max(1, config.max_parallel_hosts)
+    pending = list(config.hosts)
+    running: Dict[str, _HostRun] = {}
+    abandoned: Dict[str, _HostRun] = {}
+    finished: "queue.Queue[Tuple[str, HostResult]]" = queue.Queue()
+    results: Dict[str, HostResult] = {}
+
+    while pending or running or abandoned:
+        while pending and len(running) + len(abandoned) < max_parallel:
+            host_config = pending.pop(0)
+            run = _HostRun(time.monotonic())
+            running[host_config.name] = run
+            threading.Thread(
+                target=_run_host_worker,
+                args=(config, host_config, finished, manifest, run),
+                name=f"host-{host_config.name}",
+                daemon=True,
+            ).start()
+
+        deadlines = [run.started + config.host_timeout for run in running.values()]
+        deadlines += [run.abandoned_at + ABANDON_GRACE for run in abandoned.values()]
+        try:
+            name, result = finished.get(
+                timeout=max(0.0, min(deadlines) - time.monotonic())
+            )
+        except queue.Empty:
+            now = time.monotonic()
+            for name, run in list(running.items()):
+                if now - run.started >= config.host_timeout:
+                    logger.error(
+                        "Timeout: %s nao finalizou em %.0fs. Abandonando host.",
+                        name,
+                        config.host_timeout,
+                    )
+                    results[name] = HostResult(
+                        False, [], list(config.files), now - run.started
+                    )
+                    run.abandon()
+                    abandoned[name] = running.pop(name)
+            for name, run in list(abandoned.items()):
+                if now - run.abandoned_at >= ABANDON_GRACE:
+                    logger.warning(
+                        "%s nao encerrou %.0fs apos o timeout.", name, ABANDON_GRACE
+                    )
+                    del abandoned[name]
+            continue
+
+        if name in running:
+            del running[name]
+            results[name] = result
+        else:
+            abandoned.pop(name, None)
+
+    return {
+        host_config.name: results[host_config.name]
+        for host_config in config.hosts
+        if host_config.name in results
+    }
+
+
 def run_extraction(config: ExtractorConfig) -> Dict[str, HostResult]:
     logger.info("%s", "=" * 60)
     logger.info("INICIANDO EXTRACAO DE ARQUIVOS VIA SFTP")
     logger.info("%s", "=" * 60)
 
-    if not connect_vpn(config.globalprotect_path):
+    probes = build_probes(config)
+    with get_metrics().stage("vpn"):
+        connected = connect_vpn(config.globalprotect_path, probes, config.readiness)
+    if not connected:
         logger.error("Nao foi possivel conectar a VPN. Abortando.")
         return {}
 
     results: Dict[str, HostResult] = {}
     try:
-        for host_config in config.hosts:
-            result = process_host(config, host_config)
-            results[host_config.name] = result
+        results = run_hosts_parallel(config, open_manifest(config.manifest_path))
 
         logger.info("%s", "=" * 60)
         logger.info("RESUMO DA EXTRACAO")
@@ -83,11 +239,13 @@ def run_extraction(config: ExtractorConfig) -> Dict[str, HostResult]:
         for name, result in results.items():
             status = "OK" if result.success else "FALHA"
             logger.info(
-                "%s: %s | Baixados: %s | Falhas: %s",
+                "%s: %s | Baixados: %s | Sem alteracao: %s | Falhas: %s | Tempo: %.1fs",
                 name,
                 status,
                 len(result.downloaded),
+                len(result.skipped),
                 len(result.failed),
+                result.elapsed,
             )
     finally:
         disconnect_vpn(config.globalprotect_path)
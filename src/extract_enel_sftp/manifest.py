@@ -0,0 +1,127 @@
+"""Local sync manifest of remote file metadata."""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime: int
+    status: str
+    local_paths: List[str] = field(default_factory=list)
+    synced_at: str = ""
+    # Sincronizacao por cauda (tail_sync.py): bytes ja copiados, hash dos
+    # ultimos bytes antes desse ponto, versao da copia local (sha1 no download
+    # completo, encadeado a cada acrescimo) e mtime da copia local.
+    offset: int = 0
+    tail_hash: str = ""
+    fingerprint: str = ""
+    local_mtime: int = 0
+
+
+class SyncManifest:
+    """Remote size/mtime of each synced file, keyed by host and remote path.
+
+    With ``local_dir`` the keys also carry the local destination, so commands
+    that share one manifest but download to different directories do not
+    take each other's copies as their own.
+    """
+
+    def __init__(self, path: str, local_dir: str = "") -> None:
+        self.path = path
+        self.local_dir = os.path.abspath(local_dir) if local_dir else ""
+        self._entries: Dict[str, ManifestEntry] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def key(self, host: str, remote_file: str) -> str:
+        if self.local_dir:
+            return f"{host}:{remote_file}|{self.local_dir}"
+        return f"{host}:{remote_file}"
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                raw = json.load(handle)
+            self._entries = {
+                key: ManifestEntry(**value) for key, value in raw.items()
+            }
+        except (OSError, ValueError, TypeError) as exc:
+            logger.warning(
+                "Manifesto de sincronizacao ignorado (%s): %s", self.path, exc
+            )
+            self._entries = {}
+
+    def get(self, host: str, remote_file: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            return self._entries.get(self.key(host, remote_file))
+
+    def is_unchanged(self, host: str, remote_file: str, attr) -> bool:
+        entry = self.get(host, remote_file)
+        if entry is None or entry.status != STATUS_OK:
+            return False
+        if entry.size != attr.st_size or entry.mtime != attr.st_mtime:
+            return False
+        if entry.tail_hash and entry.offset < entry.size:
+            # Linha final retida pela sincronizacao por cauda.
+            return False
+        return all(os.path.exists(path) for path in entry.local_paths)
+
+    def record(
+        self,
+        host: str,
+        remote_file: str,
+        attr,
+        status: str,
+        local_paths: Optional[List[str]] = None,
+        offset: int = 0,
+        tail_hash: str = "",
+        fingerprint: str = "",
+        local_mtime: int = 0,
+    ) -> None:
+        entry = ManifestEntry(
+            size=attr.st_size,
+            mtime=attr.st_mtime,
+            status=status,
+            local_paths=list(local_paths or []),
+            synced_at=datetime.now().isoformat(timespec="seconds"),
+            offset=offset,
+            tail_hash=tail_hash,
+            fingerprint=fingerprint,
+            local_mtime=local_mtime,
+        )
+        with self._lock:
+            self._entries[self.key(host, remote_file)] = entry
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {key: asdict(entry) for key, entry in self._entries.items()},
+                handle,
+                indent=2,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.path)
+
+
+def open_manifest(path: str, local_dir: str = "") -> Optional[SyncManifest]:
+    if not path:
+        return None
+    return SyncManifest(path, local_dir)
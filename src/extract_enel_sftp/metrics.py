@@ -0,0 +1,404 @@
+"""Per-stage run metrics and the JSON/Prometheus run reports."""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .config import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+# Uma hora de amostras a cada SAMPLE_INTERVAL segundos.
+SAMPLE_INTERVAL = 0.1
+MAX_SAMPLES = 36000
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _max_rss(who: int) -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux informa em KiB, macOS em bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident memory of the process so far, in bytes."""
+    if resource is not None:
+        return _max_rss(resource.RUSAGE_SELF)
+    if sys.platform == "win32":
+        return _windows_peak_rss()
+    return None
+
+
+def children_peak_rss() -> Optional[int]:
+    """Peak resident memory of the largest child process already finished
+    (e.g. a parse pool worker), in bytes."""
+    if resource is None:
+        return None
+    return _max_rss(resource.RUSAGE_CHILDREN)
+
+
+def _statm_rss(pid: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _child_pids() -> List[str]:
+    pids: List[str] = []
+    try:
+        tasks = os.listdir("/proc/self/task")
+    except OSError:
+        return pids
+    for task in tasks:
+        try:
+            with open(f"/proc/self/task/{task}/children", encoding="ascii") as handle:
+                pids.extend(handle.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def current_rss() -> Optional[int]:
+    """Resident memory right now of the process plus its live child processes
+    (the parse pool), in bytes. Only available on Linux."""
+    own = _statm_rss("self")
+    if own is None:
+        return None
+    return own + sum(_statm_rss(pid) or 0 for pid in _child_pids())
+
+
+class _RssSampler:
+    """Samples ``current_rss`` in a daemon thread, so the peak of a stage can
+    be read back for the time window it ran in."""
+
+    def __init__(self) -> None:
+        self._samples: deque = deque(maxlen=MAX_SAMPLES)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None or current_rss() is None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="rss-sampler", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            rss = current_rss()
+            if rss is not None:
+                with self._lock:
+                    self._samples.append((time.time(), rss))
+            time.sleep(SAMPLE_INTERVAL)
+
+    def peak(self, started: float, finished: float) -> Optional[int]:
+        # A leitura atual cobre etapas mais curtas que o intervalo.
+        rss = current_rss()
+        values = [] if rss is None else [rss]
+        with self._lock:
+            for at, sample in reversed(self._samples):
+                if at < started:
+                    break
+                if at <= finished:
+                    values.append(sample)
+        return max(values) if values else None
+
+
+_sampler = _RssSampler()
+
+
+def _windows_peak_rss() -> Optional[int]:  # pragma: no cover - Windows
+    import ctypes
+    from ctypes import wintypes
+
+    class _Counters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = _Counters()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            handle, ctypes.byref(counters), counters.cb
+        ):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+@dataclass
+class StageMetric:
+    stage: str
+    item: str = ""
+    seconds: float = 0.0
+    bytes: int = 0
+    rows: int = 0
+    count: int = 0
+    errors: int = 0
+    peak_rss: Optional[int] = None
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+
+def _rate(amount: float, seconds: float) -> Optional[float]:
+    return round(amount / seconds, 1) if seconds > 0 and amount else None
+
+
+class RunMetrics:
+    """Collects duration, bytes, rows and peak memory per stage and file.
+
+    Repeated records for the same stage and item (e.g. the chunks of one
+    file) are summed. ``seconds`` is the time spent in the stage; ``wall``
+    in the summary is first start to last finish, so overlapping work
+    (parallel downloads) is not counted twice in the throughput.
+    ``peak_rss`` is the highest ``current_rss`` sampled while the stage
+    ran, so it includes the parse pool's processes; stages that overlap
+    (the ``pipeline`` command) see each other's memory. It is ``None``
+    where the current RSS cannot be read (outside Linux).
+    """
+
+    def __init__(self, command: str = "") -> None:
+        self.command = command
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.success = True
+        self._metrics: Dict[Tuple[str, str], StageMetric] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage: str,
+        item: str = "",
+        seconds: float = 0.0,
+        bytes: int = 0,
+        rows: int = 0,
+        error: bool = False,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            metric = self._metrics.get((stage, item))
+            if metric is None:
+                metric = StageMetric(stage, item, started_at=now - seconds)
+                self._metrics[(stage, item)] = metric
+            metric.seconds += seconds
+            metric.bytes += bytes
+            metric.rows += rows
+            metric.count += 1
+            metric.errors += int(error)
+            metric.started_at = min(metric.started_at, now - seconds)
+            metric.finished_at = now
+            peak = _sampler.peak(now - seconds, now)
+            if peak is not None:
+                metric.peak_rss = max(metric.peak_rss or 0, peak)
+
+    @contextmanager
+    def stage(self, stage: str, item: str = "") -> Iterator[StageMetric]:
+        """Times the block; set ``bytes``/``rows``/``errors`` on the yielded
+        metric. An exception leaving the block counts as an error."""
+        current = StageMetric(stage, item)
+        started = time.monotonic()
+        error = False
+        try:
+            yield current
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(
+                stage,
+                item,
+                time.monotonic() - started,
+                current.bytes,
+                current.rows,
+                error or current.errors > 0,
+            )
+
+    def finish(self, success: bool = True) -> None:
+        self.finished_at = time.time()
+        self.success = self.success and success
+
+    def metrics(self) -> List[StageMetric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def summary(self) -> Dict[str, Dict[str, object]]:
+        stages: Dict[str, Dict[str, object]] = {}
+        for metric in self.metrics():
+            total = stages.setdefault(
+                metric.stage,
+                {
+                    "items": 0,
+                    "errors": 0,
+                    "seconds": 0.0,
+                    "bytes": 0,
+                    "rows": 0,
+                    "started_at": metric.started_at,
+                    "finished_at": metric.finished_at,
+                    "peak_rss": metric.peak_rss,
+                },
+            )
+            total["items"] += 1
+            total["errors"] += metric.errors
+            total["seconds"] += metric.seconds
+            total["bytes"] += metric.bytes
+            total["rows"] += metric.rows
+            total["started_at"] = min(total["started_at"], metric.started_at)
+            total["finished_at"] = max(total["finished_at"], metric.finished_at)
+            if metric.peak_rss is not None:
+                total["peak_rss"] = max(total["peak_rss"] or 0, metric.peak_rss)
+
+        for total in stages.values():
+            wall = total.pop("finished_at") - total.pop("started_at")
+            total["seconds"] = round(total["seconds"], 3)
+            total["wall_seconds"] = round(wall, 3)
+            total["bytes_per_second"] = _rate(total["bytes"], wall)
+            total["rows_per_second"] = _rate(total["rows"], wall)
+        return stages
+
+    def report(self) -> Dict[str, object]:
+        finished_at = self.finished_at or time.time()
+        items = []
+        for metric in self.metrics():
+            item = asdict(metric)
+            del item["started_at"], item["finished_at"]
+            item["seconds"] = round(metric.seconds, 3)
+            item["bytes_per_second"] = _rate(metric.bytes, metric.seconds)
+            item["rows_per_second"] = _rate(metric.rows, metric.seconds)
+            items.append(item)
+        return {
+            "command": self.command,
+            "success": self.success,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "finished_at": datetime.fromtimestamp(finished_at).isoformat(),
+            "duration_seconds": round(finished_at - self.started_at, 3),
+            "peak_rss": peak_rss(),
+            "peak_rss_children": children_peak_rss(),
+            "stages": self.summary(),
+            "items": items,
+        }
+
+    def prometheus(self) -> str:
+        labels = f'command="{self.command}"'
+        finished_at = self.finished_at or time.time()
+        lines = [
+            "# HELP enel_sftp_run_success 1 se a ultima execucao terminou sem erro.",
+            "# TYPE enel_sftp_run_success gauge",
+            f"enel_sftp_run_success{{{labels}}} {int(self.success)}",
+            "# HELP enel_sftp_run_duration_seconds Duracao da ultima execucao.",
+            "# TYPE enel_sftp_run_duration_seconds gauge",
+            f"enel_sftp_run_duration_seconds{{{labels}}} "
+            f"{finished_at - self.started_at:.3f}",
+            "# HELP enel_sftp_run_finished_timestamp_seconds Fim da ultima execucao.",
+            "# TYPE enel_sftp_run_finished_timestamp_seconds gauge",
+            f"enel_sftp_run_finished_timestamp_seconds{{{labels}}} {finished_at:.0f}",
+        ]
+        peak = peak_rss()
+        if peak is not None:
+            lines += [
+                "# HELP enel_sftp_peak_rss_bytes Pico de memoria do processo.",
+                "# TYPE enel_sftp_peak_rss_bytes gauge",
+                f"enel_sftp_peak_rss_bytes{{{labels}}} {peak}",
+            ]
+
+        summary = self.summary()
+        for name, key, help_text in (
+            ("stage_seconds", "wall_seconds", "Duracao de cada etapa."),
+            ("stage_items", "items", "Arquivos processados por etapa."),
+            ("stage_errors", "errors", "Falhas por etapa."),
+            ("stage_bytes", "bytes", "Bytes processados por etapa."),
+            ("stage_rows", "rows", "Linhas processadas por etapa."),
+            ("stage_bytes_per_second", "bytes_per_second", "Vazao em bytes/s."),
+            ("stage_rows_per_second", "rows_per_second", "Vazao em linhas/s."),
+        ):
+            lines += [
+                f"# HELP enel_sftp_{name} {help_text}",
+                f"# TYPE enel_sftp_{name} gauge",
+            ]
+            for stage, total in summary.items():
+                value = total[key] or 0
+                lines.append(
+                    f'enel_sftp_{name}{{{labels},stage="{stage}"}} {value}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+def timed(items: Iterable[T]) -> Iterator[Tuple[float, T]]:
+    """Yields ``(seconds spent producing the item, item)``."""
+    iterator = iter(items)
+    while True:
+        started = time.monotonic()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield time.monotonic() - started, item
+
+
+def _write_atomic(path: str, text: str) -> None:
+    # O coletor de textfile do node_exporter pode ler a qualquer momento;
+    # grava em um temporario e renomeia.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_run_report(metrics: RunMetrics, config: MetricsConfig) -> None:
+    if config.report_path:
+        _write_atomic(config.report_path, json.dumps(metrics.report(), indent=2))
+        logger.info("Relatorio da execucao gravado em %s", config.report_path)
+    if config.prometheus_path:
+        _write_atomic(config.prometheus_path, metrics.prometheus())
+        logger.info("Metricas Prometheus gravadas em %s", config.prometheus_path)
+
+
+_current = RunMetrics()
+_current_lock = threading.Lock()
+
+
+def start_run(command: str) -> RunMetrics:
+    global _current
+    _sampler.start()
+    with _current_lock:
+        _current = RunMetrics(command)
+        return _current
+
+
+def get_metrics() -> RunMetrics:
+    return _current
@@ -0,0 +1,434 @@
+"""Overlapping download -> unzip -> parse -> load pipeline for Efetividade."""
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Pattern
+
+from .config import EfetividadeConfig, PasswordSftpConfig
+from .etl.efetividade import iter_efetividade_chunks
+from .etl.dedup import open_dedup_index
+from .etl.ledger import LoadLedger
+from .etl.validation import Validator, open_validator
+from .etl.loader import create_loader
+from .manifest import STATUS_FAILED, STATUS_OK, SyncManifest, open_manifest
+from .metrics import get_metrics, timed
+from .remote_index import get_remote_index
+from .sftp_client import extract_zip
+from .tools import sftp_password_regex
+from .transfer import fetch_file
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_POLL = 0.5
+
+CHUNK = "chunk"
+END = "end"
+ERROR = "error"
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    produced: int = 0
+    busy: float = 0.0
+    waiting_input: float = 0.0
+    waiting_output: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def utilization(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.busy / self.elapsed
+
+    def describe(self) -> str:
+        return (
+            f"{self.name:<10} entrada={self.items:<6} saida={self.produced:<6} "
+            f"ocupado={self.utilization:6.1%} "
+            f"esperando entrada={self.waiting_input:7.1f}s "
+            f"bloqueado na saida={self.waiting_output:7.1f}s"
+        )
+
+
+class _Stage(threading.Thread):
+    """Runs ``work(item, emit)`` for each input item in its own thread.
+
+    Time is split into busy, waiting for input and blocked on a full output
+    queue (backpressure), which is what the utilization report shows.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        work: Callable[[Any, Callable[[Any], None]], None],
+        inbox: Optional["queue.Queue"],
+        outbox: Optional["queue.Queue"],
+        stop: threading.Event,
+    ) -> None:
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.stats = StageStats(name)
+        self._work = work
+        self._inbox = inbox
+        self._outbox = outbox
+        self._halt = stop
+        self.error: Optional[BaseException] = None
+
+    def _emit(self, item: Any) -> None:
+        started = time.monotonic()
+        while not self._halt.is_set():
+            try:
+                self._outbox.put(item, timeout=_POLL)
+                if item is not _DONE:
+                    self.stats.produced += 1
+                break
+            except queue.Full:
+                continue
+        self.stats.waiting_output += time.monotonic() - started
+
+    def _next(self) -> Any:
+        started = time.monotonic()
+        while not self._halt.is_set():
+            try:
+                item = self._inbox.get(timeout=_POLL)
+                break
+            except queue.Empty:
+                continue
+        else:
+            item = _DONE
+        self.stats.waiting_input += time.monotonic() - started
+        return item
+
+    def _process(self, item: Any) -> None:
+        # Tempo ocupado = tempo total do item menos o tempo bloqueado no put.
+        blocked_before = self.stats.waiting_output
+        started = time.monotonic()
+        self._work(item, self._emit)
+        spent = time.monotonic() - started
+        self.stats.busy += spent - (self.stats.waiting_output - blocked_before)
+        self.stats.items += 1
+
+    def run(self) -> None:
+        started = time.monotonic()
+        try:
+            if self._inbox is None:
+                self._process(None)
+            else:
+                while True:
+                    item = self._next()
+                    if item is _DONE:
+                        break
+                    self._process(item)
+        except BaseException as exc:
+            logger.error("Falha no estagio %s: %s", self.stats.name, exc)
+            self.error = exc
+            self._halt.set()
+        finally:
+            if self._outbox is not None:
+                self._emit(_DONE)
+            self.stats.elapsed = time.monotonic() - started
+
+
+def _build_pattern(config: PasswordSftpConfig) -> Pattern[str]:
+    # Alem dos .txt, aceita os mesmos arquivos compactados em .zip.
+    return re.compile(
+        f"{config.file_prefix}.*{config.file_month}.*\\.(txt|zip)$", re.IGNORECASE
+    )
+
+
+def _download_stage(
+    sftp_config: PasswordSftpConfig,
+    sftp,
+    manifest: Optional[SyncManifest],
+    stop: threading.Event,
+):
+    # Emite (caminho local, arquivo remoto, atributos); o remoto so vem quando
+    # o manifesto ainda precisa ser gravado pelo estagio de unzip. Para de
+    # baixar quando outro estagio falha.
+    pattern = _build_pattern(sftp_config)
+
+    def work(_, emit) -> None:
+        os.makedirs(sftp_config.download_base_dir, exist_ok=True)
+        entries = get_remote_index(sftp_config).query(sftp, pattern=pattern)
+        logger.info("%s arquivos remotos selecionados", len(entries))
+        for attr in entries:
+            if stop.is_set():
+                logger.info("Pipeline interrompido; downloads restantes ignorados")
+                return
+            remote_file = f"{sftp_config.remote_path}/{attr.filename}"
+            local_file = os.path.join(sftp_config.download_base_dir, attr.filename)
+            if manifest is not None and manifest.is_unchanged(
+                sftp_config.host, remote_file, attr
+            ):
+                # Para um .zip, os caminhos gravados sao os .txt extraidos.
+                logger.info("Sem alteracoes, usando copia local: %s", attr.filename)
+                entry = manifest.get(sftp_config.host, remote_file)
+                for path in entry.local_paths:
+                    if path.lower().endswith(".txt"):
+                        emit((path, None, None))
+                continue
+            try:
+                stats = fetch_file(sftp, remote_file, local_file, sftp_config.transfer)
+            except Exception as exc:
+                logger.error("Erro ao baixar %s: %s", attr.filename, exc)
+                get_metrics().record("download", attr.filename, error=True)
+                if manifest is not None:
+                    manifest.record(sftp_config.host, remote_file, attr, STATUS_FAILED)
+                continue
+            logger.info("Baixado: %s (%s)", attr.filename, stats.describe())
+            get_metrics().record(
+                "download", attr.filename, stats.seconds, stats.bytes
+            )
+            if local_file.lower().endswith(".zip"):
+                emit((local_file, remote_file, attr))
+                continue
+            if manifest is not None:
+                manifest.record(
+                    sftp_config.host, remote_file, attr, STATUS_OK, [local_file]
+                )
+            emit((local_file, None, None))
+
+    return work
+
+
+def _unzip_stage(
+    sftp_config: PasswordSftpConfig,
+    manifest: Optional[SyncManifest],
+    stop: threading.Event,
+):
+    # O zip e apagado depois de extraido: o manifesto guarda os arquivos
+    # extraidos, como em sftp_client._download_file.
+    def work(item, emit) -> None:
+        local_file, remote_file, attr = item
+        if stop.is_set():
+            return
+        if not local_file.lower().endswith(".zip"):
+            emit(local_file)
+            return
+        paths = extract_zip(local_file, os.path.dirname(local_file))
+        if manifest is not None and remote_file is not None:
+            status = STATUS_OK if paths else STATUS_FAILED
+            manifest.record(sftp_config.host, remote_file, attr, status, paths)
+        for path in paths:
+            if path.lower().endswith(".txt"):
+                emit(path)
+
+    return work
+
+
+def _parse_stage(
+    config: EfetividadeConfig,
+    ledger: Optional[LoadLedger],
+    validator: Optional[Validator],
+    stop: threading.Event,
+):
+    # A validacao roda na thread de parse, antes de o bloco entrar na fila.
+    def work(path: str, emit) -> None:
+        file_name = os.path.basename(path)
+        if ledger is not None and not ledger.plan([path]):
+            logger.info("Ja carregado, sem alteracoes: %s", file_name)
+            return
+        chunks = iter_efetividade_chunks(
+            path, file_name, config.expected_columns, config.chunk_size
+        )
+        seconds = 0.0
+        rows = 0
+        try:
+            for spent, chunk in timed(chunks):
+                if stop.is_set():
+                    return
+                seconds += spent
+                rows += len(chunk)
+                if validator is not None:
+                    chunk = validator.apply(chunk, file_name)
+                emit((CHUNK, file_name, chunk))
+        except Exception as exc:
+            logger.error("Falha ao ler %s: %s", file_name, exc)
+            get_metrics().record("parse", file_name, seconds, rows=rows, error=True)
+            emit((ERROR, file_name, exc))
+            return
+        get_metrics().record("parse", file_name, seconds, os.path.getsize(path), rows)
+        emit((END, file_name, None))
+
+    return work
+
+
+class _LoadStage:
+    """Writes chunks as they arrive; with a ledger, one transaction per file,
+    otherwise, when deduplicating, one per chunk.
+
+    Deduplication runs here and not in the parse stage: files reach this
+    stage in order, so the index only sees keys of files already committed.
+    """
+
+    def __init__(self, config: EfetividadeConfig, ledger: Optional[LoadLedger]):
+        self.loader = create_loader(config)
+        self.ledger = ledger
+        self.dedup = open_dedup_index(config)
+        self.total_rows = 0
+        self._conn = None
+        self._transaction = None
+        self._file_rows = 0
+
+    def _begin(self, file_name: str) -> None:
+        self._conn = self.loader.engine.connect()
+        self._transaction = self._conn.begin()
+        self.loader.delete_source_rows(self._conn, file_name)
+        if self.dedup is not None:
+            self.dedup.replace(file_name)
+        self._file_rows = 0
+
+    def _finish(self, commit: bool) -> None:
+        if commit:
+            self._transaction.commit()
+        else:
+            self._transaction.rollback()
+        self._conn.close()
+        self._conn = None
+        self._transaction = None
+        self._finish_dedup(commit)
+
+    def _finish_dedup(self, commit: bool) -> None:
+        if self.dedup is None:
+            return
+        if commit:
+            self.dedup.commit()
+        else:
+            self.dedup.discard()
+
+    def _load_chunk(self, chunk) -> int:
+        if self.dedup is None:
+            return self.loader.load(chunk).rows
+        # Sem ledger, cada bloco e uma transacao e suas chaves vao para o
+        # indice em seguida, para que uma falha adiante nao as descarte.
+        self.loader.ensure_table(chunk)
+        try:
+            with self.loader.engine.begin() as conn:
+                rows = self.loader.load(chunk, connection=conn).rows
+        except Exception:
+            self.dedup.discard()
+            raise
+        self.dedup.commit()
+        return rows
+
+    def __call__(self, item, emit) -> None:
+        kind, file_name, payload = item
+        if kind == CHUNK:
+            if self.ledger is not None and self._conn is None:
+                self.loader.ensure_table(payload)
+                self._begin(file_name)
+            if self.dedup is not None:
+                payload = self.dedup.filter(payload, file_name)
+            with get_metrics().stage("load", file_name) as metric:
+                if self.ledger is None:
+                    metric.rows = self._load_chunk(payload)
+                    self.total_rows += metric.rows
+                    return
+                metric.rows = self.loader.load(payload, connection=self._conn).rows
+                self._file_rows += metric.rows
+            return
+
+        if kind == ERROR:
+            if self._conn is not None:
+                self._finish(commit=False)
+            else:
+                self._finish_dedup(commit=False)
+            logger.error("Carga de %s interrompida: %s", file_name, payload)
+            return
+
+        if self.ledger is None:
+            self._finish_dedup(commit=True)
+            logger.info("Arquivo carregado: %s", file_name)
+            return
+        if self._conn is None:
+            self._begin(file_name)
+        self.ledger.record(self._conn, file_name, self._file_rows)
+        self._finish(commit=True)
+        self.total_rows += self._file_rows
+        logger.info("Arquivo carregado: %s (%s linhas)", file_name, self._file_rows)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._finish(commit=False)
+        self.loader.close()
+
+
+def run_pipeline(
+    sftp_config: PasswordSftpConfig, config: EfetividadeConfig
+) -> List[StageStats]:
+    """Downloads, unzips, parses and loads Efetividade files concurrently.
+
+    Stages are connected by queues of ``config.pipeline_queue_size`` items,
+    so a slow stage throttles the ones before it and at most that many
+    files/chunks wait between stages.
+    """
+    if config.chunk_size <= 0:
+        raise ValueError("O pipeline requer ENEL_EFETIVIDADE_CHUNK_SIZE > 0")
+
+    sftp, transport = sftp_password_regex.create_sftp_connection(sftp_config)
+    if not sftp:
+        return []
+
+    loader_stage = _LoadStage(config, None)
+    if config.ledger_table:
+        ledger = LoadLedger(loader_stage.loader.engine, config.ledger_table)
+        ledger.ensure_table()
+        loader_stage.ledger = ledger
+    else:
+        ledger = None
+
+    validator = open_validator(config)
+    size = max(1, config.pipeline_queue_size)
+    downloaded, extracted, parsed = (queue.Queue(maxsize=size) for _ in range(3))
+    stop = threading.Event()
+    parse = _parse_stage(config, ledger, validator, stop)
+    manifest = open_manifest(sftp_config.manifest_path, sftp_config.download_base_dir)
+    stages = [
+        _Stage(
+            "download",
+            _download_stage(sftp_config, sftp, manifest, stop),
+            None,
+            downloaded,
+            stop,
+        ),
+        _Stage(
+            "unzip",
+            _unzip_stage(sftp_config, manifest, stop),
+            downloaded,
+            extracted,
+            stop,
+        ),
+        _Stage("parse", parse, extracted, parsed, stop),
+        _Stage("load", loader_stage, parsed, None, stop),
+    ]
+
+    started = time.monotonic()
+    try:
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+    finally:
+        loader_stage.close()
+        sftp_password_regex.close_sftp_connection(sftp, transport)
+
+    logger.info("Pipeline concluido em %.1fs", time.monotonic() - started)
+    for stage in stages:
+        logger.info("%s", stage.stats.describe())
+    bottleneck = max(stages, key=lambda stage: stage.stats.utilization)
+    logger.info("Gargalo: %s", bottleneck.stats.name)
+    for summary in (validator, loader_stage.dedup):
+        if summary is not None:
+            for line in summary.summary():
+                logger.info("%s", line)
+    logger.info("%s linhas carregadas", loader_stage.total_rows)
+
+    for stage in stages:
+        if stage.error is not None:
+            raise RuntimeError(f"Estagio {stage.stats.name} falhou") from stage.error
+    return [stage.stats for stage in stages]
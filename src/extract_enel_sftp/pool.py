@@ -0,0 +1,134 @@
+"""Process-wide pool of authenticated SFTP transports."""
+import atexit
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import paramiko
+
+from .config import TransferConfig
+from .transfer import open_sftp, open_transport
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int, str, str, TransferConfig]
+
+
+def _auth_id(password: Optional[str], pkey) -> str:
+    # Identifica a credencial sem guardar a senha em claro na chave do pool.
+    if pkey is not None:
+        return f"key:{pkey.get_name()}:{pkey.get_fingerprint().hex()}"
+    digest = hashlib.sha256((password or "").encode("utf-8")).hexdigest()
+    return f"password:{digest}"
+
+
+class SftpPool:
+    """Keeps one authenticated Transport per endpoint and credential.
+
+    The SSH handshake and authentication happen once per endpoint; callers
+    get a fresh SFTP channel on the shared transport each time. Transports
+    send keepalives while idle and are reopened when found dead.
+    """
+
+    def __init__(self) -> None:
+        self._transports: Dict[PoolKey, paramiko.Transport] = {}
+        self._key_locks: Dict[PoolKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key: PoolKey) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def transport(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str] = None,
+        pkey=None,
+        transfer: Optional[TransferConfig] = None,
+    ) -> paramiko.Transport:
+        transfer = transfer or TransferConfig()
+        key = (host, port, username, _auth_id(password, pkey), transfer)
+        with self._key_lock(key):
+            transport = self._transports.get(key)
+            if transport is not None and transport.is_authenticated():
+                return transport
+            if transport is not None:
+                logger.warning("Conexao com %s perdida. Reconectando...", host)
+                transport.close()
+
+            transport = open_transport(host, port, transfer)
+            try:
+                transport.connect(username=username, password=password, pkey=pkey)
+            except Exception:
+                transport.close()
+                with self._lock:
+                    self._transports.pop(key, None)
+                raise
+            if transfer.keepalive > 0:
+                transport.set_keepalive(transfer.keepalive)
+            with self._lock:
+                self._transports[key] = transport
+            logger.info("Sessao SSH aberta com %s:%s (%s)", host, port, username)
+            return transport
+
+    def open_sftp(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str] = None,
+        pkey=None,
+        transfer: Optional[TransferConfig] = None,
+    ) -> Tuple[paramiko.SFTPClient, paramiko.Transport]:
+        # Um transport pode morrer sem que is_active() perceba (ex.: VPN caiu
+        # entre dois comandos); a falha ao abrir o canal dispara uma reconexao.
+        transport = self.transport(host, port, username, password, pkey, transfer)
+        try:
+            return open_sftp(transport, transfer), transport
+        except (paramiko.SSHException, EOFError, OSError) as exc:
+            logger.warning("Canal SFTP com %s falhou (%s). Reconectando...", host, exc)
+            transport.close()
+            transport = self.transport(host, port, username, password, pkey, transfer)
+            return open_sftp(transport, transfer), transport
+
+    @contextmanager
+    def sftp(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: Optional[str] = None,
+        pkey=None,
+        transfer: Optional[TransferConfig] = None,
+    ) -> Iterator[paramiko.SFTPClient]:
+        sftp, _ = self.open_sftp(host, port, username, password, pkey, transfer)
+        try:
+            yield sftp
+        finally:
+            sftp.close()
+
+    def owns(self, transport) -> bool:
+        with self._lock:
+            return any(item is transport for item in self._transports.values())
+
+    def close(self) -> None:
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+        for transport in transports:
+            try:
+                transport.close()
+            except Exception as exc:
+                logger.debug("Erro ao fechar transport: %s", exc)
+
+
+_default_pool = SftpPool()
+atexit.register(_default_pool.close)
+
+
+def get_pool() -> SftpPool:
+    return _default_pool
@@ -0,0 +1,212 @@
+"""Compact in-memory dtypes for ENEL record frames."""
+import importlib.util
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (
+    is_integer_dtype,
+    is_numeric_dtype,
+    union_categoricals,
+)
+
+TEXT_DTYPE = (
+    pd.StringDtype("pyarrow") if importlib.util.find_spec("pyarrow") else None
+)
+
+KIND_CATEGORY = "category"
+KIND_TEXT = "text"
+KIND_INTEGER = "integer"
+KIND_FLOAT32 = "float32"
+
+MAX_CATEGORY_RATIO = 0.5
+
+
+def _to_number(values: pd.Series) -> pd.Series:
+    if is_numeric_dtype(values.dtype):
+        return values
+    return pd.to_numeric(
+        values.astype(object).str.replace(",", ".", regex=False), errors="coerce"
+    )
+
+
+def _to_text(values: pd.Series) -> pd.Series:
+    if TEXT_DTYPE is None:
+        return values
+    return values.astype(TEXT_DTYPE)
+
+
+def _to_category(values: pd.Series) -> pd.Series:
+    # Categoria so compensa com valores repetidos; acima disso o indice de
+    # codigos mais as categorias ocupam mais que o proprio texto.
+    if values.nunique() > len(values) * MAX_CATEGORY_RATIO:
+        return _to_text(values)
+    return values.astype("category")
+
+
+def _exact_integer(values: pd.Series) -> Optional[pd.Series]:
+    # So converte se nada se perde (nulos, zeros a esquerda, decimais).
+    if is_numeric_dtype(values.dtype):
+        return pd.to_numeric(values, downcast="integer")
+    numbers = pd.to_numeric(values, errors="coerce")
+    if numbers.isna().any():
+        return None
+    as_text = numbers.astype("int64").astype(str)
+    if not (as_text == values.astype(str).str.strip()).all():
+        return None
+    return pd.to_numeric(numbers.astype("int64"), downcast="integer")
+
+
+def _to_integer(values: pd.Series) -> pd.Series:
+    numbers = _exact_integer(values)
+    return _to_category(values) if numbers is None else numbers
+
+
+def _convert(values: pd.Series, kind: str) -> pd.Series:
+    if kind == KIND_CATEGORY:
+        return _to_category(values)
+    if kind == KIND_FLOAT32:
+        return _to_number(values).astype("float32")
+    if kind == KIND_INTEGER:
+        return _to_integer(values)
+    if kind == KIND_TEXT:
+        return _to_text(values)
+    return values
+
+
+def _resolved_kind(values: pd.Series, kind: str) -> str:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return KIND_CATEGORY
+    if kind in (KIND_CATEGORY, KIND_INTEGER) and not is_numeric_dtype(values.dtype):
+        return KIND_TEXT
+    return kind
+
+
+class FrameCompactor:
+    """Compacts the frames of one data set with a single dtype per column.
+
+    The first frame that has a column decides its kind (``category`` may
+    resolve to ``text`` and ``integer`` to ``category`` or ``text``); later
+    frames are converted to that same kind, so ``concat_compact`` and the
+    loader see one dtype per column. A later frame whose values do not fit
+    the decided integer type moves the column to ``category`` from then on;
+    ``concat_compact`` turns the earlier integer frames into categories.
+    """
+
+    def __init__(self, column_types: Dict[str, str]) -> None:
+        self._kinds = dict(column_types)
+        self._decided: Dict[str, str] = {}
+
+    def _apply(self, column: str, values: pd.Series) -> pd.Series:
+        kind = self._decided.get(column)
+        if kind is None:
+            converted = _convert(values, self._kinds[column])
+            self._decided[column] = _resolved_kind(converted, self._kinds[column])
+            return converted
+        if kind == KIND_CATEGORY:
+            return values.astype("category")
+        if kind == KIND_INTEGER:
+            numbers = _exact_integer(values)
+            if numbers is not None:
+                return numbers
+            self._decided[column] = KIND_CATEGORY
+            return values.astype("category")
+        return _convert(values, kind)
+
+    def compact(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.assign(
+            **{
+                column: self._apply(column, df[column])
+                for column in self._kinds
+                if column in df.columns
+            }
+        )
+
+
+def compact_frame(df: pd.DataFrame, column_types: Dict[str, str]) -> pd.DataFrame:
+    """Returns ``df`` with the columns in ``column_types`` re-typed.
+
+    ``category`` keeps one copy of each distinct value (falling back to
+    ``text`` when most values are distinct), ``text`` moves
+    high-cardinality identifiers into Arrow strings (when pyarrow is
+    installed), ``integer`` downcasts when the text round-trips exactly and
+    ``float32`` parses coordinates. Other columns are left untouched. Use
+    ``FrameCompactor`` when the frames will be combined.
+    """
+    return FrameCompactor(column_types).compact(df)
+
+
+def _as_category(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    return values.astype(str).astype("category")
+
+
+def concat_compact(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    # pd.concat devolve object quando as categorias diferem entre arquivos;
+    # unir as categorias antes mantem as colunas compactas. Uma coluna que
+    # passou de inteiro para categoria no meio do conjunto vira categoria em
+    # todos os arquivos.
+    if not frames:
+        return pd.DataFrame()
+    frames = list(frames)
+    for column in frames[0].columns:
+        dtypes = [frame[column].dtype for frame in frames]
+        if not any(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        if not all(
+            isinstance(dtype, pd.CategoricalDtype) or is_integer_dtype(dtype)
+            for dtype in dtypes
+        ):
+            continue
+        frames = [
+            frame.assign(**{column: _as_category(frame[column])})
+            for frame in frames
+        ]
+        categories = union_categoricals(
+            [frame[column] for frame in frames], ignore_order=True
+        ).categories
+        frames = [
+            frame.assign(**{column: frame[column].cat.set_categories(categories)})
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def to_load_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Turns float32 columns back into their shortest decimal text.
+
+    Sending float32 values to the database would expose binary noise
+    (``-3.71`` becomes ``-3.7100000381``); the text form matches the source.
+    """
+    float32_columns = [
+        column for column in df.columns if df[column].dtype == np.float32
+    ]
+    if not float32_columns:
+        return df
+    converted = {}
+    for column in float32_columns:
+        values = df[column]
+        text = pd.Series(values.to_numpy().astype(str), index=df.index, dtype=object)
+        converted[column] = text.where(values.notna(), None)
+    return df.assign(**converted)
+
+
+def memory_usage(df: pd.DataFrame) -> pd.Series:
+    return df.memory_usage(deep=True, index=False)
+
+
+def memory_report(before: pd.Series, after: pd.Series) -> str:
+    lines = [f"{'coluna':<24}{'antes MB':>12}{'depois MB':>12}{'reducao':>10}"]
+    for column in before.index:
+        old = before[column] / 1024**2
+        new = after.get(column, 0) / 1024**2
+        ratio = f"{old / new:.1f}x" if new else "-"
+        lines.append(f"{column:<24}{old:>12.1f}{new:>12.1f}{ratio:>10}")
+    total_before = before.sum() / 1024**2
+    total_after = after.sum() / 1024**2
+    total_ratio = f"{total_before / total_after:.1f}x" if total_after else "-"
+    lines.append(
+        f"{'total':<24}{total_before:>12.1f}{total_after:>12.1f}{total_ratio:>10}"
+    )
+    return "\n".join(lines)
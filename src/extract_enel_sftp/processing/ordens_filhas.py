@@ -1,59 +1,212 @@
 import csv
-from typing import Optional
+import io
+import os
+from typing import IO, Dict, Optional, Tuple, Union
 
 import pandas as pd
 
+from ..cache import open_parse_cache
+from ..config import EXPECTED_COLUMN_TYPES, ParseCacheConfig
+from ..metrics import get_metrics
+from .compact import compact_frame, memory_report, memory_usage
+from .ranges import read_file_ranges
+from .schema import DTYPE_DATE, DTYPE_FLOAT, FieldSpec, RecordSchema, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+    pa_csv = None
+
+# Incrementar sempre que a saida do parser mudar (invalida o cache de parsing).
+ORDENS_FILHAS_SCHEMA_VERSION = 3
+
+# O arquivo nao tem cabecalho. As 21 primeiras posicoes seguem o layout ja
+# usado pela BI; estado, data_ingresso e data_estado vem logo em seguida.
+ORDENS_FILHAS_SCHEMA = RecordSchema(
+    fields=(
+        FieldSpec("CO", 0),
+        FieldSpec("REFERENCIA", 1),
+        FieldSpec("NUMERO_CLIENTE", 2),
+        FieldSpec("MATRICULA_LEITURISTA", 3),
+        FieldSpec("SECTOR", 4),
+        FieldSpec("LOCALIDADE", 5),
+        FieldSpec("ZONA", 6),
+        FieldSpec("MUNICIPIO", 7),
+        FieldSpec("BAIRRO", 8),
+        FieldSpec("IRREG_LIDA", 9),
+        FieldSpec("IRREG_OPERADOR", 10),
+        FieldSpec("NUMERO_MEDIDOR", 11),
+        FieldSpec("DESC_IRREG_LIDA", 12),
+        FieldSpec("DESC_IRREG_OPERADOR", 13),
+        FieldSpec("DX", 14),
+        FieldSpec("TELEMEDIDO", 15),
+        FieldSpec("UNIDADE_LEITURA", 16),
+        FieldSpec("CODIGO_MUNICIPIO", 17),
+        FieldSpec("FAT_BIMESTRAL", 18),
+        FieldSpec("LATITUDE", 19, DTYPE_FLOAT),
+        FieldSpec("LONGITUDE", 20, DTYPE_FLOAT),
+        FieldSpec("estado", 21),
+        FieldSpec("data_ingresso", 22, DTYPE_DATE, "%d/%m/%Y"),
+        FieldSpec("data_estado", 23, DTYPE_DATE, "%d/%m/%Y"),
+    ),
+    sep="|",
+    encoding="cp1252",
+)
+
+ESTADOS_DESCARTADOS = ["04", "09"]
+
+ORDENS_FILHAS_COLUMN_TYPES = {
+    **EXPECTED_COLUMN_TYPES,
+    "estado": "category",
+    "BASE": "category",
+}
 
-def processar_ordens_filhas(arquivo: Optional[str] = None) -> pd.DataFrame:
-    if arquivo is None:
-        arquivo = "archives/COELCE_elaazisysd00_ordemfilhas.txt"
 
-    df_ordens_filhas = pd.read_csv(
+def _read_raw_c(
+    arquivo: Union[str, IO[bytes]], schema: RecordSchema, width: int = 0
+) -> pd.DataFrame:
+    # Com ``width`` colunas nomeadas, linhas mais curtas saem completadas com
+    # nulos em vez de interromper a leitura.
+    return pd.read_csv(
         arquivo,
-        sep="|",
-        encoding="cp1252",
+        sep=schema.sep,
+        encoding=schema.encoding,
         quoting=csv.QUOTE_NONE,
-        engine="python",
+        engine="c",
         header=None,
+        names=list(range(width)) if width else None,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
     )
 
-    df_ordens_filhas.columns = [
-        f"Column{i + 1}" for i in range(len(df_ordens_filhas.columns))
-    ]
-
-    df_ordens_filhas = df_ordens_filhas.rename(
-        columns={
-            "Column1": "CO",
-            "Column2": "REFERENCIA",
-            "Column3": "NUMERO_CLIENTE",
-            "Column4": "MATRICULA_LEITURISTA",
-            "Column5": "SECTOR",
-            "Column6": "LOCALIDADE",
-            "Column7": "ZONA",
-            "Column8": "MUNICIPIO",
-            "Column9": "BAIRRO",
-            "Column10": "IRREG_LIDA",
-            "Column11": "IRREG_OPERADOR",
-            "Column12": "NUMERO_MEDIDOR",
-            "Column13": "DESC_IRREG_LIDA",
-            "Column14": "DESC_IRREG_OPERADOR",
-            "Column15": "DX",
-            "Column16": "TELEMEDIDO",
-            "Column17": "UNIDADE_LEITURA",
-            "Column18": "CODIGO_MUNICIPIO",
-            "Column19": "FAT_BIMESTRAL",
-            "Column20": "LATITUDE",
-            "Column21": "LONGITUDE",
-        }
-    )
 
-    df_ordens_filhas = df_ordens_filhas[~df_ordens_filhas["estado"].isin(["04", "09"])]
-    df_ordens_filhas["data_ingresso"] = pd.to_datetime(
-        df_ordens_filhas["data_ingresso"], errors="coerce", dayfirst=True
-    )
-    df_ordens_filhas["data_estado"] = pd.to_datetime(
-        df_ordens_filhas["data_estado"], errors="coerce", dayfirst=True
+def _read_raw(
+    arquivo: Union[str, IO[bytes]], schema: RecordSchema
+) -> Tuple[pd.DataFrame, Dict[int, int]]:
+    """Reads every field as text; also returns, per column count, how many
+    rows did not have the schema's width."""
+    # Tudo e lido como texto, sem aspas (QUOTE_NONE): o tipo de cada campo
+    # vem do schema, nao da inferencia do leitor.
+    if pa_csv is None:
+        return _read_raw_c(arquivo, schema), {}
+
+    if not isinstance(arquivo, str) and not arquivo.seekable():
+        arquivo = io.BytesIO(arquivo.read())
+    start = 0 if isinstance(arquivo, str) else arquivo.tell()
+    ragged: Dict[int, int] = {}
+
+    def invalid_row(row) -> str:
+        ragged[row.actual_columns] = ragged.get(row.actual_columns, 0) + 1
+        return "skip"
+
+    names = [f"f{i}" for i in range(schema.width)]
+    table = pa_csv.read_csv(
+        arquivo,
+        read_options=pa_csv.ReadOptions(
+            column_names=names, encoding=schema.encoding
+        ),
+        parse_options=pa_csv.ParseOptions(
+            delimiter=schema.sep, quote_char=False, invalid_row_handler=invalid_row
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
     )
-    df_ordens_filhas["BASE"] = "ORDENS FILHAS"
+    # Texto continua em memoria Arrow: evita criar um objeto Python por
+    # celula e mantem strip/replace/isin vetorizados.
+    string_dtype = pd.StringDtype("pyarrow")
+    if not ragged:
+        return table.to_pandas(types_mapper={pa.string(): string_dtype}.get), ragged
+
+    # Linhas avulsas fora da largura: o pyarrow so as descarta; o leitor C,
+    # com colunas suficientes para a linha mais longa, mantem todas na ordem
+    # do arquivo.
+    if not isinstance(arquivo, str):
+        arquivo.seek(start)
+    raw = _read_raw_c(arquivo, schema, max(schema.width, *ragged))
+    return raw.astype(string_dtype), ragged
+
+
+def _check_width(arquivo: Union[str, IO[bytes]], schema: RecordSchema) -> None:
+    # Uma largura errada na primeira linha indica posicoes erradas no arquivo
+    # inteiro; cada linha cairia no caminho lento de linhas fora da largura.
+    if isinstance(arquivo, str):
+        with open(arquivo, "rb") as handle:
+            line = handle.readline()
+    else:
+        start = arquivo.tell()
+        line = arquivo.readline()
+        arquivo.seek(start)
+    text = line.decode(schema.encoding, errors="replace").rstrip("\r\n")
+    width = text.count(schema.sep) + 1 if text else schema.width
+    if width != schema.width:
+        raise ValueError(
+            f"Arquivo com {width} colunas na primeira linha, schema espera "
+            f"{schema.width}; confira as posicoes em ORDENS_FILHAS_SCHEMA."
+        )
+
+
+def _parse(arquivo: Union[str, IO[bytes]]) -> pd.DataFrame:
+    raw, ragged = _read_raw(arquivo, ORDENS_FILHAS_SCHEMA)
+    df = apply_schema(raw, ORDENS_FILHAS_SCHEMA, ragged)
+    descartados = df["estado"].str.strip().isin(ESTADOS_DESCARTADOS)
+    return df[~descartados]
+
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    compacted = compact_frame(df, ORDENS_FILHAS_COLUMN_TYPES)
+    print("Memoria por coluna (texto -> compacto):")
+    print(memory_report(memory_usage(df), memory_usage(compacted)))
+    return compacted
+
+
+def processar_ordens_filhas(
+    arquivo: Optional[Union[str, IO[bytes]]] = None,
+    cache_config: Optional[ParseCacheConfig] = None,
+    compact: bool = False,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """Reads, types and filters the ordens filhas file.
+
+    With ``workers > 1`` a local file is split into byte ranges parsed in
+    parallel (see ``processing/ranges.py``); streams are read in one piece.
+    Raises ``ValueError`` when the first line does not have the schema's
+    width; single rows of another width are kept and reported.
+    """
+    if arquivo is None:
+        arquivo = "archives/COELCE_elaazisysd00_ordemfilhas.txt"
+
+    # Streams remotos nao tem fingerprint local; so caminhos usam o cache.
+    cache = None
+    if isinstance(arquivo, str):
+        cache = open_parse_cache(
+            cache_config, "ordens_filhas", ORDENS_FILHAS_SCHEMA_VERSION
+        )
+    if cache is not None:
+        cached = cache.get(arquivo)
+        if cached is not None:
+            return _compact(cached) if compact else cached
+
+    name = os.path.basename(arquivo) if isinstance(arquivo, str) else "stream"
+    with get_metrics().stage("parse", name) as metric:
+        if not isinstance(arquivo, str) and not arquivo.seekable():
+            arquivo = io.BytesIO(arquivo.read())
+        _check_width(arquivo, ORDENS_FILHAS_SCHEMA)
+        if isinstance(arquivo, str):
+            df_ordens_filhas = read_file_ranges(arquivo, _parse, workers)
+        else:
+            df_ordens_filhas = _parse(arquivo)
+        df_ordens_filhas = df_ordens_filhas.reset_index(drop=True)
+        df_ordens_filhas["BASE"] = "ORDENS FILHAS"
+        metric.rows = len(df_ordens_filhas)
+        if isinstance(arquivo, str):
+            metric.bytes = os.path.getsize(arquivo)
 
-    return df_ordens_filhas
+    if cache is not None:
+        cache.put(arquivo, df_ordens_filhas)
+    return _compact(df_ordens_filhas) if compact else df_ordens_filhas
@@ -0,0 +1,126 @@
+"""Parallel parsing of one large delimited file split into byte ranges."""
+import io
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# Faixas menores equilibram melhor os processos; cada faixa e copiada uma vez
+# para o processo que a le.
+RANGE_BYTES = 64 * 1024 * 1024
+
+Reader = Callable[..., pd.DataFrame]
+
+
+def split_ranges(
+    mapped: mmap.mmap, parts: int, start: int = 0
+) -> List[Tuple[int, int]]:
+    """Splits ``mapped[start:]`` into up to ``parts`` ranges ending at a newline.
+
+    Safe for cp1252 and utf-8: ``\\n`` never appears inside a multi-byte
+    utf-8 character. Assumes no field contains a line break (QUOTE_NONE).
+    """
+    size = len(mapped)
+    bounds = [start]
+    for part in range(1, parts):
+        newline = mapped.find(b"\n", start + (size - start) * part // parts)
+        if newline < 0:
+            break
+        if newline + 1 > bounds[-1] and newline + 1 < size:
+            bounds.append(newline + 1)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_range(
+    path: str,
+    start: int,
+    stop: int,
+    header_end: int,
+    reader: Reader,
+    args: tuple,
+) -> Optional[pd.DataFrame]:
+    # Executa no processo filho. O cabecalho vai na frente de cada faixa, para
+    # que o leitor trate a faixa exatamente como um arquivo inteiro.
+    with open(path, "rb") as handle, mmap.mmap(
+        handle.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        data = mapped[start:stop]
+        if not data.strip():
+            return None
+        if header_end:
+            data = mapped[:header_end] + data
+    return reader(io.BytesIO(data), *args)
+
+
+def _iter_ranges(
+    path: str,
+    ranges: List[Tuple[int, int]],
+    header_end: int,
+    reader: Reader,
+    args: tuple,
+    workers: int,
+) -> Iterator[Optional[pd.DataFrame]]:
+    # No maximo ``workers`` faixas em andamento; os resultados saem na ordem
+    # do arquivo.
+    pending_ranges = iter(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(
+            executor.submit(_read_range, path, start, stop, header_end, reader, args)
+            for start, stop in islice(pending_ranges, workers)
+        )
+        while pending:
+            future = pending.popleft()
+            next_range = next(pending_ranges, None)
+            if next_range is not None:
+                start, stop = next_range
+                pending.append(
+                    executor.submit(
+                        _read_range, path, start, stop, header_end, reader, args
+                    )
+                )
+            yield future.result()
+
+
+def read_file_ranges(
+    path: str,
+    reader: Reader,
+    workers: int,
+    header: bool = False,
+    args: tuple = (),
+    range_bytes: int = RANGE_BYTES,
+) -> pd.DataFrame:
+    """Parses ``path`` with ``reader(stream, *args)`` on ``workers`` processes.
+
+    The file is memory-mapped and cut at line breaks into ranges of about
+    ``range_bytes``; each process reads its range (preceded by the header
+    line when ``header``) and the frames are concatenated in file order.
+    ``reader`` must be a module-level function so it can be pickled.
+    """
+    size = os.path.getsize(path)
+    ranges: List[Tuple[int, int]] = []
+    if workers > 1 and size > 0:
+        with open(path, "rb") as handle, mmap.mmap(
+            handle.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped:
+            header_end = mapped.find(b"\n") + 1 if header else 0
+            if not header or header_end > 0:
+                parts = max(workers, -(-size // range_bytes))
+                ranges = split_ranges(mapped, parts, header_end)
+
+    frames = []
+    if len(ranges) > 1:
+        frames = [
+            frame
+            for frame in _iter_ranges(path, ranges, header_end, reader, args, workers)
+            if frame is not None
+        ]
+    if not frames:
+        # Arquivo pequeno demais para dividir, vazio ou so com o cabecalho.
+        with open(path, "rb") as handle:
+            return reader(handle, *args)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,91 @@
+"""Declarative record schemas for positional, delimiter-separated files."""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+DTYPE_STRING = "string"
+DTYPE_FLOAT = "float"
+DTYPE_DATE = "date"
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    position: int
+    dtype: str = DTYPE_STRING
+    date_format: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class RecordSchema:
+    """Fields by position; everything is read as text and typed afterwards."""
+
+    fields: Tuple[FieldSpec, ...]
+    sep: str = "|"
+    encoding: str = "utf-8"
+
+    @property
+    def width(self) -> int:
+        return max(spec.position for spec in self.fields) + 1
+
+    @property
+    def names(self) -> List[str]:
+        return [spec.name for spec in self.fields]
+
+
+def _convert(values: pd.Series, spec: FieldSpec) -> pd.Series:
+    if spec.dtype == DTYPE_FLOAT:
+        decimal = values.str.replace(",", ".", regex=False)
+        return pd.to_numeric(decimal, errors="coerce").astype("float64")
+    if spec.dtype == DTYPE_DATE:
+        converted = pd.to_datetime(values, format=spec.date_format, errors="coerce")
+        outside = converted.isna() & values.notna()
+        if outside.any():
+            # Valores com hora ou outro separador: o formato exato e so o
+            # caminho rapido; o restante segue a leitura dia/mes de antes.
+            converted[outside] = pd.to_datetime(
+                values[outside], format="mixed", dayfirst=True, errors="coerce"
+            )
+        invalid = int((converted.isna() & values.notna()).sum())
+        if invalid:
+            print(
+                f"Aviso: {invalid} valores de {spec.name} nao sao datas "
+                f"({spec.date_format})."
+            )
+        return converted
+    return values
+
+
+def apply_schema(
+    raw: pd.DataFrame,
+    schema: RecordSchema,
+    ragged: Optional[Dict[int, int]] = None,
+) -> pd.DataFrame:
+    """Names and types the positional columns of ``raw`` according to ``schema``.
+
+    A column count different from the schema is reported, for the file or,
+    with ``ragged`` (rows per column count, as counted by the reader), for
+    each row width; positions missing from a row come out as nulls and extra
+    columns are dropped.
+    """
+    if ragged:
+        for columns, rows in sorted(ragged.items()):
+            print(
+                f"Aviso: {rows} linhas com {columns} colunas, schema espera "
+                f"{schema.width}."
+            )
+    elif raw.shape[1] != schema.width:
+        print(
+            f"Aviso: arquivo com {raw.shape[1]} colunas, schema espera "
+            f"{schema.width}."
+        )
+
+    columns = {}
+    for spec in schema.fields:
+        if spec.position < raw.shape[1]:
+            values = raw.iloc[:, spec.position]
+        else:
+            values = pd.Series(None, index=raw.index, dtype=object)
+        columns[spec.name] = _convert(values, spec)
+    return pd.DataFrame(columns, index=raw.index)
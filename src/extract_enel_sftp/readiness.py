@@ -0,0 +1,124 @@
+"""Network readiness probes used while waiting for the VPN tunnel."""
+import logging
+import socket
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .config import ExtractorConfig, ReadinessConfig
+
+logger = logging.getLogger(__name__)
+
+Target = Tuple[str, int]
+
+
+class TcpProbe:
+    """Ready when a TCP connection succeeds to every target.
+
+    Targets are probed in parallel; once a target answered it is not probed
+    again, so each round only waits on the ones still unreachable.
+    """
+
+    name = "tcp"
+
+    def __init__(self, targets: Sequence[Target], connect_timeout: float = 2.0):
+        self.pending: List[Target] = list(dict.fromkeys(targets))
+        self.connect_timeout = connect_timeout
+
+    def _reachable(self, target: Target) -> bool:
+        try:
+            with socket.create_connection(target, timeout=self.connect_timeout):
+                return True
+        except OSError:
+            return False
+
+    def check(self) -> bool:
+        if not self.pending:
+            return True
+        with ThreadPoolExecutor(max_workers=len(self.pending)) as executor:
+            reachable = list(executor.map(self._reachable, self.pending))
+        self.pending = [
+            target for target, ok in zip(self.pending, reachable) if not ok
+        ]
+        return not self.pending
+
+    def describe(self) -> str:
+        return ", ".join(f"{host}:{port}" for host, port in self.pending)
+
+
+class GlobalProtectProbe:
+    """Ready when ``route print`` lists the GlobalProtect adapter (Windows)."""
+
+    name = "globalprotect"
+
+    def check(self) -> bool:
+        try:
+            result = subprocess.run(
+                ["route", "print"], capture_output=True, text=True, timeout=10
+            )
+            return "PANGP Virtual Ethernet Adapter" in result.stdout
+        except Exception:
+            return False
+
+    def describe(self) -> str:
+        return "adaptador PANGP"
+
+
+def _tcp_probe(config: ExtractorConfig) -> TcpProbe:
+    targets = [(host.host, 22) for host in config.hosts]
+    return TcpProbe(targets, config.readiness.connect_timeout)
+
+
+def _globalprotect_probe(config: ExtractorConfig) -> GlobalProtectProbe:
+    return GlobalProtectProbe()
+
+
+PROBE_BACKENDS: Dict[str, Callable[[ExtractorConfig], object]] = {
+    "tcp": _tcp_probe,
+    "globalprotect": _globalprotect_probe,
+}
+
+
+def build_probes(config: ExtractorConfig) -> List:
+    probes = []
+    for name in config.readiness.probes:
+        if name not in PROBE_BACKENDS:
+            raise ValueError(f"Probe de conectividade desconhecido: {name}")
+        probes.append(PROBE_BACKENDS[name](config))
+    return probes
+
+
+def wait_until_ready(
+    probes: Sequence,
+    readiness: ReadinessConfig,
+    timeout: Optional[float] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> bool:
+    """Polls ``probes`` until all pass, with exponential backoff.
+
+    Returns as soon as every probe is ready; ``timeout=0`` checks once.
+    """
+    timeout = readiness.timeout if timeout is None else timeout
+    started = time.monotonic()
+    deadline = started + timeout
+    delay = readiness.initial_delay
+    last_report = started
+
+    while True:
+        pending = [probe for probe in probes if not probe.check()]
+        now = time.monotonic()
+        if not pending:
+            logger.info("Rede pronta apos %.1fs", now - started)
+            return True
+        if now >= deadline:
+            return False
+        if now - last_report >= 30:
+            logger.info(
+                "Ainda aguardando rede (%ss): %s",
+                int(now - started),
+                "; ".join(probe.describe() for probe in pending),
+            )
+            last_report = now
+        sleep(min(delay, deadline - now))
+        delay = min(delay * 1.5, readiness.max_delay)
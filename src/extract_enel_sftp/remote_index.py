@@ -0,0 +1,210 @@
+"""Cached index of a remote directory listing."""
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Pattern, Tuple
+
+import paramiko
+
+from .config import PasswordSftpConfig
+
+logger = logging.getLogger(__name__)
+
+_MONTH_VALUE = r"20\d{2}(?:0[1-9]|1[0-2])"
+_MONTH = re.compile(f"(?=({_MONTH_VALUE}))")
+
+
+def _to_attr(
+    filename: str, size: int, mtime: int, mode: int
+) -> paramiko.SFTPAttributes:
+    attr = paramiko.SFTPAttributes()
+    attr.filename = filename
+    attr.st_size = size
+    attr.st_mtime = mtime
+    attr.st_mode = mode
+    return attr
+
+
+class RemoteDirectoryIndex:
+    """``listdir_attr`` of one remote directory, kept in memory and on disk.
+
+    Within ``ttl`` seconds queries are answered without touching the server.
+    After that the directory is stat'ed first: if its mtime did not change
+    no file was added or removed, so only the entries matched by a query are
+    re-stat'ed (their size/mtime may have changed); otherwise the directory
+    is listed again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        remote_path: str,
+        ttl: float = 300.0,
+        index_path: str = "",
+    ) -> None:
+        self.host = host
+        self.remote_path = remote_path
+        self.ttl = ttl
+        self.index_path = index_path
+        self._entries: Dict[str, paramiko.SFTPAttributes] = {}
+        self._names: List[str] = []
+        self._by_month: Dict[str, List[str]] = {}
+        self._unverified: set = set()
+        self._dir_mtime: Optional[int] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def _key(self) -> str:
+        return f"{self.host}:{self.remote_path}"
+
+    def _load(self) -> None:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as handle:
+                raw = json.load(handle).get(self._key)
+        except (OSError, ValueError) as exc:
+            logger.warning("Indice remoto ignorado (%s): %s", self.index_path, exc)
+            return
+        if not raw:
+            return
+        self._dir_mtime = raw["dir_mtime"]
+        self._refreshed_at = raw["refreshed_at"]
+        self._set_entries(
+            [_to_attr(name, *values) for name, values in raw["entries"].items()]
+        )
+
+    def _save(self) -> None:
+        if not self.index_path:
+            return
+        data = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                data = {}
+        data[self._key] = {
+            "dir_mtime": self._dir_mtime,
+            "refreshed_at": self._refreshed_at,
+            "entries": {
+                name: [attr.st_size, attr.st_mtime, attr.st_mode]
+                for name, attr in self._entries.items()
+            },
+        }
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(tmp_path, self.index_path)
+
+    def _set_entries(self, attrs: List[paramiko.SFTPAttributes]) -> None:
+        self._entries = {attr.filename: attr for attr in attrs}
+        self._names = sorted(self._entries)
+        self._by_month = {}
+        for name in self._names:
+            for month in set(_MONTH.findall(name)):
+                self._by_month.setdefault(month, []).append(name)
+        self._unverified = set()
+
+    def refresh(self, sftp, force: bool = False) -> None:
+        with self._lock:
+            now = time.time()
+            if not force and self._entries and now - self._refreshed_at < self.ttl:
+                return
+
+            dir_mtime = sftp.stat(self.remote_path).st_mtime
+            if not force and self._entries and dir_mtime == self._dir_mtime:
+                logger.info("Diretorio remoto sem novos arquivos: %s", self.remote_path)
+                self._unverified = set(self._names)
+            else:
+                started = time.monotonic()
+                self._set_entries(sftp.listdir_attr(self.remote_path))
+                logger.info(
+                    "Diretorio remoto listado: %s (%s entradas em %.1fs)",
+                    self.remote_path,
+                    len(self._names),
+                    time.monotonic() - started,
+                )
+            self._dir_mtime = dir_mtime
+            self._refreshed_at = now
+            self._save()
+
+    def _candidates(self, prefix: str, month: str) -> List[str]:
+        if prefix:
+            start = bisect.bisect_left(self._names, prefix)
+            end = bisect.bisect_left(self._names, prefix + "\U0010ffff")
+            names = self._names[start:end]
+            if month:
+                names = [name for name in names if month in name]
+            return names
+        if month and re.fullmatch(_MONTH_VALUE, month):
+            return list(self._by_month.get(month, []))
+        if month:
+            return [name for name in self._names if month in name]
+        return list(self._names)
+
+    def query(
+        self,
+        sftp,
+        prefix: str = "",
+        month: str = "",
+        pattern: Optional[Pattern[str]] = None,
+        suffix: str = "",
+        contains: str = "",
+    ) -> List[paramiko.SFTPAttributes]:
+        """Entries matching every given criterion, sorted by name.
+
+        ``prefix`` is a name prefix, ``month`` a ``YYYYMM`` (or any text)
+        contained in the name, ``pattern`` a regex applied with ``match``.
+        """
+        self.refresh(sftp)
+        with self._lock:
+            names = [
+                name
+                for name in self._candidates(prefix, month)
+                if (not suffix or name.lower().endswith(suffix.lower()))
+                and (not contains or contains in name)
+                and (pattern is None or pattern.match(name))
+            ]
+            stale = [name for name in names if name in self._unverified]
+            if stale:
+                self._restat(sftp, stale)
+            return [self._entries[name] for name in names if name in self._entries]
+
+    def _restat(self, sftp, names: List[str]) -> None:
+        for name in names:
+            try:
+                attr = sftp.stat(f"{self.remote_path}/{name}")
+            except FileNotFoundError:
+                self._entries.pop(name, None)
+                continue
+            attr.filename = name
+            self._entries[name] = attr
+            self._unverified.discard(name)
+        self._save()
+
+
+_indexes: Dict[Tuple[str, int, str], RemoteDirectoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_remote_index(config: PasswordSftpConfig) -> RemoteDirectoryIndex:
+    """Returns the process-wide index for the configured host and directory."""
+    key = (config.host, config.port, config.remote_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = RemoteDirectoryIndex(
+                config.host, config.remote_path, config.index_ttl, config.index_path
+            )
+            _indexes[key] = index
+        return index
@@ -1,20 +1,46 @@
 import logging
 import os
+import threading
 import zipfile
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 
 import paramiko
 
+from .config import TransferConfig
+from .manifest import STATUS_FAILED, STATUS_OK, SyncManifest
+from .metrics import get_metrics
+from .pool import get_pool
+from .transfer import fetch_file, open_sftp
+
 logger = logging.getLogger(__name__)
 
+# Chaves ja interpretadas, por caminho e mtime: evita testar RSA, Ed25519 e
+# ECDSA de novo a cada conexao no mesmo processo.
+_key_cache: Dict[Tuple[str, int], object] = {}
+_key_cache_lock = threading.Lock()
 
-def load_private_key(key_path: str):
-    logger.info("Carregando chave privada: %s", key_path)
 
+def load_private_key(key_path: str):
     if not os.path.exists(key_path):
         logger.error("Arquivo de chave nao encontrado: %s", key_path)
         return None
 
+    cache_key = (os.path.abspath(key_path), os.stat(key_path).st_mtime_ns)
+    with _key_cache_lock:
+        key = _key_cache.get(cache_key)
+    if key is None:
+        key = _parse_private_key(key_path)
+        if key is not None:
+            with _key_cache_lock:
+                _key_cache[cache_key] = key
+    return key
+
+
+def _parse_private_key(key_path: str):
+    logger.info("Carregando chave privada: %s", key_path)
+
     key_types = [
         (paramiko.RSAKey, "RSA"),
         (paramiko.Ed25519Key, "Ed25519"),
@@ -47,12 +73,14 @@ def load_private_key(key_path: str):
     return None
 
 
-def create_sftp_connection(host: str, user: str, private_key):
+def create_sftp_connection(
+    host: str, user: str, private_key, transfer: Optional[TransferConfig] = None
+):
     logger.info("Conectando via SFTP ao host %s com usuario %s", host, user)
     try:
-        transport = paramiko.Transport((host, 22))
-        transport.connect(username=user, pkey=private_key)
-        sftp = paramiko.SFTPClient.from_transport(transport)
+        sftp, transport = get_pool().open_sftp(
+            host, 22, user, pkey=private_key, transfer=transfer
+        )
         logger.info("Conexao SFTP estabelecida com %s", host)
         return sftp, transport
     except paramiko.AuthenticationException:
@@ -66,59 +94,172 @@ def create_sftp_connection(host: str, user: str, private_key):
         return None, None
 
 
+DOWNLOADED = "downloaded"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+def _download_file(
+    sftp,
+    file_name: str,
+    remote_path: str,
+    local_dir: str,
+    transfer: Optional[TransferConfig] = None,
+    manifest: Optional[SyncManifest] = None,
+    host: str = "",
+) -> str:
+    remote_file = os.path.join(remote_path, file_name).replace("\\", "/")
+    local_file = os.path.join(local_dir, file_name)
+    attr = None
+
+    try:
+        if manifest is not None:
+            attr = sftp.stat(remote_file)
+            if manifest.is_unchanged(host, remote_file, attr):
+                logger.info("Sem alteracoes, pulando: %s", remote_file)
+                return SKIPPED
+
+        logger.info("Baixando: %s", remote_file)
+        stats = fetch_file(sftp, remote_file, local_file, transfer)
+        logger.info("Arquivo salvo em: %s (%s)", local_file, stats.describe())
+        get_metrics().record("download", file_name, stats.seconds, stats.bytes)
+
+        local_paths = [local_file]
+        if file_name.endswith(".zip"):
+            local_paths = extract_zip(local_file, local_dir)
+            if not local_paths:
+                if manifest is not None:
+                    manifest.record(host, remote_file, attr, STATUS_FAILED)
+                return DOWNLOADED
+
+        if manifest is not None:
+            manifest.record(host, remote_file, attr, STATUS_OK, local_paths)
+        return DOWNLOADED
+
+    except FileNotFoundError:
+        logger.error("Arquivo nao encontrado: %s", remote_file)
+    except PermissionError:
+        logger.error("Permissao negada para: %s", remote_file)
+    except Exception as exc:
+        logger.error("Erro ao baixar %s: %s", file_name, exc)
+
+    get_metrics().record("download", file_name, error=True)
+    if manifest is not None and attr is not None:
+        manifest.record(host, remote_file, attr, STATUS_FAILED)
+    return FAILED
+
+
+def _download_files_concurrent(
+    transport,
+    files: List[str],
+    max_workers: int,
+    transfer: Optional[TransferConfig],
+    download: Callable[..., str],
+) -> Dict[str, str]:
+    # Cada thread abre o proprio canal SFTP sobre o mesmo Transport, ja que um
+    # SFTPClient nao deve ser compartilhado entre requisicoes simultaneas.
+    local = threading.local()
+    clients = []
+    clients_lock = threading.Lock()
+
+    def worker(file_name: str) -> str:
+        sftp = getattr(local, "sftp", None)
+        if sftp is None:
+            sftp = open_sftp(transport, transfer)
+            local.sftp = sftp
+            with clients_lock:
+                clients.append(sftp)
+        return download(sftp, file_name)
+
+    outcomes: Dict[str, str] = {}
+    try:
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sftp-download"
+        ) as executor:
+            futures = {executor.submit(worker, name): name for name in files}
+            for future in as_completed(futures):
+                file_name = futures[future]
+                try:
+                    outcomes[file_name] = future.result()
+                except Exception as exc:
+                    logger.error("Erro ao abrir canal SFTP para %s: %s", file_name, exc)
+                    outcomes[file_name] = FAILED
+    finally:
+        for sftp in clients:
+            try:
+                sftp.close()
+            except Exception as exc:
+                logger.debug("Erro ao fechar canal SFTP: %s", exc)
+    return outcomes
+
+
 def download_files(
-    sftp, remote_path: str, files: List[str], local_dir: str
+    sftp,
+    remote_path: str,
+    files: List[str],
+    local_dir: str,
+    transport=None,
+    max_workers: int = 1,
+    transfer: Optional[TransferConfig] = None,
+    manifest: Optional[SyncManifest] = None,
+    host: str = "",
 ) -> Tuple[List[str], List[str]]:
+    # Arquivos sem alteracao no manifesto nao entram em downloaded nem failed.
     os.makedirs(local_dir, exist_ok=True)
-    downloaded: List[str] = []
-    failed: List[str] = []
-
-    for file_name in files:
-        remote_file = os.path.join(remote_path, file_name).replace("\\", "/")
-        local_file = os.path.join(local_dir, file_name)
+    download = partial(
+        _download_file,
+        remote_path=remote_path,
+        local_dir=local_dir,
+        transfer=transfer,
+        manifest=manifest,
+        host=host,
+    )
 
-        try:
-            logger.info("Baixando: %s", remote_file)
-            sftp.get(remote_file, local_file)
-            logger.info("Arquivo salvo em: %s", local_file)
-            downloaded.append(file_name)
-
-            if file_name.endswith(".zip"):
-                extract_zip(local_file, local_dir)
-
-        except FileNotFoundError:
-            logger.error("Arquivo nao encontrado: %s", remote_file)
-            failed.append(file_name)
-        except PermissionError:
-            logger.error("Permissao negada para: %s", remote_file)
-            failed.append(file_name)
-        except Exception as exc:
-            logger.error("Erro ao baixar %s: %s", file_name, exc)
-            failed.append(file_name)
+    if transport is not None and max_workers > 1 and len(files) > 1:
+        logger.info(
+            "Baixando %s arquivos com ate %s canais simultaneos",
+            len(files),
+            min(max_workers, len(files)),
+        )
+        outcomes = _download_files_concurrent(
+            transport, files, min(max_workers, len(files)), transfer, download
+        )
+    else:
+        outcomes = {file_name: download(sftp, file_name) for file_name in files}
 
+    downloaded = [name for name in files if outcomes.get(name) == DOWNLOADED]
+    failed = [name for name in files if outcomes.get(name, FAILED) == FAILED]
     return downloaded, failed
 
 
-def extract_zip(zip_path: str, extract_dir: str) -> None:
+def extract_zip(zip_path: str, extract_dir: str) -> List[str]:
     try:
         logger.info("Extraindo: %s", zip_path)
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(extract_dir)
+        zip_name = os.path.basename(zip_path)
+        with get_metrics().stage("unzip", zip_name) as metric:
+            with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                members = zip_ref.namelist()
+                zip_ref.extractall(extract_dir)
+                metric.bytes = sum(info.file_size for info in zip_ref.infolist())
         logger.info("Arquivo extraido em: %s", extract_dir)
 
         os.remove(zip_path)
         logger.info("Arquivo ZIP removido: %s", zip_path)
+        return [os.path.join(extract_dir, member) for member in members]
     except zipfile.BadZipFile:
         logger.error("Arquivo ZIP corrompido: %s", zip_path)
     except Exception as exc:
         logger.error("Erro ao extrair %s: %s", zip_path, exc)
+    return []
 
 
 def close_sftp_connection(sftp, transport) -> None:
+    # Transports do pool continuam abertos para o proximo comando; so o canal
+    # SFTP e fechado. O pool encerra tudo ao final do processo.
     try:
         if sftp:
             sftp.close()
-        if transport:
+        if transport and not get_pool().owns(transport):
             transport.close()
         logger.info("Conexao SFTP encerrada")
     except Exception as exc:
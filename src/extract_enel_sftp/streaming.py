@@ -0,0 +1,283 @@
+"""Stream remote zip/txt contents straight into the parsers."""
+import io
+import logging
+import os
+import posixpath
+import zipfile
+from contextlib import contextmanager
+from typing import IO, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .config import (
+    EfetividadeConfig,
+    ExtractorConfig,
+    PasswordSftpConfig,
+    TransferConfig,
+)
+from .etl.efetividade import (
+    create_dataframe_from_streams,
+    load_efetividade_chunks,
+    load_efetividade_frame,
+)
+from .etl.loader import create_loader
+from .etl.validation import open_validator
+from .extractor import host_local_dir
+from .processing.ordens_filhas import processar_ordens_filhas
+from .remote_index import get_remote_index
+from .sftp_client import (
+    close_sftp_connection,
+    create_sftp_connection,
+    load_private_key,
+)
+from .tools import sftp_password_regex
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteReader(io.RawIOBase):
+    """Seekable read-only view of an SFTP file with bounded read-ahead.
+
+    Each refill asks for ``block_size * max_requests`` bytes through
+    ``readv``, so requests stay pipelined while memory is capped by one
+    window instead of the whole file (as an unbounded ``prefetch`` would).
+    """
+
+    def __init__(self, sftp_file, size: int, transfer: TransferConfig) -> None:
+        super().__init__()
+        self._file = sftp_file
+        self._file.MAX_REQUEST_SIZE = transfer.block_size
+        self._size = size
+        self._transfer = transfer
+        self._window = transfer.block_size * max(1, transfer.max_requests)
+        self._pos = 0
+        self._buffer = b""
+        self._buffer_start = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def _fill(self) -> None:
+        length = min(self._window, self._size - self._pos)
+        chunks = self._file.readv(
+            [(self._pos, length)],
+            max_concurrent_prefetch_requests=self._transfer.max_requests,
+        )
+        self._buffer = b"".join(chunks)
+        self._buffer_start = self._pos
+        self.bytes_read += len(self._buffer)
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self._size:
+            return 0
+        offset = self._pos - self._buffer_start
+        if offset < 0 or offset >= len(self._buffer):
+            self._fill()
+            offset = 0
+        data = self._buffer[offset : offset + len(buffer)]
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+class _TeeReader(io.RawIOBase):
+    """Copies everything read from ``source`` into ``archive_path``.
+
+    The copy is written to ``.part`` and only renamed when the stream was
+    consumed to the end, so an aborted parse never leaves a truncated file.
+    """
+
+    def __init__(self, source: IO[bytes], archive_path: str) -> None:
+        super().__init__()
+        self._source = source
+        self._archive_path = archive_path
+        self._part_path = f"{archive_path}.part"
+        self._archive = open(self._part_path, "wb")
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._source.read(len(buffer))
+        if not data:
+            self._eof = True
+            return 0
+        self._archive.write(data)
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._archive.close()
+        if self._eof:
+            os.replace(self._part_path, self._archive_path)
+            logger.info("Copia arquivada em: %s", self._archive_path)
+        else:
+            os.remove(self._part_path)
+        super().close()
+
+
+def _member_stream(
+    source: IO[bytes], name: str, archive_dir: Optional[str]
+) -> IO[bytes]:
+    if not archive_dir:
+        return source
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_path = os.path.join(archive_dir, os.path.basename(name))
+    return io.BufferedReader(_TeeReader(source, archive_path))
+
+
+def iter_remote_text_members(
+    sftp,
+    remote_file: str,
+    transfer: Optional[TransferConfig] = None,
+    archive_dir: Optional[str] = None,
+) -> Iterator[Tuple[str, IO[bytes]]]:
+    """Yields ``(name, binary stream)`` for each ``.txt`` in ``remote_file``.
+
+    ``remote_file`` may be a ``.zip`` (members are decompressed on the fly)
+    or a plain text file. Streams are only valid until the next item.
+    """
+    transfer = transfer or TransferConfig()
+    with sftp.open(remote_file, "rb") as sftp_file:
+        size = sftp_file.stat().st_size
+        reader = RemoteReader(sftp_file, size, transfer)
+
+        if not remote_file.lower().endswith(".zip"):
+            name = posixpath.basename(remote_file)
+            raw = io.BufferedReader(reader)
+            with _member_stream(raw, name, archive_dir) as stream:
+                yield name, stream
+            return
+
+        with zipfile.ZipFile(reader) as archive:
+            members: List[str] = [
+                member
+                for member in archive.namelist()
+                if member.lower().endswith(".txt")
+            ]
+            for member in members:
+                logger.info("Lendo %s de %s", member, remote_file)
+                with archive.open(member) as source:
+                    with _member_stream(source, member, archive_dir) as stream:
+                        yield member, stream
+
+
+@contextmanager
+def open_remote_text(
+    sftp,
+    remote_file: str,
+    transfer: Optional[TransferConfig] = None,
+    archive_dir: Optional[str] = None,
+) -> Iterator[IO[bytes]]:
+    """Opens the single (first) text member of ``remote_file`` as a stream."""
+    members = iter_remote_text_members(sftp, remote_file, transfer, archive_dir)
+    try:
+        try:
+            _, stream = next(members)
+        except StopIteration:
+            raise FileNotFoundError(f"Nenhum .txt encontrado em {remote_file}")
+        yield stream
+    finally:
+        members.close()
+
+
+def stream_ordens_filhas(
+    config: ExtractorConfig,
+    host_name: str = "HOST_CE",
+    archive: bool = False,
+    compact: bool = False,
+) -> pd.DataFrame:
+    host_config = next(host for host in config.hosts if host.name == host_name)
+    file_name = next(name for name in config.files if "ordemfilhas" in name)
+    remote_file = posixpath.join(config.remote_path, file_name)
+    archive_dir = host_local_dir(config, host_config) if archive else None
+
+    private_key = load_private_key(host_config.key_path)
+    if not private_key:
+        raise RuntimeError(f"Nao foi possivel carregar a chave de {host_name}")
+
+    sftp, transport = create_sftp_connection(
+        host_config.host, host_config.user, private_key, config.transfer
+    )
+    if not sftp:
+        raise RuntimeError(f"Nao foi possivel conectar ao {host_name}")
+
+    try:
+        with open_remote_text(
+            sftp, remote_file, config.transfer, archive_dir
+        ) as stream:
+            return processar_ordens_filhas(stream, compact=compact)
+    finally:
+        close_sftp_connection(sftp, transport)
+
+
+def stream_efetividade(
+    sftp_config: PasswordSftpConfig,
+    etl_config: EfetividadeConfig,
+    archive: bool = False,
+) -> None:
+    archive_dir = sftp_config.download_base_dir if archive else None
+    file_pattern = sftp_password_regex.build_file_pattern(sftp_config)
+
+    sftp, transport = sftp_password_regex.create_sftp_connection(sftp_config)
+    if not sftp:
+        print("Encerrando devido a falha na conexao.")
+        return
+
+    try:
+        remote_files = [
+            f"{sftp_config.remote_path}/{attr.filename}"
+            for attr in get_remote_index(sftp_config).query(
+                sftp, pattern=file_pattern
+            )
+        ]
+        print(f"{len(remote_files)} arquivos remotos para leitura em streaming.")
+
+        def streams():
+            for remote_file in remote_files:
+                yield from iter_remote_text_members(
+                    sftp, remote_file, sftp_config.transfer, archive_dir
+                )
+
+        if etl_config.chunk_size > 0:
+            total_rows = load_efetividade_chunks(streams(), etl_config)
+            print(f"Processo concluido! {total_rows} linhas salvas no SQL Server.")
+            return
+
+        validator = open_validator(etl_config)
+        df_final = create_dataframe_from_streams(
+            streams(),
+            etl_config.expected_columns,
+            etl_config.compact_frames,
+            validator,
+        )
+    finally:
+        sftp_password_regex.close_sftp_connection(sftp, transport)
+
+    if df_final is not None:
+        loader = create_loader(etl_config)
+        try:
+            load_efetividade_frame(df_final, etl_config, loader, validator)
+        finally:
+            loader.close()
+        print("Processo concluido! Dados salvos no SQL Server.")
@@ -0,0 +1,249 @@
+"""Append-aware sync of remote files that only grow during the month."""
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from .config import PasswordSftpConfig
+from .manifest import STATUS_OK, ManifestEntry, SyncManifest
+from .transfer import fetch_file
+
+# Bytes antes do ultimo ponto sincronizado comparados com o remoto: se
+# mudaram, o arquivo foi reescrito e nao apenas acrescido.
+TAIL_BYTES = 4096
+BLOCK_SIZE = 1024 * 1024
+
+INCREMENT_SUFFIX = ".inc"
+MODE_APPEND = "append"
+MODE_FULL = "full"
+
+
+@dataclass
+class Increment:
+    """New complete lines of ``source_file``, written to ``data_path``.
+
+    ``base_*`` describe the local copy before the lines were appended and
+    ``size``/``fingerprint`` the copy after; a loader may only append the
+    increment to rows loaded from exactly the base version.
+    """
+
+    source_file: str
+    data_path: str
+    local_file: str
+    base_size: int
+    base_fingerprint: str
+    size: int
+    fingerprint: str
+
+
+@dataclass
+class TailResult:
+    mode: str
+    local_file: str
+    offset: int
+    new_bytes: int
+    seconds: float
+    increment: Optional[Increment] = None
+
+    def describe(self) -> str:
+        if self.mode == MODE_FULL:
+            return f"download completo, {self.offset} bytes em {self.seconds:.1f}s"
+        return (
+            f"{self.new_bytes} bytes novos a partir de "
+            f"{self.offset - self.new_bytes} em {self.seconds:.1f}s"
+        )
+
+
+def _read_range(handle, start: int, stop: int) -> bytes:
+    handle.seek(start)
+    return handle.read(stop - start)
+
+
+def _tail_hash(handle, offset: int) -> str:
+    data = _read_range(handle, max(0, offset - TAIL_BYTES), offset)
+    return hashlib.sha1(data).hexdigest()
+
+
+def _file_hash(path: str) -> str:
+    hasher = hashlib.sha1()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _header(path: str) -> bytes:
+    with open(path, "rb") as handle:
+        line = handle.readline()
+    return line if line.endswith(b"\n") else b""
+
+
+def _appendable(remote, attr, entry: Optional[ManifestEntry], local_file: str) -> bool:
+    if entry is None or entry.status != STATUS_OK or entry.offset <= 0:
+        return False
+    if not entry.tail_hash or attr.st_size < entry.offset:
+        return False
+    # A copia local e conferida pelo tamanho e mtime gravados, sem reler o
+    # arquivo inteiro (varios GB no fim do mes); se mudou, download completo.
+    if not os.path.exists(local_file):
+        return False
+    stat = os.stat(local_file)
+    if stat.st_size != entry.offset or stat.st_mtime_ns != entry.local_mtime:
+        return False
+    if _tail_hash(remote, entry.offset) != entry.tail_hash:
+        return False
+    # Se a copia nao termina em quebra de linha, a ultima linha ja carregada so
+    # continua valida se o remoto seguir com uma quebra; senao ela cresceu.
+    with open(local_file, "rb") as local:
+        if _read_range(local, entry.offset - 1, entry.offset) == b"\n":
+            return True
+    stop = min(attr.st_size, entry.offset + 1)
+    return _read_range(remote, entry.offset, stop) in (b"", b"\n")
+
+
+def _append(
+    remote,
+    attr,
+    entry: ManifestEntry,
+    local_file: str,
+    config: PasswordSftpConfig,
+) -> Optional[Increment]:
+    offset = entry.offset
+    # Sem mudanca no remoto desde a ultima sincronizacao, a linha final sem
+    # quebra nao esta mais sendo escrita e entra como as demais.
+    final = attr.st_size == entry.size and attr.st_mtime == entry.mtime
+    os.makedirs(config.increment_dir, exist_ok=True)
+    source_file = os.path.basename(local_file)
+    data_path = os.path.join(
+        config.increment_dir, f"{source_file}.{offset:012d}{INCREMENT_SUFFIX}"
+    )
+    remote.seek(offset)
+    remote.MAX_REQUEST_SIZE = config.transfer.block_size
+    remote.prefetch(attr.st_size, max_concurrent_requests=config.transfer.max_requests)
+
+    # Reler a copia inteira a cada acrescimo custaria o que a sincronizacao
+    # por cauda economiza: a nova versao e identificada pela anterior mais os
+    # bytes acrescentados.
+    hasher = hashlib.sha1(f"{entry.fingerprint}:{offset}".encode())
+    written = 0
+    carry = b""
+    with open(local_file, "r+b") as local, open(data_path, "wb") as increment:
+        # A quebra que completa a ultima linha da copia fica fora do incremento.
+        skip = int(_read_range(local, offset - 1, offset) != b"\n")
+        if config.tail_header:
+            increment.write(_header(local_file))
+        local.seek(offset)
+        while offset + written + len(carry) < attr.st_size:
+            data = remote.read(config.transfer.block_size)
+            if not data:
+                break
+            # So linhas completas entram na copia local e no incremento.
+            data = carry + data
+            cut = data.rfind(b"\n") + 1
+            carry = data[cut:]
+            if final and offset + written + len(data) >= attr.st_size:
+                cut, carry = len(data), b""
+            local.write(data[:cut])
+            increment.write(data[skip:cut])
+            hasher.update(data[:cut])
+            written += cut
+            skip = 0 if cut else skip
+        local.truncate(offset + written)
+
+    if not written:
+        os.remove(data_path)
+        return None
+    result = Increment(
+        source_file,
+        data_path,
+        local_file,
+        offset,
+        entry.fingerprint,
+        offset + written,
+        hasher.hexdigest(),
+    )
+    # O .json e gravado por ultimo: sem ele o .inc e ignorado pelo ETL.
+    with open(f"{data_path}.json", "w", encoding="utf-8") as handle:
+        json.dump(asdict(result), handle, indent=2)
+    return result
+
+
+def sync_tail(
+    sftp,
+    remote_file: str,
+    local_file: str,
+    attr,
+    manifest: SyncManifest,
+    config: PasswordSftpConfig,
+) -> TailResult:
+    """Copies only the bytes appended to ``remote_file`` since the last sync.
+
+    Falls back to a full download when there is no previous sync, the remote
+    file shrank, the bytes before the last synced offset changed (rewritten
+    instead of appended) or the local copy no longer matches. A line still
+    being written on the server is held back until it ends or the file stops
+    growing; appended lines are also written as an ``Increment`` for the
+    loader.
+    """
+    started = time.monotonic()
+    entry = manifest.get(config.host, remote_file)
+    increment = None
+    with sftp.open(remote_file, "rb") as remote:
+        appendable = _appendable(remote, attr, entry, local_file)
+        if appendable:
+            increment = _append(remote, attr, entry, local_file, config)
+
+    if appendable:
+        mode = MODE_APPEND
+        offset, fingerprint = entry.offset, entry.fingerprint
+        if increment is not None:
+            offset, fingerprint = increment.size, increment.fingerprint
+        new_bytes = offset - entry.offset
+    else:
+        fetch_file(sftp, remote_file, local_file, config.transfer)
+        # Incrementos pendentes se referem a versao anterior do arquivo.
+        for pending in pending_increments(config.increment_dir):
+            if pending.local_file == local_file:
+                discard_increment(pending)
+        mode = MODE_FULL
+        offset = os.path.getsize(local_file)
+        fingerprint = _file_hash(local_file)
+        new_bytes = offset
+
+    with open(local_file, "rb") as local:
+        tail_hash = _tail_hash(local, offset)
+    manifest.record(
+        config.host,
+        remote_file,
+        attr,
+        STATUS_OK,
+        [local_file],
+        offset=offset,
+        tail_hash=tail_hash,
+        fingerprint=fingerprint,
+        local_mtime=os.stat(local_file).st_mtime_ns,
+    )
+    return TailResult(
+        mode, local_file, offset, new_bytes, time.monotonic() - started, increment
+    )
+
+
+def pending_increments(increment_dir: str) -> List[Increment]:
+    """Increments not yet loaded, per file in the order they were synced."""
+    if not increment_dir or not os.path.isdir(increment_dir):
+        return []
+    increments = []
+    for entry in os.listdir(increment_dir):
+        if not entry.endswith(f"{INCREMENT_SUFFIX}.json"):
+            continue
+        with open(os.path.join(increment_dir, entry), "r", encoding="utf-8") as handle:
+            increments.append(Increment(**json.load(handle)))
+    return sorted(increments, key=lambda item: (item.source_file, item.base_size))
+
+
+def discard_increment(increment: Increment) -> None:
+    for path in (f"{increment.data_path}.json", increment.data_path):
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,17 +1,24 @@
 import os
 from typing import List, Tuple
 
-import paramiko
-
 from ..config import PasswordSftpConfig
+from ..manifest import STATUS_FAILED, STATUS_OK, open_manifest
+from ..pool import get_pool
+from ..remote_index import get_remote_index
+from ..tail_sync import sync_tail
+from ..transfer import fetch_file
 
 
 def create_sftp_connection(config: PasswordSftpConfig):
     print("Tentando conectar ao SFTP...")
     try:
-        transport = paramiko.Transport((config.host, config.port))
-        transport.connect(username=config.username, password=config.password)
-        sftp = paramiko.SFTPClient.from_transport(transport)
+        sftp, transport = get_pool().open_sftp(
+            config.host,
+            config.port,
+            config.username,
+            password=config.password,
+            transfer=config.transfer,
+        )
         print("Conexao estabelecida com sucesso!")
         return sftp, transport
     except Exception as exc:
@@ -23,7 +30,7 @@ def close_sftp_connection(sftp, transport) -> None:
     print("Fechando conexao SFTP...")
     if sftp:
         sftp.close()
-    if transport:
+    if transport and not get_pool().owns(transport):
         transport.close()
     print("Conexao encerrada.")
 
@@ -35,14 +42,27 @@ def download_files_by_prefix_and_month(
     print(f"Listando arquivos no diretorio remoto: {config.remote_path}")
     downloaded_files: List[str] = []
 
+    manifest = open_manifest(config.manifest_path, config.download_base_dir)
+    skipped_files: List[str] = []
+    # O offset de cada arquivo fica no manifesto; sem ele, download completo.
+    tail_sync = config.tail_sync and manifest is not None
+    if config.tail_sync and manifest is None:
+        print("ENEL_TAIL_SYNC exige o manifesto; baixando os arquivos completos.")
+
     try:
-        files = sftp.listdir(config.remote_path)
-        print(f"{len(files)} arquivos encontrados no diretorio remoto.")
+        entries = get_remote_index(config).query(
+            sftp,
+            month=config.file_month,
+            contains=config.file_prefix,
+            suffix=".txt",
+        )
+        print(f"{len(entries)} arquivos correspondentes no diretorio remoto.")
     except Exception as exc:
         print(f"Falha ao listar arquivos no diretorio remoto: {exc}")
         return downloaded_files
 
-    for file_name in files:
+    for attr in entries:
+        file_name = attr.filename
         if (
             config.file_prefix in file_name
             and config.file_month in file_name
@@ -51,14 +71,36 @@ def download_files_by_prefix_and_month(
             remote_file = f"{config.remote_path}/{file_name}"
             local_file = os.path.join(config.download_base_dir, file_name)
 
+            if manifest is not None and manifest.is_unchanged(
+                config.host, remote_file, attr
+            ):
+                skipped_files.append(file_name)
+                print(f"Sem alteracoes desde a ultima sincronizacao: {file_name}")
+                continue
+
             try:
-                sftp.get(remote_file, local_file)
+                if tail_sync:
+                    result = sync_tail(
+                        sftp, remote_file, local_file, attr, manifest, config
+                    )
+                    downloaded_files.append(file_name)
+                    print(f"Arquivo sincronizado: {file_name} ({result.describe()})")
+                    continue
+                stats = fetch_file(sftp, remote_file, local_file, config.transfer)
                 downloaded_files.append(file_name)
-                print(f"Arquivo baixado com sucesso: {file_name}")
+                print(f"Arquivo baixado com sucesso: {file_name} ({stats.describe()})")
+                if manifest is not None:
+                    manifest.record(
+                        config.host, remote_file, attr, STATUS_OK, [local_file]
+                    )
             except Exception as exc:
                 print(f"Erro ao baixar {file_name}: {exc}")
+                if manifest is not None:
+                    manifest.record(config.host, remote_file, attr, STATUS_FAILED)
 
-    if not downloaded_files:
+    if skipped_files:
+        print(f"Arquivos sem alteracao (nao baixados): {len(skipped_files)}")
+    if not downloaded_files and not skipped_files:
         print("Nenhum arquivo encontrado com os criterios informados.")
     else:
         print(f"Total de arquivos baixados: {len(downloaded_files)}")
@@ -1,18 +1,25 @@
 import os
 import re
-from typing import List, Tuple
-
-import paramiko
+from typing import List, Pattern, Tuple
 
 from ..config import PasswordSftpConfig
+from ..manifest import STATUS_FAILED, STATUS_OK, open_manifest
+from ..pool import get_pool
+from ..remote_index import get_remote_index
+from ..tail_sync import sync_tail
+from ..transfer import fetch_file
 
 
 def create_sftp_connection(config: PasswordSftpConfig):
     print("Tentando conectar ao SFTP...")
     try:
-        transport = paramiko.Transport((config.host, config.port))
-        transport.connect(username=config.username, password=config.password)
-        sftp = paramiko.SFTPClient.from_transport(transport)
+        sftp, transport = get_pool().open_sftp(
+            config.host,
+            config.port,
+            config.username,
+            password=config.password,
+            transfer=config.transfer,
+        )
         print("Conexao estabelecida com sucesso!")
         return sftp, transport
     except Exception as exc:
@@ -24,41 +31,79 @@ def close_sftp_connection(sftp, transport) -> None:
     print("Fechando conexao SFTP...")
     if sftp:
         sftp.close()
-    if transport:
+    if transport and not get_pool().owns(transport):
         transport.close()
     print("Conexao encerrada.")
 
 
+def build_file_pattern(config: PasswordSftpConfig) -> Pattern[str]:
+    return re.compile(
+        f"{config.file_prefix}.*{config.file_month}.*\\.txt$", re.IGNORECASE
+    )
+
+
 def download_files_by_regex(sftp, config: PasswordSftpConfig) -> List[str]:
     os.makedirs(config.download_base_dir, exist_ok=True)
     downloaded_files: List[str] = []
 
-    file_pattern = re.compile(
-        f"{config.file_prefix}.*{config.file_month}.*\\.txt$", re.IGNORECASE
-    )
+    file_pattern = build_file_pattern(config)
+
+    manifest = open_manifest(config.manifest_path, config.download_base_dir)
+    skipped_files: List[str] = []
+    # O offset de cada arquivo fica no manifesto; sem ele, download completo.
+    tail_sync = config.tail_sync and manifest is not None
+    if config.tail_sync and manifest is None:
+        print("ENEL_TAIL_SYNC exige o manifesto; baixando os arquivos completos.")
 
     print(f"Listando arquivos no diretorio remoto: {config.remote_path}")
 
     try:
-        for attr in sftp.listdir_attr(config.remote_path):
+        for attr in get_remote_index(config).query(sftp, pattern=file_pattern):
             file_name = attr.filename
 
             if file_pattern.match(file_name):
                 remote_file = f"{config.remote_path}/{file_name}"
                 local_file = os.path.join(config.download_base_dir, file_name)
 
+                if manifest is not None and manifest.is_unchanged(
+                    config.host, remote_file, attr
+                ):
+                    skipped_files.append(file_name)
+                    print(f"Sem alteracoes desde a ultima sincronizacao: {file_name}")
+                    continue
+
                 try:
-                    sftp.get(remote_file, local_file)
+                    if tail_sync:
+                        result = sync_tail(
+                            sftp, remote_file, local_file, attr, manifest, config
+                        )
+                        downloaded_files.append(file_name)
+                        print(
+                            f"Arquivo sincronizado: {file_name} "
+                            f"({result.describe()})"
+                        )
+                        continue
+                    stats = fetch_file(
+                        sftp, remote_file, local_file, config.transfer
+                    )
                     downloaded_files.append(file_name)
-                    print(f"Arquivo baixado: {file_name}")
+                    print(f"Arquivo baixado: {file_name} ({stats.describe()})")
+                    if manifest is not None:
+                        manifest.record(
+                            config.host, remote_file, attr, STATUS_OK, [local_file]
+                        )
                 except Exception as exc:
                     print(f"Erro ao baixar {file_name}: {exc}")
+                    if manifest is not None:
+                        manifest.record(config.host, remote_file, attr, STATUS_FAILED)
 
     except Exception as exc:
         print(f"Falha ao listar arquivos no diretorio remoto: {exc}")
         return downloaded_files
 
-    if not downloaded_files:
+    if skipped_files:
+        print(f"Arquivos sem alteracao (nao baixados): {len(skipped_files)}")
+    if not downloaded_files and not skipped_files:
         print("Nenhum arquivo encontrado com os criterios informados.")
     else:
         print(f"Total de arquivos baixados: {len(downloaded_files)}")
@@ -0,0 +1,191 @@
+"""Pipelined SFTP transfer engine."""
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import paramiko
+
+from .config import TransferConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TransferStats:
+    remote_file: str
+    local_file: str
+    bytes: int
+    seconds: float
+    resumed_from: int = 0
+    digest: Optional[str] = None
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes / self.seconds
+
+    def describe(self) -> str:
+        text = (
+            f"{self.bytes / 1024 / 1024:.1f} MB em {self.seconds:.1f}s "
+            f"({self.bytes_per_second / 1024 / 1024:.2f} MB/s)"
+        )
+        if self.resumed_from:
+            text += f", retomado de {self.resumed_from} bytes"
+        return text
+
+
+def open_transport(
+    host: str, port: int, transfer: Optional[TransferConfig] = None
+) -> paramiko.Transport:
+    transfer = transfer or TransferConfig()
+    return paramiko.Transport(
+        (host, port),
+        default_window_size=transfer.window_size,
+        default_max_packet_size=transfer.max_packet_size,
+    )
+
+
+def open_sftp(
+    transport: paramiko.Transport, transfer: Optional[TransferConfig] = None
+) -> paramiko.SFTPClient:
+    transfer = transfer or TransferConfig()
+    return paramiko.SFTPClient.from_transport(
+        transport,
+        window_size=transfer.window_size,
+        max_packet_size=transfer.max_packet_size,
+    )
+
+
+class IntegrityError(IOError):
+    pass
+
+
+def _part_paths(local_file: str) -> Tuple[str, str]:
+    part_file = f"{local_file}.part"
+    return part_file, f"{part_file}.json"
+
+
+def _resume_offset(part_file: str, meta_file: str, remote_attr) -> int:
+    # So retoma se o .part foi iniciado contra a mesma versao do arquivo
+    # remoto; os zips diarios mantem o nome, entao tamanho+mtime distinguem.
+    if not os.path.exists(part_file) or not os.path.exists(meta_file):
+        return 0
+    try:
+        with open(meta_file, "r", encoding="utf-8") as handle:
+            meta = json.load(handle)
+    except (OSError, ValueError):
+        return 0
+    if (meta.get("size"), meta.get("mtime")) != (
+        remote_attr.st_size,
+        remote_attr.st_mtime,
+    ):
+        logger.info("Arquivo remoto mudou desde o download parcial; reiniciando.")
+        return 0
+    offset = os.path.getsize(part_file)
+    if offset > remote_attr.st_size:
+        return 0
+    return offset
+
+
+def _hash_existing(hasher, path: str, block_size: int) -> None:
+    with open(path, "rb") as handle:
+        for data in iter(lambda: handle.read(block_size), b""):
+            hasher.update(data)
+
+
+def _remote_checksum(sftp, remote_file: str, algorithm: str) -> Optional[str]:
+    # Checksum publicado ao lado do arquivo (ex.: arquivo.zip.sha256), se houver.
+    try:
+        with sftp.open(f"{remote_file}.{algorithm}", "r") as handle:
+            content = handle.read(4096).decode("ascii", errors="ignore").split()
+    except IOError:
+        return None
+    return content[0].lower() if content else None
+
+
+def _discard(*paths: str) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def fetch_file(
+    sftp,
+    remote_file: str,
+    local_file: str,
+    transfer: Optional[TransferConfig] = None,
+) -> TransferStats:
+    transfer = transfer or TransferConfig()
+    started = time.monotonic()
+    part_file, meta_file = _part_paths(local_file)
+    hasher = hashlib.new(transfer.hash_algorithm) if transfer.hash_algorithm else None
+    total = 0
+
+    with sftp.open(remote_file, "rb") as remote:
+        remote_attr = remote.stat()
+        file_size = remote_attr.st_size
+
+        offset = 0
+        if transfer.resume:
+            offset = _resume_offset(part_file, meta_file, remote_attr)
+        if offset:
+            logger.info("Retomando %s a partir de %s bytes", remote_file, offset)
+            if hasher is not None:
+                _hash_existing(hasher, part_file, transfer.block_size)
+        else:
+            _discard(part_file)
+            with open(meta_file, "w", encoding="utf-8") as handle:
+                json.dump({"size": file_size, "mtime": remote_attr.st_mtime}, handle)
+
+        if offset < file_size:
+            remote.seek(offset)
+            # O paramiko divide o prefetch em requisicoes de MAX_REQUEST_SIZE;
+            # sobrescrever o atributo na instancia ajusta o tamanho do bloco.
+            remote.MAX_REQUEST_SIZE = transfer.block_size
+            remote.prefetch(file_size, max_concurrent_requests=transfer.max_requests)
+
+        with open(part_file, "ab" if offset else "wb") as local:
+            while offset + total < file_size:
+                data = remote.read(transfer.block_size)
+                if not data:
+                    break
+                local.write(data)
+                if hasher is not None:
+                    hasher.update(data)
+                total += len(data)
+
+    local_size = os.path.getsize(part_file)
+    if local_size != file_size:
+        raise IOError(
+            f"Transferencia incompleta de {remote_file}: "
+            f"{local_size} de {file_size} bytes"
+        )
+
+    digest = hasher.hexdigest() if hasher is not None else None
+    if digest is not None:
+        expected = _remote_checksum(sftp, remote_file, transfer.hash_algorithm)
+        if expected is not None and expected != digest:
+            _discard(part_file, meta_file)
+            raise IntegrityError(
+                f"{transfer.hash_algorithm} divergente para {remote_file}: "
+                f"esperado {expected}, obtido {digest}"
+            )
+
+    os.replace(part_file, local_file)
+    _discard(meta_file)
+
+    stats = TransferStats(
+        remote_file,
+        local_file,
+        total,
+        time.monotonic() - started,
+        resumed_from=offset,
+        digest=digest,
+    )
+    logger.debug("Transferencia de %s: %s", remote_file, stats.describe())
+    return stats
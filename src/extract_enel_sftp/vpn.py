@@ -1,24 +1,27 @@
 import logging
 import subprocess
-import time
+from typing import Optional, Sequence
+
+from .config import ReadinessConfig
+from .readiness import GlobalProtectProbe, wait_until_ready
 
 logger = logging.getLogger(__name__)
 
 
 def check_vpn_connected() -> bool:
-    try:
-        result = subprocess.run(
-            ["route", "print"], capture_output=True, text=True, timeout=10
-        )
-        return "PANGP Virtual Ethernet Adapter" in result.stdout
-    except Exception:
-        return False
+    return GlobalProtectProbe().check()
 
 
-def connect_vpn(globalprotect_path: str) -> bool:
+def connect_vpn(
+    globalprotect_path: str,
+    probes: Optional[Sequence] = None,
+    readiness: Optional[ReadinessConfig] = None,
+) -> bool:
     logger.info("Verificando conexao VPN...")
+    probes = probes if probes is not None else [GlobalProtectProbe()]
+    readiness = readiness or ReadinessConfig()
 
-    if check_vpn_connected():
+    if wait_until_ready(probes, readiness, timeout=0):
         logger.info("VPN ja esta conectada!")
         return True
 
@@ -39,16 +42,14 @@ def connect_vpn(globalprotect_path: str) -> bool:
     logger.info("(Pode ser necessario autenticacao MFA)")
     logger.info("=" * 50)
 
-    logger.info("Aguardando conexao VPN (verificando a cada 5 segundos)...")
-    for i in range(36):
-        time.sleep(5)
-        if check_vpn_connected():
-            logger.info("VPN conectada com sucesso!")
-            return True
-        if (i + 1) % 6 == 0:
-            logger.info("Ainda aguardando VPN... (%ss)", (i + 1) * 5)
+    logger.info(
+        "Aguardando conexao VPN (%s)...", ", ".join(probe.name for probe in probes)
+    )
+    if wait_until_ready(probes, readiness):
+        logger.info("VPN conectada com sucesso!")
+        return True
 
-    logger.error("Timeout: VPN nao conectada apos 3 minutos")
+    logger.error("Timeout: VPN nao conectada apos %.0f segundos", readiness.timeout)
     return False
 
 